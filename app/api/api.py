@@ -1,9 +1,11 @@
 # app/api/api.py
 from fastapi import APIRouter
 
+from app.core.config import settings
+
 # 1. 导入所有端点模块
 from app.api.endpoints import (
-    login, platforms, question_banks, procedures, questions , client, assessments, utils, results, users
+    login, platforms, question_banks, procedures, questions , client, assessments, utils, results, users, monitoring
 )
 
 api_router = APIRouter()
@@ -34,6 +36,13 @@ api_router.include_router(
 api_router.include_router(utils.router, prefix="/utils", tags=["utils"])
 
 api_router.include_router(assessments.router, prefix="/assessments", tags=["assessments"])
-api_router.include_router(client.router, prefix="/client", tags=["client"])
+
+# 客户端接口：按配置挂载同步版或异步版（两者路由与响应完全一致）
+if settings.CLIENT_API_ASYNC:
+    from app.api.endpoints import client_async
+    api_router.include_router(client_async.router, prefix="/client", tags=["client"])
+else:
+    api_router.include_router(client.router, prefix="/client", tags=["client"])
 api_router.include_router(results.router, prefix="/admin", tags=["results"])
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
 
@@ -1,4 +1,5 @@
 # app/api/endpoints/assessments.py (最终修正版)
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
@@ -8,6 +9,11 @@ from app import schemas
 # --- 修正导入语句 ---
 # 不再导入整个模块，而是直接从模块中导入我们需要的那个 CRUD 实例
 from app.crud.crud_assessment import crud_assessment
+from app.crud import crud_session_state
+from app.core.config import settings
+from app.core.scheduler import (
+    cancel_assessment_close, cancel_cache_warmup, schedule_assessment_close, schedule_cache_warmup,
+)
 
 from app.api import deps
 from app.models import user_management as user_models
@@ -39,6 +45,9 @@ def create_assessment(
     # --- 校验结束 ---
 
     assessment = crud_assessment.create(db=db, obj_in=assessment_in)
+    crud_assessment.invalidate_upcoming_cache(db=db, question_bank_ids=[assessment.question_bank_id])
+    schedule_cache_warmup(assessment.id, assessment.start_time)
+    schedule_assessment_close(assessment.id, assessment.end_time)
     return {"data": assessment}
 
 @router.get("/", response_model=UnifiedResponse[List[schemas.Assessment]]) # 建议返回 Read Schema
@@ -84,7 +93,23 @@ def update_assessment(
     assessment = crud_assessment.get(db=db, id=assessment_id) # 修正
     if not assessment:
         raise HTTPException(status_code=404, detail="未找到指定的考核场次。")
+    old_question_bank_id = assessment.question_bank_id
+    old_end_time = assessment.end_time
     assessment = crud_assessment.update(db=db, db_obj=assessment, obj_in=assessment_in) # 修正
+    # 会话状态缓存了考核结束时间与题库：变更后使未交卷会话的状态失效，否则延长的考核仍会被判定为已结束、
+    # 提前结束的考核在原结束时间前仍接受答题
+    if assessment.end_time != old_end_time or assessment.question_bank_id != old_question_bank_id:
+        result_ids = crud_session_state.invalidate_assessment_session_states(db=db, assessment_id=assessment.id)
+        if result_ids and settings.CLIENT_API_ASYNC:
+            # 同步接口运行在线程池中，回到事件循环经异步缓存服务再删除一次
+            anyio.from_thread.run(crud_session_state.drop_session_states_async, result_ids)
+    # 考核可能被移到其他题库（平台），新旧平台的调度缓存都需要失效
+    crud_assessment.invalidate_upcoming_cache(
+        db=db, question_bank_ids=[old_question_bank_id, assessment.question_bank_id]
+    )
+    # 开始 / 结束时间或题库可能已变更，按最新信息重新注册预热任务与结束任务
+    schedule_cache_warmup(assessment.id, assessment.start_time)
+    schedule_assessment_close(assessment.id, assessment.end_time)
     return {"data": assessment}
 
 @router.delete("/{assessment_id}", response_model=UnifiedResponse[schemas.Assessment]) # 建议返回 Read Schema
@@ -101,5 +126,8 @@ def delete_assessment(
     if not assessment:
         raise HTTPException(status_code=404, detail="未找到指定的考核场次。")
     assessment = crud_assessment.remove(db=db, id=assessment_id) # 修正
+    crud_assessment.invalidate_upcoming_cache(db=db, question_bank_ids=[assessment.question_bank_id])
+    cancel_cache_warmup(assessment_id)
+    cancel_assessment_close(assessment_id)
     return {"data": assessment}
     # return {"msg": "已成功删除 考核场次."}
@@ -1,23 +1,28 @@
 # app/api/endpoints/client.py (最终修复与增强版)
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from datetime import datetime
+from typing import List, Optional
 from app import schemas
 from app.api import deps
 from app.crud.crud_assessment import crud_assessment
 from app.crud.crud_examinee import crud_examinee
 from app.crud.crud_assessment_result import crud_assessment_result
-from app.crud.crud_answer_log import crud_answer_log
+from app.crud.crud_answer_log import DuplicateAnswerError, crud_answer_log
 from app.crud.crud_platform import crud_platform
+from app.crud import crud_session_state
 from app.core.exceptions import BusinessException
+from app.core.scheduler import schedule_result_finalization
 from app.core.security import verify_password
 
 
-from app.crud.crud_blueprint import build_assessment_blueprint
-from app.schemas.examinee import BlueprintProcedure
+from app.crud.crud_blueprint import (
+    client_has_blueprint, content_version, get_blueprint_segments, parse_if_none_match,
+    render_session_payload, render_session_state_payload,
+)
 from app.schemas.response import UnifiedResponse # 导入统一响应模型
 import pytz
-from app.core.scheduler import schedule_auto_submit
+from app.services import answer_ingest
 # 定义北京时区
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
 
@@ -44,13 +49,20 @@ def get_upcoming_assessment_for_platform(
     """
     为指定平台获取最优先的（即将开始或正在进行的）一场考核。
     """
-    assessment = crud_assessment.get_upcoming_or_active(db=db, platform_id=platform_id)
+    # 读取平台调度缓存（有效期对齐到下一个开始/结束时间点），未命中时一次 LIMIT 1 查询
+    assessment = crud_assessment.get_upcoming_schedule_entry(db=db, platform_id=platform_id)
     if not assessment:
         raise HTTPException(status_code=404, detail="针对该平台没有即将开始或正在进行的考核场次。")
     return {"data": assessment}
 
 @router.post("/assessments/{assessment_id}/session", response_model=UnifiedResponse[schemas.AssessmentBlueprintResponse])
-def start_or_resume_assessment_session(assessment_id: int, *, db: Session = Depends(deps.get_db), start_request: schemas.AssessmentStartRequest):
+def start_or_resume_assessment_session(
+    assessment_id: int,
+    *,
+    db: Session = Depends(deps.get_db),
+    start_request: schemas.AssessmentStartRequest,
+    if_none_match: Optional[str] = Header(None),
+):
     assessment = crud_assessment.get(db=db, id=assessment_id)
     if not assessment: raise HTTPException(status_code=404, detail="未找到指定的考核场次。")
 
@@ -78,106 +90,159 @@ def start_or_resume_assessment_session(assessment_id: int, *, db: Session = Depe
         )
 
     # --- 核心修复点 1: 使用并发安全的方法创建会话 ---
-    session, is_new_session = crud_assessment_result.get_or_create_active_session(
+    session, _ = crud_assessment_result.get_or_create_active_session(
         db=db, assessment_id=assessment_id, examinee_id=examinee.id
     )
+    # 自动交卷由考核级的结束任务统一处理（见 scheduler.schedule_assessment_close），这里无需为会话单独注册定时任务
 
-    # 只有新创建的会话才需要设置定时任务
-    if is_new_session:
-        # 1. 获取考核的结束时间 (它已经被 Pydantic 转为 naive 北京时间)
-        assessment_end_time_naive = assessment.end_time
-
-        # 2. 将其转换为带时区的 UTC 时间，以便调度器使用
-        beijing_tz = pytz.timezone('Asia/Shanghai')
-        end_time_utc = beijing_tz.localize(assessment_end_time_naive).astimezone(timezone.utc)
-
-        # 3. 调用任务分派员，设置一个在考核结束时间执行的"闹钟"
-        schedule_auto_submit(result_id=session.id, run_time=end_time_utc)
-
-    # --- 2. 获取数据 (保持不变) ---
-    full_blueprint = build_assessment_blueprint(db=db, question_bank_id=assessment.question_bank_id)
-    # 关键：获取已回答题目的详细日志映射 {question_id: [selected_ids]}
+    # --- 2. 获取数据：预序列化的蓝图片段 + 已答日志映射 {question_id: {...}} ---
+    blueprint = get_blueprint_segments(db=db, question_bank_id=assessment.question_bank_id)
     answered_logs_map = crud_assessment_result.get_answered_logs_map(db=db, result_id=session.id)
-    answered_question_ids = set(answered_logs_map.keys())
-    
-    # --- 3. 【核心修复】二次加工蓝图，注入已选答案 ---
-    blueprint_to_return = []
-    for proc in full_blueprint:
-        
-        question_ids_in_proc = {q.id for q in proc.questions}
-        
-        # a. 如果工序已完成，则过滤掉
-        if question_ids_in_proc.issubset(answered_question_ids):
-            continue
 
-        # b. 如果工序未完成，则处理其下的题目，注入已选答案
-        processed_questions = []
-        for question in proc.questions:
-            # 将 Pydantic 模型转为字典以便修改
-            question_data = question.model_dump()
-            
-            # 关键：如果题目已回答，就从 map 中获取答案并注入
-            if question.id in answered_logs_map:
-                question_data['selected_option_ids'] = answered_logs_map[question.id]['selected_option_ids']
-                question_data['score_awarded'] = answered_logs_map[question.id]['score_awarded']
-
-            processed_questions.append(question_data)
-
-        # d. 创建一个新的工序对象，包含处理过的题目列表
-        filtered_proc = BlueprintProcedure(
-            id=proc.id,
-            name=proc.name,
-            questions=processed_questions
-        )
-        blueprint_to_return.append(filtered_proc)
+    # 写入会话状态缓存，供后续答题/交卷的身份与重复作答校验使用
+    crud_session_state.init_session_state(
+        result=session, assessment=assessment,
+        examinee_identifier=examinee.identifier, answered_question_ids=answered_logs_map.keys(),
+    )
 
-        
-    # --- 4. 返回最终结果 ---
-    return {"data": {"assessment_result_id": session.id, "procedures": blueprint_to_return}}
+    # --- 3. 直接拼接响应字节，绕过 Pydantic 校验与序列化 ---
+    # 客户端通过 If-None-Match 回传的内容版本与当前蓝图一致时，只下发作答状态与未完成工序ID（业务码 304）；
+    # 否则下发完整蓝图（过滤已完成工序并注入已选答案）。两种响应都带 ETag。
+    version = content_version(blueprint, answered_logs_map.keys())
+    if client_has_blueprint(blueprint, parse_if_none_match(if_none_match)):
+        content = render_session_state_payload(
+            blueprint, result_id=session.id, answered_logs_map=answered_logs_map, version=version
+        )
+    else:
+        content = render_session_payload(
+            blueprint, result_id=session.id, answered_logs_map=answered_logs_map, version=version
+        )
+    return Response(content=content, media_type="application/json", headers={"ETag": f'"{version}"'})
 
 @router.post("/assessment-results/{result_id}/answer", response_model=UnifiedResponse[schemas.SubmitAnswerResponse])
 def submit_answer(result_id: int, *, db: Session = Depends(deps.get_db), answer_in: schemas.SubmitAnswerRequest):
-    result = crud_assessment_result.get(db=db, id=result_id)
-    if not result or result.end_time: raise HTTPException(status_code=404, detail="未找到指定的考核会话或会话已结束。")
+    # 会话状态（考生、题库、结束时间、是否交卷）优先从缓存读取，未命中时才回源数据库
+    state = crud_session_state.get_session_state(db=db, result_id=result_id)
+    if not state or state["closed"]: raise HTTPException(status_code=404, detail="未找到指定的考核会话或会话已结束。")
 
     # --- 新增：提交答案时间校验 ---
-    assessment = crud_assessment.get(db=db, id=result.assessment_id)
     now_beijing = datetime.now(BEIJING_TZ)
-    end_time_beijing = BEIJING_TZ.localize(assessment.end_time)
+    end_time_beijing = BEIJING_TZ.localize(crud_session_state.get_state_end_time(state))
     if now_beijing > end_time_beijing: raise HTTPException(status_code=403, detail="考核已结束。无法提交答案。")
 
-    examinee = crud_examinee.get(db=db, id=result.examinee_id)
-    if not examinee or examinee.identifier != answer_in.examinee_identifier: raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+    if state["examinee_identifier"] != answer_in.examinee_identifier: raise HTTPException(status_code=403, detail="考生标识符不匹配。")
 
-    # --- 关键修复：重复提交校验 ---
-    answered_ids = crud_assessment_result.get_answered_question_ids(db=db, result_id=result_id)
-    if answer_in.question_id in answered_ids:
+    # --- 关键修复：重复提交校验（已答集合原子写入，并发重复提交只有一个能成功）---
+    if not crud_session_state.mark_answered(db=db, result_id=result_id, question_id=answer_in.question_id, state=state):
         raise HTTPException(status_code=400, detail="该题目已被回答。")
 
-    # answer_map = get_cached_answer_map(result_id)
-    # if not answer_map: raise HTTPException(status_code=500, detail="Cache lost. Please restart session.")
-    
     # --- 关键修复：将所有计分和日志逻辑委托给 CRUD 层 ---
+    question_bank_id = state["question_bank_id"]
     try:
-        # 直接调用正确的方法，它会处理所有事情：校验、计分、记录日志、更新分数和提交
-        score_awarded, is_correct = crud_answer_log.calculate_and_log_answer(
-            db=db, result=result, answer_in=answer_in
-        )
-
+        if answer_ingest.is_write_behind_enabled():
+            # 写后模式：只校验与计分，答题记录入队后立即返回，由后台批量落库
+            score_awarded, is_correct = crud_answer_log.score_submission(
+                db=db, question_bank_id=question_bank_id, answer_in=answer_in
+            )
+            answer_ingest.enqueue_answers([
+                answer_ingest.build_answer_record(result_id, answer_in, score_awarded)
+            ])
+        else:
+            # 直接调用正确的方法，它会处理所有事情：校验、计分、记录日志、更新分数和提交
+            score_awarded, is_correct = crud_answer_log.calculate_and_log_answer(
+                db=db, result_id=result_id, question_bank_id=question_bank_id, answer_in=answer_in
+            )
+
+    except DuplicateAnswerError:
+        # 并发重复提交越过了已答标记，由唯一索引拦下：该题已作答，不回滚已答标记
+        raise HTTPException(status_code=400, detail="该题目已被回答。")
     except ValueError as e:
         # 如果 calculate_and_log_answer 内部抛出 ValueError (例如问题不存在)，则捕获并返回400错误
+        crud_session_state.unmark_answered(result_id=result_id, question_id=answer_in.question_id)
         raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        crud_session_state.unmark_answered(result_id=result_id, question_id=answer_in.question_id)
+        raise
     
     # 成功后直接返回结果
     return {"data": {"status": "success", "score_awarded": score_awarded, "is_correct": is_correct}}
 
+@router.post("/assessment-results/{result_id}/answers", response_model=UnifiedResponse[schemas.SubmitAnswersBatchResponse])
+def submit_answers_batch(result_id: int, *, db: Session = Depends(deps.get_db), answers_in: List[schemas.SubmitAnswerRequest]):
+    """
+    批量提交答案（Unity 客户端完成一个工序后一次性提交该工序的所有题目）。
+    所有题目一次计分、一次批量插入答题日志、一次更新总分；
+    单题失败（重复作答、选项非法等）只影响该题，结果逐题返回。
+    """
+    if not answers_in: raise HTTPException(status_code=400, detail="答案列表不能为空。")
+
+    state = crud_session_state.get_session_state(db=db, result_id=result_id)
+    if not state or state["closed"]: raise HTTPException(status_code=404, detail="未找到指定的考核会话或会话已结束。")
+
+    now_beijing = datetime.now(BEIJING_TZ)
+    end_time_beijing = BEIJING_TZ.localize(crud_session_state.get_state_end_time(state))
+    if now_beijing > end_time_beijing: raise HTTPException(status_code=403, detail="考核已结束。无法提交答案。")
+
+    if any(item.examinee_identifier != state["examinee_identifier"] for item in answers_in):
+        raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+
+    # 1. 批量重复作答校验（一次缓存往返）
+    question_ids = [item.question_id for item in answers_in]
+    first_answers = crud_session_state.mark_answered_many(
+        db=db, result_id=result_id, question_ids=question_ids, state=state
+    )
+
+    # 2. 逐题校验与计分（基于答案键，不访问数据库）
+    item_results = []
+    scored_answers = []
+    for answer_in, is_first in zip(answers_in, first_answers):
+        if not is_first:
+            item_results.append({"question_id": answer_in.question_id, "status": "error", "error": "该题目已被回答。"})
+            continue
+        try:
+            score_awarded, is_correct = crud_answer_log.score_submission(
+                db=db, question_bank_id=state["question_bank_id"], answer_in=answer_in
+            )
+        except ValueError as e:
+            crud_session_state.unmark_answered(result_id=result_id, question_id=answer_in.question_id)
+            item_results.append({"question_id": answer_in.question_id, "status": "error", "error": str(e)})
+            continue
+        scored_answers.append((answer_in, score_awarded))
+        item_results.append({
+            "question_id": answer_in.question_id, "status": "success",
+            "score_awarded": score_awarded, "is_correct": is_correct,
+        })
+
+    # 3. 批量落库（或写后模式下批量入队）
+    accepted_ids = [answer_in.question_id for answer_in, _ in scored_answers]
+    try:
+        if answer_ingest.is_write_behind_enabled():
+            answer_ingest.enqueue_answers([
+                answer_ingest.build_answer_record(result_id, answer_in, score_awarded)
+                for answer_in, score_awarded in scored_answers
+            ])
+            score_delta, duplicate_ids = sum(score_awarded for _, score_awarded in scored_answers), set()
+        else:
+            score_delta, duplicate_ids = crud_answer_log.log_answers(db=db, result_id=result_id, scored_answers=scored_answers)
+    except Exception:
+        crud_session_state.unmark_answered_many(result_id=result_id, question_ids=accepted_ids)
+        raise
+
+    # 落库时已有答题日志的题目（并发重复提交越过了已答标记）未计分，改为错误结果
+    for i, item in enumerate(item_results):
+        if item["status"] == "success" and item["question_id"] in duplicate_ids:
+            item_results[i] = {"question_id": item["question_id"], "status": "error", "error": "该题目已被回答。"}
+    accepted_count = len(scored_answers) - len(duplicate_ids)
+    return {"data": {"results": item_results, "accepted_count": accepted_count, "score_delta": score_delta}}
+
 @router.post("/assessment-results/{result_id}/finish", response_model=UnifiedResponse)
 def finish_assessment(result_id: int, *, db: Session = Depends(deps.get_db), finish_request: schemas.FinishAssessmentRequest):
-    result = crud_assessment_result.get(db=db, id=result_id)
-    if not result: raise HTTPException(status_code=404, detail="未找到指定的考核会话。")
+    state = crud_session_state.get_session_state(db=db, result_id=result_id)
+    if not state: raise HTTPException(status_code=404, detail="未找到指定的考核会话。")
     
-    examinee = crud_examinee.get(db=db, id=result.examinee_id)
-    if not examinee or examinee.identifier != finish_request.examinee_identifier: raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+    if state["examinee_identifier"] != finish_request.examinee_identifier: raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+
+    result = crud_assessment_result.get(db=db, id=result_id)
 
     # --- 核心逻辑修改 ---
     # 1. 检查考核是否已经结束
@@ -193,7 +258,14 @@ def finish_assessment(result_id: int, *, db: Session = Depends(deps.get_db), fin
     now_beijing = datetime.now(BEIJING_TZ)
     result.end_time = now_beijing.replace(tzinfo=None)  # 去掉时区信息，存储为naive datetime
     db.add(result); db.commit()
-    return {"data": {"status": "finished", "final_score": result.total_score}}
+    crud_session_state.invalidate_session_state(result_id)
+    # 会话汇总与成绩详情缓存在后台生成，不占用交卷请求
+    # 写后模式下不等待队列刷写：此处的分数可能未包含尚未落库的答题记录，最终分数以汇总任务写回的为准
+    schedule_result_finalization([result_id])
+    return {"data": {
+        "status": "finished", "final_score": result.total_score,
+        "score_pending": answer_ingest.is_write_behind_enabled(),
+    }}
 
 @router.post(
     "/platforms/{platform_id}/verify-password",
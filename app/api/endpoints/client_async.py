@@ -0,0 +1,277 @@
+# app/api/endpoints/client_async.py
+"""
+考核客户端接口（异步版）
+路由与响应格式与 client.py 完全一致，区别在于全部基于 AsyncSession + aiomysql 与异步 Redis，
+单个 worker 在等待数据库 / Redis 时不占用线程，可同时承载大量进行中的考核请求。
+通过 settings.CLIENT_API_ASYNC 开关在 api.py 中二选一挂载。
+"""
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+import pytz
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.core.exceptions import BusinessException
+from app.core.scheduler import schedule_result_finalization
+from app.core.security import verify_password
+from app.crud import crud_session_state
+from app.crud.crud_answer_log import crud_answer_log
+from app.crud.crud_assessment import crud_assessment
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.crud.crud_blueprint import (
+    client_has_blueprint, content_version, get_blueprint_segments_async, parse_if_none_match,
+    render_session_payload, render_session_state_payload,
+)
+from app.crud.crud_examinee import crud_examinee
+from app.crud.crud_platform import crud_platform
+from app.db.async_session import get_async_db
+from app.schemas.response import UnifiedResponse
+from app.services import answer_ingest
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+router = APIRouter()
+
+
+@router.get("/timestamp", response_model=UnifiedResponse)
+async def get_timestamp():
+    """
+    获取当前服务器时间戳
+    """
+    now_beijing = datetime.now(BEIJING_TZ)
+    return {"data": int(now_beijing.timestamp() * 1000)}
+
+
+@router.get("/platforms/{platform_id}/assessments/upcoming", response_model=UnifiedResponse[schemas.Assessment])
+async def get_upcoming_assessment_for_platform(platform_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    为指定平台获取最优先的（即将开始或正在进行的）一场考核。
+    """
+    assessment = await crud_assessment.get_upcoming_schedule_entry_async(db=db, platform_id=platform_id)
+    if not assessment:
+        raise HTTPException(status_code=404, detail="针对该平台没有即将开始或正在进行的考核场次。")
+    return {"data": assessment}
+
+
+@router.post("/assessments/{assessment_id}/session", response_model=UnifiedResponse[schemas.AssessmentBlueprintResponse])
+async def start_or_resume_assessment_session(
+    assessment_id: int,
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    start_request: schemas.AssessmentStartRequest,
+    if_none_match: Optional[str] = Header(None),
+):
+    assessment = await crud_assessment.get_async(db=db, id=assessment_id)
+    if not assessment: raise HTTPException(status_code=404, detail="未找到指定的考核场次。")
+
+    # 将数据库中的 naive datetime 视为北京时间进行比较
+    now_beijing = datetime.now(BEIJING_TZ)
+    start_time_beijing = BEIJING_TZ.localize(assessment.start_time)
+    end_time_beijing = BEIJING_TZ.localize(assessment.end_time)
+
+    if now_beijing < start_time_beijing: raise HTTPException(status_code=403, detail="考核还未开始。")
+    if now_beijing > end_time_beijing: raise HTTPException(status_code=403, detail="考核已结束。")
+
+    examinee = await crud_examinee.get_or_create_by_identifier_async(db=db, identifier=start_request.examinee_identifier)
+
+    finished_session = await crud_assessment_result.get_finished_session_async(
+        db=db, assessment_id=assessment_id, examinee_id=examinee.id
+    )
+    if finished_session:
+        raise HTTPException(status_code=403, detail="该考生已完成并提交了这场考核。")
+
+    session, _ = await crud_assessment_result.get_or_create_active_session_async(
+        db=db, assessment_id=assessment_id, examinee_id=examinee.id
+    )
+    # 自动交卷由考核级的结束任务统一处理（见 scheduler.schedule_assessment_close）
+
+    blueprint = await get_blueprint_segments_async(db=db, question_bank_id=assessment.question_bank_id)
+    answered_logs_map = await crud_assessment_result.get_answered_logs_map_async(db=db, result_id=session.id)
+
+    await crud_session_state.init_session_state_async(
+        result=session, assessment=assessment,
+        examinee_identifier=examinee.identifier, answered_question_ids=answered_logs_map.keys(),
+    )
+
+    # 客户端已持有当前版本蓝图时只下发作答状态（业务码 304），否则下发完整蓝图；两者都带 ETag
+    version = content_version(blueprint, answered_logs_map.keys())
+    if client_has_blueprint(blueprint, parse_if_none_match(if_none_match)):
+        content = render_session_state_payload(
+            blueprint, result_id=session.id, answered_logs_map=answered_logs_map, version=version
+        )
+    else:
+        content = render_session_payload(
+            blueprint, result_id=session.id, answered_logs_map=answered_logs_map, version=version
+        )
+    return Response(content=content, media_type="application/json", headers={"ETag": f'"{version}"'})
+
+
+async def _load_open_state(db: AsyncSession, result_id: int) -> dict:
+    """读取会话状态并校验会话未结束、考核未超时"""
+    state = await crud_session_state.get_session_state_async(db=db, result_id=result_id)
+    if not state or state["closed"]: raise HTTPException(status_code=404, detail="未找到指定的考核会话或会话已结束。")
+
+    now_beijing = datetime.now(BEIJING_TZ)
+    end_time_beijing = BEIJING_TZ.localize(crud_session_state.get_state_end_time(state))
+    if now_beijing > end_time_beijing: raise HTTPException(status_code=403, detail="考核已结束。无法提交答案。")
+    return state
+
+
+async def _persist_scored_answers(db: AsyncSession, result_id: int, scored_answers: list) -> Tuple[int, Set[int]]:
+    """
+    写后模式下批量入队，否则直接批量落库，返回 (分数增量, 已有答题日志而未计分的题目ID)。
+    写后模式的去重在后台刷写时进行。
+    """
+    if answer_ingest.is_write_behind_enabled():
+        await answer_ingest.enqueue_answers_async([
+            answer_ingest.build_answer_record(result_id, answer_in, score_awarded)
+            for answer_in, score_awarded in scored_answers
+        ])
+        return sum(score_awarded for _, score_awarded in scored_answers), set()
+    return await crud_answer_log.log_answers_async(db=db, result_id=result_id, scored_answers=scored_answers)
+
+
+@router.post("/assessment-results/{result_id}/answer", response_model=UnifiedResponse[schemas.SubmitAnswerResponse])
+async def submit_answer(
+    result_id: int, *, db: AsyncSession = Depends(get_async_db), answer_in: schemas.SubmitAnswerRequest
+):
+    state = await _load_open_state(db, result_id)
+    if state["examinee_identifier"] != answer_in.examinee_identifier: raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+
+    # 重复提交校验（已答集合原子写入，并发重复提交只有一个能成功）
+    first_answers = await crud_session_state.mark_answered_many_async(
+        db=db, result_id=result_id, question_ids=[answer_in.question_id], state=state
+    )
+    if not first_answers[0]:
+        raise HTTPException(status_code=400, detail="该题目已被回答。")
+
+    try:
+        score_awarded, is_correct = await crud_answer_log.score_submission_async(
+            db=db, question_bank_id=state["question_bank_id"], answer_in=answer_in
+        )
+        _, duplicate_ids = await _persist_scored_answers(db, result_id, [(answer_in, score_awarded)])
+    except ValueError as e:
+        await crud_session_state.unmark_answered_many_async(result_id=result_id, question_ids=[answer_in.question_id])
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        await crud_session_state.unmark_answered_many_async(result_id=result_id, question_ids=[answer_in.question_id])
+        raise
+    if duplicate_ids:
+        # 并发重复提交越过了已答标记，由唯一索引拦下：该题已作答，不回滚已答标记
+        raise HTTPException(status_code=400, detail="该题目已被回答。")
+
+    return {"data": {"status": "success", "score_awarded": score_awarded, "is_correct": is_correct}}
+
+
+@router.post("/assessment-results/{result_id}/answers", response_model=UnifiedResponse[schemas.SubmitAnswersBatchResponse])
+async def submit_answers_batch(
+    result_id: int, *, db: AsyncSession = Depends(get_async_db), answers_in: List[schemas.SubmitAnswerRequest]
+):
+    """
+    批量提交答案，语义与同步版 submit_answers_batch 一致。
+    """
+    if not answers_in: raise HTTPException(status_code=400, detail="答案列表不能为空。")
+
+    state = await _load_open_state(db, result_id)
+    if any(item.examinee_identifier != state["examinee_identifier"] for item in answers_in):
+        raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+
+    question_ids = [item.question_id for item in answers_in]
+    first_answers = await crud_session_state.mark_answered_many_async(
+        db=db, result_id=result_id, question_ids=question_ids, state=state
+    )
+
+    item_results = []
+    scored_answers = []
+    rejected_ids = []
+    for answer_in, is_first in zip(answers_in, first_answers):
+        if not is_first:
+            item_results.append({"question_id": answer_in.question_id, "status": "error", "error": "该题目已被回答。"})
+            continue
+        try:
+            score_awarded, is_correct = await crud_answer_log.score_submission_async(
+                db=db, question_bank_id=state["question_bank_id"], answer_in=answer_in
+            )
+        except ValueError as e:
+            rejected_ids.append(answer_in.question_id)
+            item_results.append({"question_id": answer_in.question_id, "status": "error", "error": str(e)})
+            continue
+        scored_answers.append((answer_in, score_awarded))
+        item_results.append({
+            "question_id": answer_in.question_id, "status": "success",
+            "score_awarded": score_awarded, "is_correct": is_correct,
+        })
+    await crud_session_state.unmark_answered_many_async(result_id=result_id, question_ids=rejected_ids)
+
+    accepted_ids = [answer_in.question_id for answer_in, _ in scored_answers]
+    try:
+        score_delta, duplicate_ids = await _persist_scored_answers(db, result_id, scored_answers) if scored_answers else (0, set())
+    except Exception:
+        await crud_session_state.unmark_answered_many_async(result_id=result_id, question_ids=accepted_ids)
+        raise
+
+    # 落库时已有答题日志的题目（并发重复提交越过了已答标记）未计分，改为错误结果
+    for i, item in enumerate(item_results):
+        if item["status"] == "success" and item["question_id"] in duplicate_ids:
+            item_results[i] = {"question_id": item["question_id"], "status": "error", "error": "该题目已被回答。"}
+    accepted_count = len(scored_answers) - len(duplicate_ids)
+    return {"data": {"results": item_results, "accepted_count": accepted_count, "score_delta": score_delta}}
+
+
+@router.post("/assessment-results/{result_id}/finish", response_model=UnifiedResponse)
+async def finish_assessment(
+    result_id: int, *, db: AsyncSession = Depends(get_async_db), finish_request: schemas.FinishAssessmentRequest
+):
+    state = await crud_session_state.get_session_state_async(db=db, result_id=result_id)
+    if not state: raise HTTPException(status_code=404, detail="未找到指定的考核会话。")
+
+    if state["examinee_identifier"] != finish_request.examinee_identifier: raise HTTPException(status_code=403, detail="考生标识符不匹配。")
+
+    result = await crud_assessment_result.get_async(db=db, id=result_id)
+
+    if result.end_time:
+        return UnifiedResponse(
+            code=208,
+            msg="考核已提交，请勿重复操作。",
+            data={"status": "finished", "final_score": result.total_score}
+        )
+
+    result.end_time = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+    db.add(result)
+    await db.commit()
+    await crud_session_state.invalidate_session_state_async(result_id)
+    # 会话汇总与成绩详情缓存在后台生成，不占用交卷请求（只是向进程内调度器添加任务，不阻塞）
+    # 写后模式下不等待队列刷写：此处的分数可能未包含尚未落库的答题记录，最终分数以汇总任务写回的为准
+    schedule_result_finalization([result_id])
+    return {"data": {
+        "status": "finished", "final_score": result.total_score,
+        "score_pending": answer_ingest.is_write_behind_enabled(),
+    }}
+
+
+@router.post("/platforms/{platform_id}/verify-password", response_model=UnifiedResponse)
+async def verify_platform_password(
+    platform_id: int,
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    request_body: schemas.VerifyPlatformPasswordRequest
+):
+    """
+    验证平台密码是否正确。
+    """
+    platform = await crud_platform.get_async(db=db, id=platform_id)
+    if not platform:
+        raise BusinessException(code=404, msg="平台未找到")
+
+    if not platform.hashed_password:
+        raise BusinessException(code=400, msg="该平台未设置密码保护")
+
+    # bcrypt 校验是 CPU 密集操作，放到线程池中避免阻塞事件循环
+    if not await run_in_threadpool(verify_password, request_body.password, platform.hashed_password):
+        raise BusinessException(code=401, msg="平台密码错误")
+
+    return UnifiedResponse(msg="密码验证成功")
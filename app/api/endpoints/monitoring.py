@@ -0,0 +1,59 @@
+# app/api/endpoints/monitoring.py
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING, STATE_STOPPED
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.api import deps
+from app.core.cache import cache_service, get_cache_stats, render_cache_metrics
+from app.core.scheduler import deadline_scheduler, leader_election, render_scheduler_metrics, scheduler
+from app.core.scheduler_metrics import scheduler_metrics
+from app.models import user_management as user_models
+from app.schemas.response import UnifiedResponse
+
+router = APIRouter()
+
+
+@router.get("/cache", response_model=UnifiedResponse[dict])
+def read_cache_status(current_user: user_models.User = Depends(deps.get_current_user)):
+    """
+    缓存层运行状态 (需要管理员权限)：Redis 熔断器状态与状态切换次数、内存降级缓存占用、L1 缓存条目数。
+    """
+    return {"data": get_cache_stats()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_cache_metrics(current_user: user_models.User = Depends(deps.get_current_user)):
+    """
+    缓存与调度器指标 (需要管理员权限)，Prometheus 文本格式：
+    - 缓存：按键前缀的命中 / 未命中、降级、Redis 错误、载荷大小与 Redis 往返延迟直方图；
+    - 调度器：按任务的调度延迟与执行耗时直方图、执行 / 失败 / 错过次数、强制交卷的会话数。
+    指标按进程累计，多 worker 部署时需分别抓取（持久化任务与考核结束任务只在 leader 上执行）。
+    """
+    body = render_cache_metrics() + render_scheduler_metrics()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/warmup/{assessment_id}", response_model=UnifiedResponse[dict])
+def read_warmup_report(assessment_id: int, current_user: user_models.User = Depends(deps.get_current_user)):
+    """
+    考核最近一次开考前缓存预热报告 (需要管理员权限)：总耗时，蓝图 / 答案键 / 平台调度缓存各步骤的耗时与数据量（leader 执行的共享预热）。
+    """
+    report = cache_service.get_warmup_report(assessment_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="该考核尚未执行缓存预热。")
+    return {"data": report}
+
+
+@router.get("/scheduler", response_model=UnifiedResponse[dict])
+def read_scheduler_status(current_user: user_models.User = Depends(deps.get_current_user)):
+    """
+    调度器状态 (需要管理员权限)：当前 leader、本 worker 是否为 leader、持久化调度器运行状态、
+    本 worker 上待触发的考核结束截止时间（只有 leader 在运行），以及各任务的延迟、耗时与执行次数汇总。
+    """
+    states = {STATE_STOPPED: "stopped", STATE_RUNNING: "running", STATE_PAUSED: "paused"}
+    return {"data": {
+        "election": leader_election.status(),
+        "scheduler_state": states.get(scheduler.state, str(scheduler.state)),
+        "deadlines": deadline_scheduler.status(),
+        "jobs": scheduler_metrics.summary(),
+    }}
@@ -66,15 +66,15 @@ def read_question_banks_for_platform(
     # 这里我们暂时使用 platform 的关系属性来获取
     question_banks = crud_question_bank.get_multi_by_platform(db=db, platform_id=platform_id, skip=skip, limit=limit)
 
-    # 计算每个题库的总分
+    # 批量获取各题库的总分（缓存一次 MGET，未命中的题库一次 GROUP BY 查询）
+    total_scores = crud_question_bank.get_total_scores(db=db, question_bank_ids=[bank.id for bank in question_banks])
     result = []
     for bank in question_banks:
-        total_score = crud_question_bank.get_total_score(db=db, question_bank_id=bank.id)
         result.append(schemas.QuestionBank(
             id=bank.id,
             name=bank.name,
             platform_id=bank.platform_id,
-            total_score=total_score
+            total_score=total_scores.get(bank.id, 0)
         ))
 
     return {"data": result}
@@ -2,16 +2,14 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List, Any
-import json
 from app import schemas
 from app.api import deps
+from app.core.cache import cache_service
 from app.models import user_management as user_models
 from app.crud.crud_assessment_result import crud_assessment_result
 from app.schemas.response import UnifiedResponse
+from app.services.result_finalizer import build_result_detail, load_results_with_details
 from fastapi import HTTPException
-from sqlalchemy.orm import selectinload
-from app.models.assessment_management import AssessmentResult, AnswerLog
-from app.models.question_management import Question, Option
 
 router = APIRouter()
 
@@ -28,7 +26,7 @@ def read_assessment_results(
 ):
     """
     获取一场考核的所有考生成绩详情 (需要管理员权限)
-    支持分页：skip 和 limit 参数
+    支持分页：skip 和 limit 参数；每条记录附带会话汇总（一行查询，不再加载答题日志）
     """
     # 获取总数
     total = crud_assessment_result.get_count_by_assessment(db=db, assessment_id=assessment_id)
@@ -47,7 +45,9 @@ def read_assessment_results(
             "start_time": res.start_time,
             "end_time": res.end_time,
             "examinee_identifier": res.examinee.identifier if res.examinee else "Unknown",
-            "answer_logs": [] # 列表页不需要加载详细题目，留空以提升性能
+            "answer_logs": [], # 列表页不需要加载详细题目，留空以提升性能
+            # 会话结束后由后台任务写入的汇总（作答数、答对数、各工序得分、用时），未汇总时为 None
+            "summary": schemas.ResultSummary.model_validate(res.summary) if res.summary else None,
         })
 
     return {
@@ -70,77 +70,19 @@ def read_single_assessment_result(
     current_user: user_models.User = Depends(deps.get_current_user)
 ):
     """
-    根据ID获取单次考核详情 (详情视图，包含题目信息)
+    根据ID获取单次考核详情 (详情视图，包含题目信息与会话汇总)
+    已结束的会话由后台汇总任务预热详情缓存，直接读取缓存即可
     """
-    # 1. 级联查询：结果 -> 日志 -> 题目 -> 选项
-    result = (
-        db.query(AssessmentResult)
-        .options(
-            selectinload(AssessmentResult.examinee),
-            selectinload(AssessmentResult.answer_logs)
-            .selectinload(AnswerLog.question)
-            .selectinload(Question.options)
-        )
-        .filter(AssessmentResult.id == result_id)
-        .first()
-    )
-    
-    if not result:
-        raise HTTPException(status_code=404, detail="未找到指定的考核结果。")
-    
-    # 2. 手动组装数据
-    answer_logs_details = []
-    
-    # 按题目ID排序，保证展示顺序稳定
-    sorted_logs = sorted(result.answer_logs, key=lambda x: x.question_id)
-
-    for log in sorted_logs:
-        # 处理 selected_option_ids (兼容 list 和 json string)
-        selected_ids = []
-        if log.selected_option_ids:
-            if isinstance(log.selected_option_ids, list):
-                selected_ids = log.selected_option_ids
-            elif isinstance(log.selected_option_ids, str):
-                try:
-                    selected_ids = json.loads(log.selected_option_ids)
-                except:
-                    selected_ids = []
-
-        # 基础日志数据
-        log_data = {
-            "question_id": log.question_id,
-            "score_awarded": log.score_awarded,
-            "answered_at": log.answered_at,
-            "selected_option_ids": selected_ids,
-            "question": None # 默认为 None
-        }
-
-        # 注入题目详情 (Snapshoting)
-        if log.question:
-            log_data["question"] = {
-                "prompt": log.question.prompt,
-                "question_type": log.question.question_type,
-                "score": log.question.score,
-                "options": [
-                    {
-                        "id": opt.id, 
-                        "option_text": opt.option_text, 
-                        "is_correct": opt.is_correct
-                    } 
-                    # 选项也排个序
-                    for opt in sorted(log.question.options, key=lambda x: x.id)
-                ]
-            }
-        
-        answer_logs_details.append(log_data)
+    detailed_result = cache_service.get_result_detail(result_id)
+    if detailed_result is None:
+        # 级联查询：结果 -> 日志 -> 题目 -> 选项
+        results = load_results_with_details(db, [result_id])
+        if not results:
+            raise HTTPException(status_code=404, detail="未找到指定的考核结果。")
+        result = results[0]
+        detailed_result = build_result_detail(result)
+        # 进行中或尚未汇总的会话不缓存（汇总完成时会写入）
+        if result.end_time and result.summary:
+            cache_service.set_result_detail(result_id, result.assessment.question_bank_id, detailed_result)
 
-    detailed_result = {
-        "id": result.id,
-        "total_score": result.total_score,
-        "start_time": result.start_time,
-        "end_time": result.end_time,
-        "examinee_identifier": result.examinee.identifier if result.examinee else "Unknown",
-        "answer_logs": answer_logs_details
-    }
-    
     return {"code": 200, "msg": "success", "data": detailed_result}
@@ -2,59 +2,291 @@
 """
 Redis 缓存服务模块
 提供统一的缓存操作接口，支持降级到内存缓存
+读取热点数据时先查进程内 L1 缓存，键被删除时通过 Redis 发布/订阅通知所有 worker 逐出
 """
-import json
+import asyncio
+import inspect
 import logging
-from typing import Optional, Any, Callable
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional, Any, Callable, Dict, Iterable, List, Set, Tuple
 from functools import wraps
 import redis
+import redis.asyncio as redis_asyncio
+from redis.client import NEVER_DECODE
+from app.core import cache_codec
 from app.core.config import settings
+from app.core.local_cache import LRUCache, MemoryCache
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.cache_metrics import CacheMetrics
+from app.core.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 # Redis 客户端实例
 _redis_client: Optional[redis.Redis] = None
+_async_redis_client: Optional[redis_asyncio.Redis] = None
 
-# 内存缓存（降级方案）
-_memory_cache: dict = {}
+# Redis 熔断器：连接失败后在退避时间内直接使用内存缓存，不再逐次等待连接超时
+# 同步与异步客户端各自独立（连接池与事件循环不同）
+_redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+    backoff_base=settings.REDIS_BREAKER_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.REDIS_BREAKER_BACKOFF_MAX_SECONDS,
+    failure_window=settings.REDIS_BREAKER_FAILURE_WINDOW_SECONDS,
+)
+_async_redis_breaker = CircuitBreaker(
+    "redis_async",
+    failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+    backoff_base=settings.REDIS_BREAKER_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.REDIS_BREAKER_BACKOFF_MAX_SECONDS,
+    failure_window=settings.REDIS_BREAKER_FAILURE_WINDOW_SECONDS,
+)
+
+# 内存缓存（降级方案）：有界 LRU + 字节预算 + 逐键 TTL
+_memory_cache = MemoryCache(settings.CACHE_MEMORY_MAX_ITEMS, settings.CACHE_MEMORY_MAX_BYTES)
+
+# 按键前缀统计的命中率、降级、Redis 延迟等指标
+cache_metrics = CacheMetrics(enabled=settings.CACHE_METRICS_ENABLED)
+
+# 进程内 L1 缓存：只缓存 CACHE_L1_PREFIXES 前缀的键
+_l1_cache = LRUCache(settings.CACHE_L1_MAX_ITEMS, settings.CACHE_L1_TTL_SECONDS)
+_l1_prefixes = tuple(p.strip() for p in settings.CACHE_L1_PREFIXES.split(",") if p.strip())
+
+# 缓存值经 cache_codec 编码为字节；客户端默认解码响应，读取这些键时需要拿到原始字节
+_RAW_REPLY = {NEVER_DECODE: []}
+
+# 本进程标识，用于忽略自己发布的失效通知
+_instance_id = uuid.uuid4().hex[:12]
+_invalidation_thread: Optional[threading.Thread] = None
+_invalidation_stop = threading.Event()
+
+
+def _redis_kwargs() -> dict:
+    return dict(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        decode_responses=True,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+        retry_on_timeout=True,
+        health_check_interval=30
+    )
 
 
 def get_redis_client() -> Optional[redis.Redis]:
     """
     获取 Redis 客户端实例（单例模式）
-    如果 Redis 不可用，返回 None
+    如果 Redis 不可用（或熔断器处于断开状态），返回 None
     """
     global _redis_client
 
     if not settings.REDIS_ENABLED:
         return None
 
-    if _redis_client is None:
+    if not _redis_breaker.allow():
+        return None
+
+    # 首次连接，或熔断器半开时的探测
+    if _redis_client is None or _redis_breaker.state == CircuitBreaker.HALF_OPEN:
         try:
-            _redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB,
-                password=settings.REDIS_PASSWORD,
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5,
-                retry_on_timeout=True,
-                health_check_interval=30
-            )
+            client = _redis_client or redis.Redis(**_redis_kwargs())
             # 测试连接
-            _redis_client.ping()
+            client.ping()
+            _redis_client = client
+            _redis_breaker.record_success()
             logger.info(f"Redis 连接成功: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
-        except redis.ConnectionError as e:
+        except (redis.RedisError, OSError) as e:
             logger.warning(f"Redis 连接失败，将使用内存缓存: {e}")
-            _redis_client = None
-        except Exception as e:
-            logger.warning(f"Redis 初始化异常: {e}")
-            _redis_client = None
+            _redis_breaker.record_failure(force_open=True)
+            return None
 
     return _redis_client
 
 
+async def get_async_redis_client() -> Optional[redis_asyncio.Redis]:
+    """
+    获取异步 Redis 客户端实例（单例模式，供异步客户端接口使用）
+    如果 Redis 不可用（或熔断器处于断开状态），返回 None
+    """
+    global _async_redis_client
+
+    if not settings.REDIS_ENABLED:
+        return None
+
+    if not _async_redis_breaker.allow():
+        return None
+
+    if _async_redis_client is None or _async_redis_breaker.state == CircuitBreaker.HALF_OPEN:
+        client = _async_redis_client or redis_asyncio.Redis(**_redis_kwargs())
+        try:
+            await client.ping()
+            _async_redis_client = client
+            _async_redis_breaker.record_success()
+            logger.info(f"异步 Redis 连接成功: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        except (redis.RedisError, OSError) as e:
+            logger.warning(f"异步 Redis 连接失败，将使用内存缓存: {e}")
+            _async_redis_breaker.record_failure(force_open=True)
+            if client is not _async_redis_client:
+                await client.aclose()
+            return None
+
+    return _async_redis_client
+
+
+@contextmanager
+def _redis_call(key: str, operation: str, breaker: CircuitBreaker = _redis_breaker):
+    """包裹一次 Redis 调用：记录指标，成功后清零熔断器的失败计数（闭合且无失败时只是一次判断）"""
+    with cache_metrics.redis_call(key, operation):
+        yield
+    breaker.record_success()
+
+
+def _redis_failed(operation: str, error: Exception, breaker: CircuitBreaker = _redis_breaker) -> None:
+    """记录 Redis 操作失败；连接类错误计入熔断器，连续失败达到阈值后断开"""
+    logger.warning(f"Redis {operation} 失败: {error}")
+    if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+        breaker.record_failure()
+
+
+def get_cache_stats() -> dict:
+    """缓存层运行状态（熔断器、内存降级缓存、L1），供监控接口使用"""
+    return {
+        "redis_enabled": settings.REDIS_ENABLED,
+        "redis_connected": _redis_client is not None and _redis_breaker.state == CircuitBreaker.CLOSED,
+        "breakers": [_redis_breaker.stats(), _async_redis_breaker.stats()],
+        "memory": _memory_cache.stats(),
+        "l1": {"enabled": settings.CACHE_L1_ENABLED, "items": len(_l1_cache), "max_items": _l1_cache.max_items},
+        "prefixes": cache_metrics.summary(),
+    }
+
+
+_BREAKER_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+def render_cache_metrics() -> str:
+    """Prometheus 文本格式的缓存指标（计数器与直方图 + 熔断器、内存缓存、L1 的瞬时值）"""
+    memory = _memory_cache.stats()
+    gauges = [
+        ("cache_memory_items", "内存降级缓存条目数", {}, memory["items"]),
+        ("cache_memory_bytes", "内存降级缓存估算字节数", {}, memory["bytes"]),
+        ("cache_l1_items", "L1 缓存条目数", {}, len(_l1_cache)),
+    ]
+    for breaker in (_redis_breaker, _async_redis_breaker):
+        gauges.append((
+            "cache_redis_breaker_state", "Redis 熔断器状态（0 闭合 / 1 半开 / 2 断开）",
+            {"name": breaker.name}, _BREAKER_STATE_VALUES[breaker.state],
+        ))
+    return cache_metrics.render_prometheus(gauges)
+
+
+# ============ L1 缓存与跨 worker 失效 ============
+
+def _l1_enabled(key: str) -> bool:
+    return settings.CACHE_L1_ENABLED and key.startswith(_l1_prefixes)
+
+
+def _l1_evict(target: str) -> None:
+    """逐出本进程 L1 中的键；以 * 结尾表示按前缀逐出（单独的 * 表示全部）"""
+    if target.endswith("*"):
+        _l1_cache.delete_prefix(target.rstrip("*"))
+    else:
+        _l1_cache.delete(target)
+
+
+def _invalidation_messages(targets) -> List[str]:
+    """需要广播的失效通知：模式总是广播，普通键只有进入 L1 的才广播"""
+    if not settings.CACHE_L1_ENABLED:
+        return []
+    return [f"{_instance_id} {t}" for t in targets if t.endswith("*") or _l1_enabled(t)]
+
+
+def _publish_invalidation(client: redis.Redis, *targets: str) -> None:
+    for t in targets:
+        _l1_evict(t)
+    messages = _invalidation_messages(targets)
+    if not client or not messages:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for message in messages:
+            pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, message)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"缓存失效通知发布失败: {e}")
+
+
+async def _publish_invalidation_async(client: Optional[redis_asyncio.Redis], *targets: str) -> None:
+    for t in targets:
+        _l1_evict(t)
+    messages = _invalidation_messages(targets)
+    if not client or not messages:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for message in messages:
+            pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, message)
+        await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"缓存失效通知发布失败: {e}")
+
+
+def _listen_invalidations() -> None:
+    """后台线程：订阅失效频道，逐出其他 worker 通知的键；连接断开时自动重连"""
+    while not _invalidation_stop.is_set():
+        client = get_redis_client()
+        if client is None:
+            _invalidation_stop.wait(5)
+            continue
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            # (重新)订阅前可能错过了通知，清空 L1 保证一致
+            _l1_cache.clear()
+            while not _invalidation_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if not message:
+                    continue
+                origin, _, target = message["data"].partition(" ")
+                if origin != _instance_id:
+                    _l1_evict(target)
+        except redis.RedisError as e:
+            logger.warning(f"缓存失效订阅中断，稍后重连: {e}")
+            _l1_cache.clear()
+            _invalidation_stop.wait(1)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+def start_cache_invalidation_listener() -> None:
+    """启动缓存失效订阅线程（应用启动时调用）"""
+    global _invalidation_thread
+    if not settings.CACHE_L1_ENABLED or not settings.REDIS_ENABLED:
+        return
+    if _invalidation_thread and _invalidation_thread.is_alive():
+        return
+    _invalidation_stop.clear()
+    _invalidation_thread = threading.Thread(
+        target=_listen_invalidations, name="cache-invalidation", daemon=True
+    )
+    _invalidation_thread.start()
+
+
+def stop_cache_invalidation_listener() -> None:
+    """停止缓存失效订阅线程（应用关闭时调用）"""
+    _invalidation_stop.set()
+    if _invalidation_thread:
+        _invalidation_thread.join(timeout=2)
+
+
 class CacheService:
     """
     缓存服务类
@@ -65,44 +297,184 @@ class CacheService:
     PREFIX_BLUEPRINT = "blueprint:"
     PREFIX_ASSESSMENT = "assessment:"
     PREFIX_PLATFORM = "platform:"
+    PREFIX_ANSWER_KEY = "answer_key:"
+    PREFIX_BANK_VERSION = "bank_version:"
+    PREFIX_PLATFORM_VERSION = "platform_version:"
+    # 全部平台调度缓存的命名空间版本号（不指定平台失效时递增）
+    ASSESSMENT_VERSION_KEY = "assessment_version"
+    PREFIX_SESSION = "session:"
+    PREFIX_LOCK = "lock:"
+    PREFIX_WARMUP = "warmup:"
+    PREFIX_BANK_TOTAL = "bank_total:"
+    PREFIX_RESULT_COUNT = "result_count:"
+    PREFIX_RESULT_DETAIL = "result_detail:"
 
     @staticmethod
     def _get_client() -> Optional[redis.Redis]:
         return get_redis_client()
 
+    # ============ 缓存键 ============
+
+    @classmethod
+    def blueprint_key(cls, question_bank_id: int, version: int) -> str:
+        return f"{cls.PREFIX_BLUEPRINT}{question_bank_id}:v{version}"
+
+    @classmethod
+    def bank_version_key(cls, question_bank_id: int) -> str:
+        return f"{cls.PREFIX_BANK_VERSION}{question_bank_id}"
+
+    @classmethod
+    def platform_version_key(cls, platform_id: int) -> str:
+        return f"{cls.PREFIX_PLATFORM_VERSION}{platform_id}"
+
+    @classmethod
+    def answer_key_key(cls, question_bank_id: int, version: int) -> str:
+        return f"{cls.PREFIX_ANSWER_KEY}{question_bank_id}:v{version}"
+
+    @classmethod
+    def session_key(cls, result_id: int) -> str:
+        return f"{cls.PREFIX_SESSION}{result_id}"
+
+    @classmethod
+    def answered_key(cls, result_id: int) -> str:
+        return f"{cls.PREFIX_SESSION}{result_id}:answered"
+
+    @classmethod
+    def upcoming_key(cls, platform_id: int, version: str) -> str:
+        return f"{cls.PREFIX_ASSESSMENT}upcoming:{platform_id}:v{version}"
+
+    @classmethod
+    def lock_key(cls, name: str) -> str:
+        return f"{cls.PREFIX_LOCK}{name}"
+
+    @classmethod
+    def warmup_key(cls, assessment_id: int) -> str:
+        return f"{cls.PREFIX_WARMUP}{assessment_id}"
+
+    @classmethod
+    def bank_total_score_key(cls, question_bank_id: int) -> str:
+        return f"{cls.PREFIX_BANK_TOTAL}{question_bank_id}"
+
+    @classmethod
+    def result_count_key(cls, assessment_id: int) -> str:
+        return f"{cls.PREFIX_RESULT_COUNT}{assessment_id}"
+
+    @classmethod
+    def result_detail_key(cls, result_id: int) -> str:
+        return f"{cls.PREFIX_RESULT_DETAIL}{result_id}"
+
     @classmethod
     def get(cls, key: str) -> Optional[Any]:
         """获取缓存值"""
+        use_l1 = _l1_enabled(key)
+        if use_l1:
+            hit, value = _l1_cache.get(key)
+            if hit:
+                cache_metrics.record_lookup(key, "l1", True)
+                return value
+
         client = cls._get_client()
 
         if client:
             try:
-                value = client.get(key)
-                if value:
-                    return json.loads(value)
+                with _redis_call(key, "GET"):
+                    raw = client.execute_command("GET", key, **_RAW_REPLY)
+                if raw:
+                    value = cache_codec.decode(raw)
+                    cache_metrics.record_lookup(key, "redis", True, len(raw))
+                    if use_l1:
+                        _l1_cache.set(key, value)
+                    return value
+                cache_metrics.record_lookup(key, "redis", False)
             except redis.RedisError as e:
-                logger.warning(f"Redis GET 失败: {e}")
-            except json.JSONDecodeError as e:
+                _redis_failed("GET", e)
+                client = None
+            except cache_codec.CacheDecodeError as e:
                 logger.warning(f"缓存数据解析失败: {e}")
+                cache_metrics.record_lookup(key, "redis", False)
 
         # 降级到内存缓存
-        return _memory_cache.get(key)
+        value = _memory_cache.get(key)
+        if not client:
+            cache_metrics.record_fallback(key, "GET")
+            cache_metrics.record_lookup(key, "memory", value is not None)
+        return value
 
     @classmethod
     def set(cls, key: str, value: Any, ttl: int = 3600) -> bool:
         """设置缓存值"""
         client = cls._get_client()
-        serialized = json.dumps(value, ensure_ascii=False, default=str)
+        serialized = cache_codec.encode(value)
+        cache_metrics.record_write(key, len(serialized))
+
+        if client:
+            try:
+                with _redis_call(key, "SET"):
+                    client.setex(key, ttl, serialized)
+                if _l1_enabled(key):
+                    _l1_cache.set(key, value, ttl)
+                return True
+            except redis.RedisError as e:
+                _redis_failed("SET", e)
+
+        # 降级到内存缓存
+        cache_metrics.record_fallback(key, "SET")
+        _memory_cache.set(key, value, ttl)
+        return True
+
+    @classmethod
+    def get_raw(cls, key: str) -> Optional[bytes]:
+        """获取原始字节缓存值（不做反序列化，供预序列化数据使用）"""
+        use_l1 = _l1_enabled(key)
+        if use_l1:
+            hit, value = _l1_cache.get(key)
+            if hit:
+                cache_metrics.record_lookup(key, "l1", True)
+                return value
+
+        client = cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "GET"):
+                    raw = client.execute_command("GET", key, **_RAW_REPLY)
+                if raw:
+                    value = cache_codec.decode_raw(raw)
+                    cache_metrics.record_lookup(key, "redis", True, len(raw))
+                    if use_l1:
+                        _l1_cache.set(key, value)
+                    return value
+                cache_metrics.record_lookup(key, "redis", False)
+            except redis.RedisError as e:
+                _redis_failed("GET", e)
+                client = None
+
+        value = _memory_cache.get(key)
+        value = value if isinstance(value, bytes) else None
+        if not client:
+            cache_metrics.record_fallback(key, "GET")
+            cache_metrics.record_lookup(key, "memory", value is not None)
+        return value
+
+    @classmethod
+    def set_raw(cls, key: str, value: bytes, ttl: int = 3600) -> bool:
+        """设置原始字节缓存值（调用方已完成序列化，这里只按需压缩并加编码头）"""
+        client = cls._get_client()
+        encoded = cache_codec.encode_raw(value)
+        cache_metrics.record_write(key, len(encoded))
 
         if client:
             try:
-                client.setex(key, ttl, serialized)
+                with _redis_call(key, "SET"):
+                    client.setex(key, ttl, encoded)
+                if _l1_enabled(key):
+                    _l1_cache.set(key, value, ttl)
                 return True
             except redis.RedisError as e:
-                logger.warning(f"Redis SET 失败: {e}")
+                _redis_failed("SET", e)
 
-        # 降级到内存缓存（不支持 TTL）
-        _memory_cache[key] = value
+        cache_metrics.record_fallback(key, "SET")
+        _memory_cache.set(key, value, ttl)
         return True
 
     @classmethod
@@ -114,15 +486,202 @@ class CacheService:
             try:
                 client.delete(key)
             except redis.RedisError as e:
-                logger.warning(f"Redis DELETE 失败: {e}")
+                _redis_failed("DELETE", e)
+
+        # 同时清理内存缓存，并通知所有 worker 逐出 L1
+        _memory_cache.delete(key)
+        _publish_invalidation(client, key)
+        return True
+
+    # ============ 批量操作 ============
+    # 一次 Redis 往返读写多个键（MGET / 管道）；批量调用的延迟按第一个键的前缀计入指标
+
+    @classmethod
+    def get_many(cls, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量获取缓存值，返回 {键: 值}，只包含命中的键"""
+        result: Dict[str, Any] = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            if _l1_enabled(key):
+                hit, value = _l1_cache.get(key)
+                if hit:
+                    cache_metrics.record_lookup(key, "l1", True)
+                    result[key] = value
+                    continue
+            pending.append(key)
+        if not pending:
+            return result
+
+        client = cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(pending[0], "MGET"):
+                    replies = client.execute_command("MGET", *pending, **_RAW_REPLY)
+                missing = []
+                for key, raw in zip(pending, replies):
+                    try:
+                        value = cache_codec.decode(raw) if raw else None
+                    except cache_codec.CacheDecodeError as e:
+                        logger.warning(f"缓存数据解析失败: {e}")
+                        raw = None
+                    if not raw:
+                        cache_metrics.record_lookup(key, "redis", False)
+                        missing.append(key)
+                        continue
+                    cache_metrics.record_lookup(key, "redis", True, len(raw))
+                    if _l1_enabled(key):
+                        _l1_cache.set(key, value)
+                    result[key] = value
+                # 与 get 一致：Redis 未命中的键再查一次内存缓存
+                result.update(_memory_cache.get_many(missing))
+                return result
+            except redis.RedisError as e:
+                _redis_failed("MGET", e)
+
+        found = _memory_cache.get_many(pending)
+        for key in pending:
+            cache_metrics.record_fallback(key, "MGET")
+            cache_metrics.record_lookup(key, "memory", key in found)
+        result.update(found)
+        return result
+
+    @classmethod
+    def set_many(cls, items: Dict[str, Any], ttl: int = 3600) -> bool:
+        """批量设置缓存值（同一 TTL，一次管道往返）"""
+        if not items:
+            return True
+        serialized = {key: cache_codec.encode(value) for key, value in items.items()}
+        for key, value in serialized.items():
+            cache_metrics.record_write(key, len(value))
+        client = cls._get_client()
+
+        if client:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, value in serialized.items():
+                    pipe.setex(key, ttl, value)
+                with _redis_call(next(iter(items)), "MSET"):
+                    pipe.execute()
+                for key, value in items.items():
+                    if _l1_enabled(key):
+                        _l1_cache.set(key, value, ttl)
+                return True
+            except redis.RedisError as e:
+                _redis_failed("MSET", e)
 
-        # 同时清理内存缓存
-        _memory_cache.pop(key, None)
+        for key in items:
+            cache_metrics.record_fallback(key, "MSET")
+        _memory_cache.set_many(items, ttl)
         return True
 
+    @classmethod
+    def delete_many(cls, keys: Iterable[str]) -> bool:
+        """批量删除缓存（一次 DEL），并通知所有 worker 逐出 L1"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return True
+        client = cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(keys[0], "DELETE"):
+                    client.delete(*keys)
+            except redis.RedisError as e:
+                _redis_failed("DELETE", e)
+
+        _memory_cache.delete(*keys)
+        _publish_invalidation(client, *keys)
+        return True
+
+    @classmethod
+    def is_distributed(cls) -> bool:
+        """当前是否使用 Redis（多进程共享）；False 表示已降级为进程内内存缓存"""
+        return cls._get_client() is not None
+
+    @classmethod
+    def set_add(cls, key: str, *members: Any, ttl: Optional[int] = None) -> int:
+        """向集合添加成员，返回新增成员数（已存在的成员不计入）"""
+        if not members:
+            return 0
+        client = cls._get_client()
+
+        if client:
+            try:
+                pipe = client.pipeline()
+                pipe.sadd(key, *members)
+                if ttl:
+                    pipe.expire(key, ttl)
+                with _redis_call(key, "SADD"):
+                    return pipe.execute()[0]
+            except redis.RedisError as e:
+                _redis_failed("SADD", e)
+
+        # 降级到内存缓存（成员统一转为字符串，与 Redis 行为一致）
+        cache_metrics.record_fallback(key, "SADD")
+        return sum(_memory_cache.set_add_each(key, members, ttl))
+
+    @classmethod
+    def set_add_each(cls, key: str, members: List[Any], ttl: Optional[int] = None) -> List[bool]:
+        """逐个向集合添加成员（一次管道往返），返回每个成员是否为新增"""
+        if not members:
+            return []
+        client = cls._get_client()
+
+        if client:
+            try:
+                pipe = client.pipeline()
+                for member in members:
+                    pipe.sadd(key, member)
+                if ttl:
+                    pipe.expire(key, ttl)
+                with _redis_call(key, "SADD"):
+                    replies = pipe.execute()
+                return [bool(reply) for reply in replies[:len(members)]]
+            except redis.RedisError as e:
+                _redis_failed("SADD", e)
+
+        cache_metrics.record_fallback(key, "SADD")
+        return _memory_cache.set_add_each(key, members, ttl)
+
+    @classmethod
+    def set_remove(cls, key: str, *members: Any) -> int:
+        """从集合移除成员"""
+        if not members:
+            return 0
+        client = cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "SREM"):
+                    return client.srem(key, *members)
+            except redis.RedisError as e:
+                _redis_failed("SREM", e)
+
+        cache_metrics.record_fallback(key, "SREM")
+        return _memory_cache.set_remove(key, members)
+
+    @classmethod
+    def set_members(cls, key: str) -> set:
+        """获取集合全部成员（字符串）"""
+        client = cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "SMEMBERS"):
+                    return client.smembers(key)
+            except redis.RedisError as e:
+                _redis_failed("SMEMBERS", e)
+
+        cache_metrics.record_fallback(key, "SMEMBERS")
+        return _memory_cache.set_members(key)
+
     @classmethod
     def delete_pattern(cls, pattern: str) -> int:
-        """删除匹配模式的所有键"""
+        """
+        删除匹配模式的所有键（SCAN 遍历整个键空间，仅供运维清理使用）。
+        业务缓存失效请递增命名空间版本号（见 incr_counter），旧键随 TTL 自然过期。
+        """
         client = cls._get_client()
         deleted_count = 0
 
@@ -136,13 +695,12 @@ class CacheService:
                     if cursor == 0:
                         break
             except redis.RedisError as e:
-                logger.warning(f"Redis DELETE PATTERN 失败: {e}")
+                _redis_failed("DELETE PATTERN", e)
 
-        # 同时清理内存缓存
-        keys_to_delete = [k for k in _memory_cache.keys() if k.startswith(pattern.replace("*", ""))]
-        for k in keys_to_delete:
-            _memory_cache.pop(k, None)
-            deleted_count += 1
+        # 同时清理内存缓存（前缀索引，无需扫描全部键）
+        deleted_count += _memory_cache.delete_prefix(pattern.replace("*", ""))
+
+        _publish_invalidation(client, pattern)
 
         return deleted_count
 
@@ -155,81 +713,855 @@ class CacheService:
             try:
                 client.flushdb()
             except redis.RedisError as e:
-                logger.warning(f"Redis FLUSHDB 失败: {e}")
+                _redis_failed("FLUSHDB", e)
 
         _memory_cache.clear()
+        _publish_invalidation(client, "*")
         return True
 
+    # ============ 分布式锁 ============
+
+    @classmethod
+    def try_lock(cls, name: str, ttl: float) -> Tuple[bool, Optional[Any]]:
+        """
+        非阻塞地获取跨 worker 互斥锁，ttl 秒后自动释放（持有者崩溃时不会死锁）。
+        返回 (是否可以继续, 锁对象)：
+        - (True, lock)：已获得锁，用完后调用 release_lock；
+        - (False, None)：锁由其他 worker 持有；
+        - (True, None)：Redis 不可用，调用方只依赖进程内互斥。
+        """
+        client = cls._get_client()
+
+        if client:
+            try:
+                lock = client.lock(cls.lock_key(name), timeout=ttl, blocking=False)
+                if lock.acquire():
+                    return True, lock
+                return False, None
+            except redis.RedisError as e:
+                _redis_failed("LOCK", e)
+
+        return True, None
+
+    @classmethod
+    def is_locked(cls, name: str) -> bool:
+        """锁是否仍被持有；Redis 不可用时视为未持有"""
+        client = cls._get_client()
+
+        if client:
+            try:
+                return bool(client.exists(cls.lock_key(name)))
+            except redis.RedisError as e:
+                _redis_failed("EXISTS", e)
+
+        return False
+
+    @staticmethod
+    def release_lock(lock: Optional[Any]) -> None:
+        if lock is None:
+            return
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            # 锁已过期（可能已被其他 worker 重新获得），不能误删
+            logger.warning(f"释放锁时发现锁已过期: {lock.name}")
+        except redis.RedisError as e:
+            _redis_failed("UNLOCK", e)
+
+    # ============ 业务相关的缓存方法 ============
+
+    # ============ 命名空间版本号 ============
+    # 派生缓存的键中嵌入版本号，失效时只需一次 INCR，旧键不再被读取并随 TTL 过期，
+    # 失效开销与已缓存的键数量无关。
+
+    @classmethod
+    def get_counter(cls, key: str) -> int:
+        """读取版本号计数器（不存在时为 0）"""
+        use_l1 = _l1_enabled(key)
+        if use_l1:
+            hit, value = _l1_cache.get(key)
+            if hit:
+                cache_metrics.record_lookup(key, "l1", True)
+                return value
+
+        client = cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "GET"):
+                    value = client.get(key)
+                cache_metrics.record_lookup(key, "redis", bool(value))
+                version = int(value) if value else 0
+                if use_l1:
+                    _l1_cache.set(key, version)
+                return version
+            except redis.RedisError as e:
+                _redis_failed("GET", e)
+
+        cache_metrics.record_fallback(key, "GET")
+        version = _memory_cache.get(key)
+        cache_metrics.record_lookup(key, "memory", version is not None)
+        return version or 0
+
+    @classmethod
+    def incr_counter(cls, key: str) -> int:
+        """递增版本号计数器，并通知所有 worker 逐出 L1 中的旧值"""
+        client = cls._get_client()
+
+        if client:
+            try:
+                version = client.incr(key)
+                _publish_invalidation(client, key)
+                return version
+            except redis.RedisError as e:
+                _redis_failed("INCR", e)
+
+        version = _memory_cache.incr(key)
+        _l1_evict(key)
+        return version
+
+    @classmethod
+    def get_bank_version(cls, question_bank_id: int) -> int:
+        """获取题库内容版本号（题库、工序、题目变更时递增）"""
+        return cls.get_counter(cls.bank_version_key(question_bank_id))
+
+    @classmethod
+    def bump_bank_version(cls, question_bank_id: int) -> int:
+        """递增题库内容版本号，使按版本缓存的派生数据（蓝图、答案键）全部失效"""
+        return cls.incr_counter(cls.bank_version_key(question_bank_id))
+
+    @classmethod
+    def get_platform_version(cls, platform_id: int) -> str:
+        """平台调度缓存的版本号："{全局版本}.{平台版本}"，任一递增都会使缓存失效"""
+        return f"{cls.get_counter(cls.ASSESSMENT_VERSION_KEY)}.{cls.get_counter(cls.platform_version_key(platform_id))}"
+
     # ============ 业务相关的缓存方法 ============
 
     @classmethod
-    def get_blueprint(cls, question_bank_id: int) -> Optional[list]:
-        """获取题库蓝图缓存"""
-        key = f"{cls.PREFIX_BLUEPRINT}{question_bank_id}"
-        return cls.get(key)
+    def get_blueprint(cls, question_bank_id: int, version: int) -> Optional[bytes]:
+        """获取题库蓝图缓存（已序列化的 JSON 字节）"""
+        key = cls.blueprint_key(question_bank_id, version)
+        return cls.get_raw(key)
 
     @classmethod
-    def set_blueprint(cls, question_bank_id: int, blueprint: list) -> bool:
-        """设置题库蓝图缓存"""
-        key = f"{cls.PREFIX_BLUEPRINT}{question_bank_id}"
-        # 将 Pydantic 模型转为字典
-        data = [proc.model_dump() if hasattr(proc, 'model_dump') else proc for proc in blueprint]
-        return cls.set(key, data, ttl=settings.CACHE_TTL_BLUEPRINT)
+    def set_blueprint(cls, question_bank_id: int, version: int, payload: bytes) -> bool:
+        """设置题库蓝图缓存，payload 为 orjson 序列化后的工序列表（键中包含版本号，旧版本随 TTL 自然过期）"""
+        key = cls.blueprint_key(question_bank_id, version)
+        return cls.set_raw(key, payload, ttl=settings.CACHE_TTL_BLUEPRINT)
 
     @classmethod
     def invalidate_blueprint(cls, question_bank_id: int) -> bool:
-        """使题库蓝图缓存失效"""
-        key = f"{cls.PREFIX_BLUEPRINT}{question_bank_id}"
-        return cls.delete(key)
+        """使题库蓝图缓存失效（递增题库版本号）"""
+        cls.bump_bank_version(question_bank_id)
+        return True
+
+    @classmethod
+    def get_answer_key(cls, question_bank_id: int, version: int) -> Optional[dict]:
+        """获取题库答案键缓存"""
+        key = cls.answer_key_key(question_bank_id, version)
+        return cls.get(key)
+
+    @classmethod
+    def set_answer_key(cls, question_bank_id: int, version: int, answer_key: dict) -> bool:
+        """设置题库答案键缓存（键中包含版本号，旧版本随 TTL 自然过期）"""
+        key = cls.answer_key_key(question_bank_id, version)
+        return cls.set(key, answer_key, ttl=settings.CACHE_TTL_BLUEPRINT)
+
+    @classmethod
+    def get_session_state(cls, result_id: int) -> Optional[dict]:
+        """获取考核会话状态缓存"""
+        return cls.get(cls.session_key(result_id))
+
+    @classmethod
+    def set_session_state(cls, result_id: int, state: dict, answered_question_ids, ttl: int) -> bool:
+        """设置考核会话状态缓存，并将已答题目并入已答集合"""
+        cls.set(cls.session_key(result_id), state, ttl=ttl)
+        key = cls.answered_key(result_id)
+        if answered_question_ids:
+            cls.set_add(key, *answered_question_ids, ttl=ttl)
+        return True
+
+    @classmethod
+    def add_answered_question(cls, result_id: int, question_id: int, ttl: int) -> bool:
+        """将题目加入会话已答集合，返回 False 表示该题已答过"""
+        return cls.set_add(cls.answered_key(result_id), question_id, ttl=ttl) > 0
 
     @classmethod
-    def get_upcoming_assessment(cls, platform_id: int) -> Optional[dict]:
-        """获取平台即将进行的考核缓存"""
-        key = f"{cls.PREFIX_ASSESSMENT}upcoming:{platform_id}"
+    def add_answered_questions(cls, result_id: int, question_ids: List[int], ttl: int) -> List[bool]:
+        """批量将题目加入会话已答集合，返回每道题是否为首次作答"""
+        return cls.set_add_each(cls.answered_key(result_id), question_ids, ttl=ttl)
+
+    @classmethod
+    def remove_answered_question(cls, result_id: int, *question_ids: int) -> bool:
+        """从会话已答集合中移除题目（答题失败时回滚）"""
+        return cls.set_remove(cls.answered_key(result_id), *question_ids) > 0
+
+    @classmethod
+    def get_answered_questions(cls, result_id: int) -> set:
+        """获取会话已答题目ID集合"""
+        return {int(m) for m in cls.set_members(cls.answered_key(result_id))}
+
+    @classmethod
+    def invalidate_session_state(cls, result_id: int) -> bool:
+        """使考核会话状态缓存失效（交卷、强制交卷时调用）"""
+        return cls.invalidate_session_states([result_id])
+
+    @classmethod
+    def drop_session_states(cls, result_ids: Iterable[int]) -> bool:
+        """只删除会话状态、保留已答集合（考核信息变更后按最新信息重建，不丢失尚未落库的已答标记）"""
+        return cls.delete_many([cls.session_key(result_id) for result_id in result_ids])
+
+    @classmethod
+    def invalidate_session_states(cls, result_ids: Iterable[int]) -> bool:
+        """批量使考核会话状态缓存失效（批量强制交卷时一次删除全部键）"""
+        keys = []
+        for result_id in result_ids:
+            keys.append(cls.session_key(result_id))
+            keys.append(cls.answered_key(result_id))
+        return cls.delete_many(keys)
+
+    @classmethod
+    def get_upcoming_assessment(cls, platform_id: int, version: str) -> Optional[dict]:
+        """获取平台即将进行的考核缓存（version 由 get_platform_version 取得）"""
+        key = cls.upcoming_key(platform_id, version)
         return cls.get(key)
 
     @classmethod
-    def set_upcoming_assessment(cls, platform_id: int, assessment: dict) -> bool:
-        """设置平台即将进行的考核缓存"""
-        key = f"{cls.PREFIX_ASSESSMENT}upcoming:{platform_id}"
-        return cls.set(key, assessment, ttl=settings.CACHE_TTL_ASSESSMENT)
+    def set_upcoming_assessment(cls, platform_id: int, version: str, assessment: dict, ttl: Optional[int] = None) -> bool:
+        """
+        设置平台即将进行的考核缓存（ttl 为空时使用默认有效期）。
+        version 须与查询数据库之前读取的版本一致，避免查询期间发生的失效被覆盖。
+        """
+        key = cls.upcoming_key(platform_id, version)
+        return cls.set(key, assessment, ttl=ttl or settings.CACHE_TTL_ASSESSMENT)
+
+    @classmethod
+    def get_warmup_report(cls, assessment_id: int) -> Optional[dict]:
+        """获取考核的最近一次缓存预热报告"""
+        return cls.get(cls.warmup_key(assessment_id))
+
+    @classmethod
+    def set_warmup_report(cls, assessment_id: int, report: dict, ttl: int) -> bool:
+        return cls.set(cls.warmup_key(assessment_id), report, ttl=ttl)
+
+    @classmethod
+    def get_result_detail(cls, result_id: int) -> Optional[dict]:
+        """
+        获取已结束会话的成绩详情。
+        详情含题目快照，写入时记录所属题库的版本号；题目、选项或分值变更（题库版本号递增）后视为未命中。
+        """
+        entry = cls.get(cls.result_detail_key(result_id))
+        if not isinstance(entry, dict) or "detail" not in entry:
+            return None
+        if entry["bank_version"] != cls.get_bank_version(entry["bank"]):
+            return None
+        return entry["detail"]
+
+    @classmethod
+    def set_result_detail(cls, result_id: int, question_bank_id: int, detail: dict) -> bool:
+        return cls.set_result_details({result_id: (question_bank_id, detail)})
+
+    @classmethod
+    def invalidate_result_details(cls, result_ids: Iterable[int]) -> bool:
+        """使成绩详情缓存失效（会话汇总过时时调用，由汇总任务重新写入）"""
+        return cls.delete_many([cls.result_detail_key(result_id) for result_id in result_ids])
+
+    @classmethod
+    def set_result_details(cls, details: Dict[int, Tuple[int, dict]]) -> bool:
+        """批量写入成绩详情（会话汇总任务预热用），details 为 {会话ID: (题库ID, 详情)}"""
+        versions = {bank_id: cls.get_bank_version(bank_id) for bank_id, _ in details.values()}
+        return cls.set_many(
+            {
+                cls.result_detail_key(result_id): {"bank": bank_id, "bank_version": versions[bank_id], "detail": detail}
+                for result_id, (bank_id, detail) in details.items()
+            },
+            ttl=settings.CACHE_TTL_RESULT_DETAIL,
+        )
 
     @classmethod
     def invalidate_assessment(cls, platform_id: int = None) -> int:
-        """使考核缓存失效"""
+        """使平台调度缓存失效（不指定平台时全部失效），返回新的版本号"""
         if platform_id:
-            key = f"{cls.PREFIX_ASSESSMENT}upcoming:{platform_id}"
-            cls.delete(key)
-            return 1
-        else:
-            return cls.delete_pattern(f"{cls.PREFIX_ASSESSMENT}*")
+            return cls.incr_counter(cls.platform_version_key(platform_id))
+        return cls.incr_counter(cls.ASSESSMENT_VERSION_KEY)
+
+
+class AsyncCacheService:
+    """
+    异步缓存服务类（异步客户端接口的热路径使用）
+    缓存键与 CacheService 完全一致，降级时共用同一份内存缓存
+    """
+
+    @staticmethod
+    async def _get_client() -> Optional[redis_asyncio.Redis]:
+        return await get_async_redis_client()
+
+    @classmethod
+    async def is_distributed(cls) -> bool:
+        return await cls._get_client() is not None
+
+    @classmethod
+    async def get(cls, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        use_l1 = _l1_enabled(key)
+        if use_l1:
+            hit, value = _l1_cache.get(key)
+            if hit:
+                cache_metrics.record_lookup(key, "l1", True)
+                return value
+
+        client = await cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "GET", _async_redis_breaker):
+                    raw = await client.execute_command("GET", key, **_RAW_REPLY)
+                if raw:
+                    value = cache_codec.decode(raw)
+                    cache_metrics.record_lookup(key, "redis", True, len(raw))
+                    if use_l1:
+                        _l1_cache.set(key, value)
+                    return value
+                cache_metrics.record_lookup(key, "redis", False)
+            except redis.RedisError as e:
+                _redis_failed("GET", e, _async_redis_breaker)
+                client = None
+            except cache_codec.CacheDecodeError as e:
+                logger.warning(f"缓存数据解析失败: {e}")
+                cache_metrics.record_lookup(key, "redis", False)
+
+        value = _memory_cache.get(key)
+        if not client:
+            cache_metrics.record_fallback(key, "GET")
+            cache_metrics.record_lookup(key, "memory", value is not None)
+        return value
+
+    @classmethod
+    async def set(cls, key: str, value: Any, ttl: int = 3600) -> bool:
+        """设置缓存值"""
+        client = await cls._get_client()
+        serialized = cache_codec.encode(value)
+        cache_metrics.record_write(key, len(serialized))
+
+        if client:
+            try:
+                with _redis_call(key, "SET", _async_redis_breaker):
+                    await client.setex(key, ttl, serialized)
+                if _l1_enabled(key):
+                    _l1_cache.set(key, value, ttl)
+                return True
+            except redis.RedisError as e:
+                _redis_failed("SET", e, _async_redis_breaker)
+
+        cache_metrics.record_fallback(key, "SET")
+        _memory_cache.set(key, value, ttl)
+        return True
+
+    @classmethod
+    async def get_raw(cls, key: str) -> Optional[bytes]:
+        """获取原始字节缓存值"""
+        use_l1 = _l1_enabled(key)
+        if use_l1:
+            hit, value = _l1_cache.get(key)
+            if hit:
+                cache_metrics.record_lookup(key, "l1", True)
+                return value
+
+        client = await cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "GET", _async_redis_breaker):
+                    raw = await client.execute_command("GET", key, **_RAW_REPLY)
+                if raw:
+                    value = cache_codec.decode_raw(raw)
+                    cache_metrics.record_lookup(key, "redis", True, len(raw))
+                    if use_l1:
+                        _l1_cache.set(key, value)
+                    return value
+                cache_metrics.record_lookup(key, "redis", False)
+            except redis.RedisError as e:
+                _redis_failed("GET", e, _async_redis_breaker)
+                client = None
+
+        value = _memory_cache.get(key)
+        value = value if isinstance(value, bytes) else None
+        if not client:
+            cache_metrics.record_fallback(key, "GET")
+            cache_metrics.record_lookup(key, "memory", value is not None)
+        return value
+
+    @classmethod
+    async def set_raw(cls, key: str, value: bytes, ttl: int = 3600) -> bool:
+        """设置原始字节缓存值"""
+        client = await cls._get_client()
+        encoded = cache_codec.encode_raw(value)
+        cache_metrics.record_write(key, len(encoded))
+
+        if client:
+            try:
+                with _redis_call(key, "SET", _async_redis_breaker):
+                    await client.setex(key, ttl, encoded)
+                if _l1_enabled(key):
+                    _l1_cache.set(key, value, ttl)
+                return True
+            except redis.RedisError as e:
+                _redis_failed("SET", e, _async_redis_breaker)
+
+        cache_metrics.record_fallback(key, "SET")
+        _memory_cache.set(key, value, ttl)
+        return True
+
+    @classmethod
+    async def delete(cls, *keys: str) -> bool:
+        """删除缓存"""
+        client = await cls._get_client()
+
+        if client:
+            try:
+                await client.delete(*keys)
+            except redis.RedisError as e:
+                _redis_failed("DELETE", e, _async_redis_breaker)
+
+        _memory_cache.delete(*keys)
+        await _publish_invalidation_async(client, *keys)
+        return True
+
+    @classmethod
+    async def delete_many(cls, keys: Iterable[str]) -> bool:
+        keys = list(dict.fromkeys(keys))
+        return await cls.delete(*keys) if keys else True
+
+    @classmethod
+    async def get_many(cls, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量获取缓存值（一次 MGET 往返），返回 {键: 值}，只包含命中的键"""
+        result: Dict[str, Any] = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            if _l1_enabled(key):
+                hit, value = _l1_cache.get(key)
+                if hit:
+                    cache_metrics.record_lookup(key, "l1", True)
+                    result[key] = value
+                    continue
+            pending.append(key)
+        if not pending:
+            return result
+
+        client = await cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(pending[0], "MGET", _async_redis_breaker):
+                    replies = await client.execute_command("MGET", *pending, **_RAW_REPLY)
+                missing = []
+                for key, raw in zip(pending, replies):
+                    try:
+                        value = cache_codec.decode(raw) if raw else None
+                    except cache_codec.CacheDecodeError as e:
+                        logger.warning(f"缓存数据解析失败: {e}")
+                        raw = None
+                    if not raw:
+                        cache_metrics.record_lookup(key, "redis", False)
+                        missing.append(key)
+                        continue
+                    cache_metrics.record_lookup(key, "redis", True, len(raw))
+                    if _l1_enabled(key):
+                        _l1_cache.set(key, value)
+                    result[key] = value
+                result.update(_memory_cache.get_many(missing))
+                return result
+            except redis.RedisError as e:
+                _redis_failed("MGET", e, _async_redis_breaker)
+
+        found = _memory_cache.get_many(pending)
+        for key in pending:
+            cache_metrics.record_fallback(key, "MGET")
+            cache_metrics.record_lookup(key, "memory", key in found)
+        result.update(found)
+        return result
+
+    @classmethod
+    async def set_many(cls, items: Dict[str, Any], ttl: int = 3600) -> bool:
+        """批量设置缓存值（同一 TTL，一次管道往返）"""
+        if not items:
+            return True
+        serialized = {key: cache_codec.encode(value) for key, value in items.items()}
+        for key, value in serialized.items():
+            cache_metrics.record_write(key, len(value))
+        client = await cls._get_client()
+
+        if client:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, value in serialized.items():
+                    pipe.setex(key, ttl, value)
+                with _redis_call(next(iter(items)), "MSET", _async_redis_breaker):
+                    await pipe.execute()
+                for key, value in items.items():
+                    if _l1_enabled(key):
+                        _l1_cache.set(key, value, ttl)
+                return True
+            except redis.RedisError as e:
+                _redis_failed("MSET", e, _async_redis_breaker)
+
+        for key in items:
+            cache_metrics.record_fallback(key, "MSET")
+        _memory_cache.set_many(items, ttl)
+        return True
+
+    @classmethod
+    async def set_add_each(cls, key: str, members: List[Any], ttl: Optional[int] = None) -> List[bool]:
+        """逐个向集合添加成员（一次管道往返），返回每个成员是否为新增"""
+        if not members:
+            return []
+        client = await cls._get_client()
+
+        if client:
+            try:
+                pipe = client.pipeline()
+                for member in members:
+                    pipe.sadd(key, member)
+                if ttl:
+                    pipe.expire(key, ttl)
+                with _redis_call(key, "SADD", _async_redis_breaker):
+                    replies = await pipe.execute()
+                return [bool(reply) for reply in replies[:len(members)]]
+            except redis.RedisError as e:
+                _redis_failed("SADD", e, _async_redis_breaker)
+
+        cache_metrics.record_fallback(key, "SADD")
+        return _memory_cache.set_add_each(key, members, ttl)
+
+    @classmethod
+    async def set_remove(cls, key: str, *members: Any) -> int:
+        """从集合移除成员"""
+        if not members:
+            return 0
+        client = await cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "SREM", _async_redis_breaker):
+                    return await client.srem(key, *members)
+            except redis.RedisError as e:
+                _redis_failed("SREM", e, _async_redis_breaker)
+
+        cache_metrics.record_fallback(key, "SREM")
+        return _memory_cache.set_remove(key, members)
+
+    @classmethod
+    async def try_lock(cls, name: str, ttl: float) -> Tuple[bool, Optional[Any]]:
+        """非阻塞获取跨 worker 互斥锁，返回值语义同 CacheService.try_lock"""
+        client = await cls._get_client()
+
+        if client:
+            try:
+                lock = client.lock(CacheService.lock_key(name), timeout=ttl, blocking=False)
+                if await lock.acquire():
+                    return True, lock
+                return False, None
+            except redis.RedisError as e:
+                _redis_failed("LOCK", e, _async_redis_breaker)
+
+        return True, None
+
+    @classmethod
+    async def is_locked(cls, name: str) -> bool:
+        client = await cls._get_client()
+
+        if client:
+            try:
+                return bool(await client.exists(CacheService.lock_key(name)))
+            except redis.RedisError as e:
+                _redis_failed("EXISTS", e, _async_redis_breaker)
+
+        return False
+
+    @staticmethod
+    async def release_lock(lock: Optional[Any]) -> None:
+        if lock is None:
+            return
+        try:
+            await lock.release()
+        except redis.exceptions.LockError:
+            logger.warning(f"释放锁时发现锁已过期: {lock.name}")
+        except redis.RedisError as e:
+            _redis_failed("UNLOCK", e, _async_redis_breaker)
+
+    # ============ 业务相关的缓存方法 ============
+
+    @classmethod
+    async def get_blueprint(cls, question_bank_id: int, version: int) -> Optional[bytes]:
+        return await cls.get_raw(CacheService.blueprint_key(question_bank_id, version))
+
+    @classmethod
+    async def set_blueprint(cls, question_bank_id: int, version: int, payload: bytes) -> bool:
+        return await cls.set_raw(
+            CacheService.blueprint_key(question_bank_id, version), payload,
+            ttl=settings.CACHE_TTL_BLUEPRINT,
+        )
+
+    @classmethod
+    async def get_upcoming_assessment(cls, platform_id: int, version: str) -> Optional[dict]:
+        return await cls.get(CacheService.upcoming_key(platform_id, version))
+
+    @classmethod
+    async def set_upcoming_assessment(cls, platform_id: int, version: str, assessment: dict, ttl: Optional[int] = None) -> bool:
+        return await cls.set(
+            CacheService.upcoming_key(platform_id, version), assessment, ttl=ttl or settings.CACHE_TTL_ASSESSMENT
+        )
+
+    @classmethod
+    async def get_bank_version(cls, question_bank_id: int) -> int:
+        return await cls.get_counter(CacheService.bank_version_key(question_bank_id))
+
+    @classmethod
+    async def get_platform_version(cls, platform_id: int) -> str:
+        global_version = await cls.get_counter(CacheService.ASSESSMENT_VERSION_KEY)
+        platform_version = await cls.get_counter(CacheService.platform_version_key(platform_id))
+        return f"{global_version}.{platform_version}"
+
+    @classmethod
+    async def get_counter(cls, key: str) -> int:
+        use_l1 = _l1_enabled(key)
+        if use_l1:
+            hit, value = _l1_cache.get(key)
+            if hit:
+                cache_metrics.record_lookup(key, "l1", True)
+                return value
+
+        client = await cls._get_client()
+
+        if client:
+            try:
+                with _redis_call(key, "GET", _async_redis_breaker):
+                    value = await client.get(key)
+                cache_metrics.record_lookup(key, "redis", bool(value))
+                version = int(value) if value else 0
+                if use_l1:
+                    _l1_cache.set(key, version)
+                return version
+            except redis.RedisError as e:
+                _redis_failed("GET", e, _async_redis_breaker)
+
+        cache_metrics.record_fallback(key, "GET")
+        version = _memory_cache.get(key)
+        cache_metrics.record_lookup(key, "memory", version is not None)
+        return version or 0
+
+    @classmethod
+    async def get_answer_key(cls, question_bank_id: int, version: int) -> Optional[dict]:
+        return await cls.get(CacheService.answer_key_key(question_bank_id, version))
+
+    @classmethod
+    async def set_answer_key(cls, question_bank_id: int, version: int, answer_key: dict) -> bool:
+        return await cls.set(
+            CacheService.answer_key_key(question_bank_id, version), answer_key, ttl=settings.CACHE_TTL_BLUEPRINT
+        )
+
+    @classmethod
+    async def get_session_state(cls, result_id: int) -> Optional[dict]:
+        return await cls.get(CacheService.session_key(result_id))
+
+    @classmethod
+    async def set_session_state(cls, result_id: int, state: dict, answered_question_ids, ttl: int) -> bool:
+        await cls.set(CacheService.session_key(result_id), state, ttl=ttl)
+        if answered_question_ids:
+            await cls.set_add_each(CacheService.answered_key(result_id), list(answered_question_ids), ttl=ttl)
+        return True
+
+    @classmethod
+    async def add_answered_questions(cls, result_id: int, question_ids: List[int], ttl: int) -> List[bool]:
+        return await cls.set_add_each(CacheService.answered_key(result_id), question_ids, ttl=ttl)
+
+    @classmethod
+    async def remove_answered_question(cls, result_id: int, *question_ids: int) -> bool:
+        return await cls.set_remove(CacheService.answered_key(result_id), *question_ids) > 0
+
+    @classmethod
+    async def drop_session_states(cls, result_ids: Iterable[int]) -> bool:
+        return await cls.delete_many([CacheService.session_key(result_id) for result_id in result_ids])
+
+    @classmethod
+    async def invalidate_session_state(cls, result_id: int) -> bool:
+        return await cls.delete_many([CacheService.session_key(result_id), CacheService.answered_key(result_id)])
 
 
 # 缓存装饰器
-def cached(key_func: Callable, ttl: int = 3600):
+# cached 装饰器的后台刷新：同步函数在守护线程中执行，异步函数作为任务挂在当前事件循环上
+_refresh_flight = SingleFlight()
+_refreshing_keys: Set[str] = set()
+_refresh_tasks: Set[asyncio.Task] = set()
+
+
+def cached(
+    key_func: Callable,
+    ttl: int = 3600,
+    *,
+    negative_ttl: Optional[int] = None,
+    soft_ttl: Optional[int] = None,
+    session_factory: Optional[Callable] = None,
+    db_arg: str = "db",
+):
     """
     缓存装饰器
-    用于自动缓存函数返回值
+    用于自动缓存函数返回值，同步函数与 async def 函数均可使用（异步函数走 AsyncCacheService）。
+    - negative_ttl：函数返回 None 时按该时长缓存（负缓存）；默认不缓存 None，每次都重新计算。
+    - soft_ttl：软过期时长（须小于 ttl）。超过 soft_ttl 的值照常返回，同时在后台重新计算并回写；
+      超过 ttl 后条目被 Redis 移除，调用方同步等待计算。同一个键同时只有一个后台刷新（跨 worker 通过 Redis 锁）。
+    - session_factory：后台刷新时原请求的数据库会话可能已关闭，提供时用它新建会话替换参数 db_arg
+      （异步函数传入异步会话工厂）；不提供时沿用原参数，只适合不依赖请求作用域对象的函数。
+    条目以 {"v": 返回值, "r": 软过期时间戳} 的形式保存，键只应由同一个装饰器读写。
 
     使用示例:
-    @cached(lambda bank_id: f"blueprint:{bank_id}", ttl=3600)
-    def get_blueprint(bank_id: int):
+    @cached(lambda self, db, *, assessment_id: f"result_count:{assessment_id}",
+            ttl=300, soft_ttl=30, session_factory=SessionLocal)
+    def get_count_by_assessment(self, db, *, assessment_id: int) -> int:
         ...
     """
+    if soft_ttl is not None and soft_ttl >= ttl:
+        raise ValueError("soft_ttl 必须小于 ttl")
+
+    def make_entry(result: Any) -> Optional[Tuple[dict, int]]:
+        """返回 (缓存条目, TTL)；无需缓存时返回 None"""
+        if result is None:
+            return ({"v": None, "r": None}, negative_ttl) if negative_ttl is not None else None
+        return {"v": result, "r": time.time() + soft_ttl if soft_ttl is not None else None}, ttl
+
+    def read_entry(entry: Any) -> Tuple[bool, Any, bool]:
+        """返回 (是否命中, 值, 是否已软过期)"""
+        if not isinstance(entry, dict) or "v" not in entry:
+            return False, None, False
+        refresh_at = entry.get("r")
+        return True, entry["v"], refresh_at is not None and refresh_at <= time.time()
+
+    def refresh_lock_name(cache_key: str) -> str:
+        return f"refresh:{cache_key}"
+
     def decorator(func: Callable):
+        signature = inspect.signature(func)
+
+        def with_session(args: tuple, kwargs: dict, db: Any) -> Tuple[tuple, dict]:
+            """把参数 db_arg 替换为新会话（原调用按位置或关键字传入均可）"""
+            bound = signature.bind(*args, **kwargs)
+            bound.arguments[db_arg] = db
+            return bound.args, bound.kwargs
+
+        if asyncio.iscoroutinefunction(func):
+            async def store_async(cache_key: str, result: Any) -> None:
+                entry = make_entry(result)
+                if entry is not None:
+                    await AsyncCacheService.set(cache_key, entry[0], ttl=entry[1])
+
+            async def refresh_async(cache_key: str, args: tuple, kwargs: dict) -> None:
+                # 无论是否拿到锁都要移出 _refreshing_keys，否则该键在本进程内再也不会触发后台刷新
+                try:
+                    acquired, lock = await AsyncCacheService.try_lock(refresh_lock_name(cache_key), ttl - soft_ttl)
+                    if not acquired:
+                        return
+                    try:
+                        if session_factory is not None:
+                            async with session_factory() as db:
+                                call_args, call_kwargs = with_session(args, kwargs, db)
+                                result = await func(*call_args, **call_kwargs)
+                        else:
+                            result = await func(*args, **kwargs)
+                        await store_async(cache_key, result)
+                    except Exception:
+                        logger.exception(f"后台刷新缓存失败: {cache_key}")
+                    finally:
+                        await AsyncCacheService.release_lock(lock)
+                finally:
+                    _refreshing_keys.discard(cache_key)
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key_func(*args, **kwargs)
+                hit, value, stale = read_entry(await AsyncCacheService.get(cache_key))
+                if hit:
+                    if stale and cache_key not in _refreshing_keys:
+                        _refreshing_keys.add(cache_key)
+                        task = asyncio.create_task(refresh_async(cache_key, args, kwargs))
+                        _refresh_tasks.add(task)
+                        task.add_done_callback(_refresh_tasks.discard)
+                    return value
+
+                result = await func(*args, **kwargs)
+                await store_async(cache_key, result)
+                return result
+            return async_wrapper
+
+        def store(cache_key: str, result: Any) -> None:
+            entry = make_entry(result)
+            if entry is not None:
+                CacheService.set(cache_key, entry[0], ttl=entry[1])
+
+        def refresh(cache_key: str, args: tuple, kwargs: dict) -> None:
+            with _refresh_flight.lock(cache_key, blocking=False) as running:
+                if not running:
+                    return
+                acquired, lock = CacheService.try_lock(refresh_lock_name(cache_key), ttl - soft_ttl)
+                if not acquired:
+                    return
+                db = None
+                try:
+                    call_args, call_kwargs = args, kwargs
+                    if session_factory is not None:
+                        db = session_factory()
+                        call_args, call_kwargs = with_session(args, kwargs, db)
+                    store(cache_key, func(*call_args, **call_kwargs))
+                except Exception:
+                    logger.exception(f"后台刷新缓存失败: {cache_key}")
+                finally:
+                    if db is not None:
+                        db.close()
+                    CacheService.release_lock(lock)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             cache_key = key_func(*args, **kwargs)
-            cached_value = CacheService.get(cache_key)
-
-            if cached_value is not None:
-                return cached_value
+            hit, value, stale = read_entry(CacheService.get(cache_key))
+            if hit:
+                if stale and not _refresh_flight.is_running(cache_key):
+                    threading.Thread(
+                        target=refresh, args=(cache_key, args, kwargs), name=f"cache-refresh-{cache_key}", daemon=True,
+                    ).start()
+                return value
 
             result = func(*args, **kwargs)
+            store(cache_key, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def cached_many(key_func: Callable[[Any], str], ids_arg: str, ttl: int = 3600):
+    """
+    批量缓存装饰器
+    用于按 ID 列表批量查询的函数：ID 列表以关键字参数 ids_arg 传入，函数返回 {ID: 值}。
+    先用一次 MGET 取出全部已缓存的 ID，只把未命中的 ID 交给原函数，结果再用一次管道回写。
 
-            if result is not None:
-                CacheService.set(cache_key, result, ttl=ttl)
+    使用示例:
+    @cached_many(lambda bank_id: f"bank_total:{bank_id}", ids_arg="question_bank_ids", ttl=3600)
+    def get_total_scores(db, *, question_bank_ids: List[int]) -> Dict[int, int]:
+        ...
+    """
+    def decorator(func: Callable):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            keys = {item_id: key_func(item_id) for item_id in kwargs[ids_arg]}
+            cached_values = CacheService.get_many(keys.values())
 
+            result = {item_id: cached_values[key] for item_id, key in keys.items() if key in cached_values}
+            missing = [item_id for item_id in keys if item_id not in result]
+            if missing:
+                fresh = func(*args, **{**kwargs, ids_arg: missing})
+                CacheService.set_many(
+                    {keys[item_id]: value for item_id, value in fresh.items() if item_id in keys and value is not None},
+                    ttl=ttl,
+                )
+                result.update(fresh)
             return result
         return wrapper
     return decorator
@@ -237,3 +1569,4 @@ def cached(key_func: Callable, ttl: int = 3600):
 
 # 导出
 cache_service = CacheService()
+async_cache_service = AsyncCacheService()
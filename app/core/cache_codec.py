@@ -0,0 +1,160 @@
+# app/core/cache_codec.py
+"""
+缓存值编解码
+写入 Redis 的值统一编码为字节：2 字节头 + 载荷。
+- 第 1 字节固定为 0x00（JSON 文本不可能以它开头，据此区分旧格式）；
+- 第 2 字节低 4 位为序列化方式（raw / orjson / msgpack），高 4 位为压缩算法（none / zlib / zstd / lz4）。
+载荷超过 CACHE_COMPRESSION_MIN_BYTES 时才压缩；zstd / lz4 为可选依赖，未安装时退回标准库 zlib，
+msgpack 未安装时退回 orjson。头部记录了实际使用的算法，切换配置后旧条目仍按原算法解码。
+没有头部的值视为升级前写入的 JSON 文本，照常读取。
+"""
+import json
+import logging
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheDecodeError(ValueError):
+    """缓存值无法解码（数据损坏或写入方使用了本进程不可用的算法）"""
+
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 可选依赖
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - 可选依赖
+    lz4_frame = None
+
+MAGIC = 0x00
+
+SERIALIZER_RAW = 0
+SERIALIZER_ORJSON = 1
+SERIALIZER_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    # 与原 json.dumps(default=str) 行为一致：非字符串键转为字符串，无法序列化的对象转为 str
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+_SERIALIZERS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    SERIALIZER_ORJSON: (_orjson_dumps, orjson.loads),
+}
+if msgpack is not None:
+    _SERIALIZERS[SERIALIZER_MSGPACK] = (_msgpack_dumps, _msgpack_loads)
+
+_COMPRESSORS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    COMPRESSION_ZLIB: (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if zstandard is not None:
+    _COMPRESSORS[COMPRESSION_ZSTD] = (
+        lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+if lz4_frame is not None:
+    _COMPRESSORS[COMPRESSION_LZ4] = (lz4_frame.compress, lz4_frame.decompress)
+
+_SERIALIZER_NAMES = {"orjson": SERIALIZER_ORJSON, "msgpack": SERIALIZER_MSGPACK}
+_COMPRESSION_NAMES = {"none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4}
+
+
+def _resolve_serializer(name: str) -> int:
+    serializer = _SERIALIZER_NAMES.get(name, SERIALIZER_ORJSON)
+    if serializer not in _SERIALIZERS:
+        logger.warning(f"缓存序列化方式 {name} 不可用（未安装依赖），改用 orjson")
+        return SERIALIZER_ORJSON
+    return serializer
+
+
+def _resolve_compression(name: str) -> int:
+    compression = _COMPRESSION_NAMES.get(name, COMPRESSION_ZLIB)
+    if compression != COMPRESSION_NONE and compression not in _COMPRESSORS:
+        logger.warning(f"缓存压缩算法 {name} 不可用（未安装依赖），改用 zlib")
+        return COMPRESSION_ZLIB
+    return compression
+
+
+_serializer = _resolve_serializer(settings.CACHE_SERIALIZER)
+_compression = _resolve_compression(settings.CACHE_COMPRESSION)
+
+
+def _pack(serializer: int, payload: bytes) -> bytes:
+    compression = COMPRESSION_NONE
+    if _compression != COMPRESSION_NONE and len(payload) >= settings.CACHE_COMPRESSION_MIN_BYTES:
+        compressed = _COMPRESSORS[_compression][0](payload)
+        # 压缩收益过小时保留原文，解码时省去解压
+        if len(compressed) < len(payload) * 0.9:
+            payload, compression = compressed, _compression
+    return bytes((MAGIC, serializer | (compression << 4))) + payload
+
+
+def _unpack(data: bytes) -> Tuple[int, bytes]:
+    """拆出 (序列化方式, 解压后的载荷)；无头部的旧值返回 (None, 原文)"""
+    if not data or data[0] != MAGIC:
+        return None, data
+    flags = data[1]
+    serializer, compression = flags & 0x0F, flags >> 4
+    payload = data[2:]
+    if compression != COMPRESSION_NONE:
+        if compression not in _COMPRESSORS:
+            raise CacheDecodeError(f"缓存值使用的压缩算法 {compression} 在本进程不可用")
+        try:
+            payload = _COMPRESSORS[compression][1](payload)
+        except Exception as e:
+            raise CacheDecodeError(f"缓存值解压失败: {e}") from e
+    return serializer, payload
+
+
+def encode(value: Any) -> bytes:
+    """序列化（并按需压缩）任意可 JSON 化的值"""
+    return _pack(_serializer, _SERIALIZERS[_serializer][0](value))
+
+
+def decode(data: bytes) -> Any:
+    """解码 encode 的结果；兼容升级前写入的 JSON 文本"""
+    serializer, payload = _unpack(data)
+    if serializer is not None and serializer not in _SERIALIZERS:
+        raise CacheDecodeError(f"缓存值使用的序列化方式 {serializer} 在本进程不可用")
+    try:
+        if serializer is None:
+            return json.loads(payload)
+        return _SERIALIZERS[serializer][1](payload)
+    except Exception as e:
+        raise CacheDecodeError(f"无法解码缓存值: {e}") from e
+
+
+def encode_raw(payload: bytes) -> bytes:
+    """已序列化的字节（如预序列化蓝图）只加头部并按需压缩"""
+    return _pack(SERIALIZER_RAW, payload)
+
+
+def decode_raw(data: bytes) -> bytes:
+    """还原 encode_raw 的载荷；旧格式（无头部的文本）原样返回"""
+    return _unpack(data)[1]
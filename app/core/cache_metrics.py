@@ -0,0 +1,214 @@
+# app/core/cache_metrics.py
+"""
+缓存指标
+按键前缀（键中第一个冒号之前的部分，如 blueprint / assessment / session）统计：
+- 查找次数：按命中层级（l1 / redis / memory）与结果（hit / miss）；
+- Redis 往返延迟直方图、Redis 错误次数；
+- 降级次数：Redis 不可用或出错、改用进程内内存缓存的次数；
+- 读写的载荷大小（编码后的字节数）。
+指标只在本进程内累计，通过 GET /monitoring/metrics 以 Prometheus 文本格式导出。
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis
+
+# Redis 往返延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def key_prefix(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def samples(self, name: str, labels: Labels) -> List[Tuple[str, Labels, float]]:
+        """导出 _bucket（累计）/ _sum / _count 样本"""
+        result = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            result.append((f"{name}_bucket", labels + (("le", repr(bound)),), cumulative))
+        result.append((f"{name}_bucket", labels + (("le", "+Inf"),), self.count))
+        result.append((f"{name}_sum", labels, self.total))
+        result.append((f"{name}_count", labels, self.count))
+        return result
+
+
+def render_family(
+    lines: List[str], name: str, help_text: str, metric_type: str, samples: Iterable[Tuple[str, Labels, float]]
+) -> None:
+    """按 Prometheus 文本格式追加一个指标族（HELP / TYPE 与全部样本）"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for sample_name, labels, value in samples:
+        lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+
+def render_gauges(lines: List[str], gauges: Iterable[Tuple[str, str, Dict[str, str], float]]) -> None:
+    """追加调用方提供的瞬时值：(指标名, 说明, 标签, 值)，同名的合并为一个指标族"""
+    gauge_families: Dict[str, Tuple[str, List[Tuple[str, Labels, float]]]] = {}
+    for name, help_text, labels, value in gauges:
+        gauge_families.setdefault(name, (help_text, []))[1].append((name, tuple(labels.items()), value))
+    for name, (help_text, samples) in gauge_families.items():
+        render_family(lines, name, help_text, "gauge", samples)
+
+
+class CacheMetrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lookups: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._fallbacks: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._payload: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])  # [次数, 总字节数]
+        self._latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self._lock = threading.Lock()
+
+    # ---------- 记录 ----------
+
+    def record_lookup(self, key: str, tier: str, hit: bool, size: Optional[int] = None) -> None:
+        """记录一次读取的最终结果；size 为命中时读到的载荷大小"""
+        if not self.enabled:
+            return
+        prefix = key_prefix(key)
+        with self._lock:
+            self._lookups[(prefix, tier, "hit" if hit else "miss")] += 1
+            if size is not None:
+                payload = self._payload[(prefix, "read")]
+                payload[0] += 1
+                payload[1] += size
+
+    def record_write(self, key: str, size: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            payload = self._payload[(key_prefix(key), "write")]
+            payload[0] += 1
+            payload[1] += size
+
+    def record_fallback(self, key: str, operation: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._fallbacks[(key_prefix(key), operation)] += 1
+
+    @contextmanager
+    def redis_call(self, key: str, operation: str):
+        """包裹一次 Redis 调用：记录往返延迟，出现 Redis 异常时计入错误后继续抛出"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except redis.RedisError:
+            with self._lock:
+                self._errors[(key_prefix(key), operation)] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._latency[(key_prefix(key), operation)].observe(elapsed)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._lookups.clear()
+            self._errors.clear()
+            self._fallbacks.clear()
+            self._payload.clear()
+            self._latency.clear()
+
+    # ---------- 导出 ----------
+
+    def summary(self) -> Dict[str, dict]:
+        """按前缀汇总命中率、降级与错误次数（供 /monitoring/cache 使用）"""
+        result: Dict[str, dict] = {}
+        with self._lock:
+            for (prefix, tier, outcome), count in self._lookups.items():
+                item = result.setdefault(prefix, {"hits": 0, "misses": 0, "fallbacks": 0, "errors": 0})
+                item["hits" if outcome == "hit" else "misses"] += count
+            for (prefix, _), count in self._fallbacks.items():
+                result.setdefault(prefix, {"hits": 0, "misses": 0, "fallbacks": 0, "errors": 0})["fallbacks"] += count
+            for (prefix, _), count in self._errors.items():
+                result.setdefault(prefix, {"hits": 0, "misses": 0, "fallbacks": 0, "errors": 0})["errors"] += count
+        for item in result.values():
+            lookups = item["hits"] + item["misses"]
+            item["hit_rate"] = round(item["hits"] / lookups, 4) if lookups else None
+        return result
+
+    def render_prometheus(self, gauges: Iterable[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+        """
+        以 Prometheus 文本格式（0.0.4）导出全部指标。
+        gauges 为调用方附加的瞬时值：(指标名, 说明, 标签, 值)。
+        """
+        lines: List[str] = []
+
+        with self._lock:
+            lookups = sorted(self._lookups.items())
+            errors = sorted(self._errors.items())
+            fallbacks = sorted(self._fallbacks.items())
+            payload = sorted((k, list(v)) for k, v in self._payload.items())
+            latency = [
+                sample
+                for (p, op), h in sorted(self._latency.items())
+                for sample in h.samples("cache_redis_latency_seconds", (("prefix", p), ("operation", op)))
+            ]
+
+        render_family(lines, "cache_lookups_total", "缓存读取次数（按键前缀、命中层级与结果）", "counter", [
+            ("cache_lookups_total", (("prefix", p), ("tier", t), ("result", r)), v) for (p, t, r), v in lookups
+        ])
+        render_family(lines, "cache_redis_errors_total", "Redis 调用错误次数", "counter", [
+            ("cache_redis_errors_total", (("prefix", p), ("operation", op)), v) for (p, op), v in errors
+        ])
+        render_family(lines, "cache_fallbacks_total", "Redis 不可用或出错、改用内存降级缓存的次数", "counter", [
+            ("cache_fallbacks_total", (("prefix", p), ("operation", op)), v) for (p, op), v in fallbacks
+        ])
+
+        payload_samples = []
+        for (p, direction), (count, total) in payload:
+            labels = (("prefix", p), ("direction", direction))
+            payload_samples.append(("cache_payload_bytes_sum", labels, total))
+            payload_samples.append(("cache_payload_bytes_count", labels, count))
+        render_family(lines, "cache_payload_bytes", "缓存载荷大小（编码后的字节数）", "summary", payload_samples)
+
+        render_family(lines, "cache_redis_latency_seconds", "Redis 往返延迟（秒）", "histogram", latency)
+        render_gauges(lines, gauges)
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,108 @@
+# app/core/circuit_breaker.py
+"""
+熔断器
+外部依赖（如 Redis）在 failure_window 秒内失败达到阈值时断开（open），在退避时间内直接走降级路径，
+不再逐次等待连接超时；任意一次成功调用都会清零失败计数，健康依赖上零星的超时不会累积到阈值；
+退避到期后进入半开（half_open）状态，只放行一次探测，成功则闭合（closed），失败则加倍退避后重新断开。
+"""
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        backoff_base: float,
+        backoff_max: float,
+        failure_window: Optional[float] = None,
+    ):
+        """
+        :param failure_window: 只统计最近 failure_window 秒内的失败（为空时不限时间，直到下一次成功）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_window = failure_window
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._failure_times: deque = deque()
+        self._backoff = backoff_base
+        self._retry_at = 0.0
+        self._transitions: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        是否允许本次调用访问依赖。
+        断开状态下退避到期时转为半开并放行当前调用作为探测，其余调用继续走降级路径。
+        """
+        if self._state == self.CLOSED:
+            return True
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() >= self._retry_at:
+                self._transition(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self) -> None:
+        if self._state == self.CLOSED and self._failures == 0:
+            return
+        with self._lock:
+            self._failures = 0
+            self._failure_times.clear()
+            self._backoff = self.backoff_base
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self, force_open: bool = False) -> None:
+        """记录一次失败；窗口内失败达到阈值、半开探测失败或 force_open 时断开"""
+        with self._lock:
+            now = time.monotonic()
+            self._failure_times.append(now)
+            if self.failure_window is not None:
+                while self._failure_times[0] < now - self.failure_window:
+                    self._failure_times.popleft()
+            self._failures = len(self._failure_times)
+            if self._state == self.HALF_OPEN:
+                # 探测失败：加倍退避
+                self._backoff = min(self._backoff * 2, self.backoff_max)
+                self._open()
+            elif self._state == self.CLOSED and (force_open or self._failures >= self.failure_threshold):
+                self._open()
+
+    def _open(self) -> None:
+        self._retry_at = time.monotonic() + self._backoff
+        self._transition(self.OPEN)
+        logger.warning(f"熔断器 {self.name} 已断开，{self._backoff:g} 秒后重试")
+
+    def _transition(self, new_state: str) -> None:
+        self._transitions[f"{self._state}->{new_state}"] += 1
+        self._state = new_state
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "backoff_seconds": self._backoff,
+                "retry_in_seconds": max(round(self._retry_at - time.monotonic(), 1), 0) if self._state == self.OPEN else 0,
+                "transitions": dict(self._transitions),
+            }
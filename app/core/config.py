@@ -15,16 +15,85 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str = os.getenv("DATABASE_URL")
 
+    # 异步客户端接口（AsyncSession + aiomysql + 异步 Redis），管理端接口仍为同步
+    CLIENT_API_ASYNC: bool = os.getenv("CLIENT_API_ASYNC", "false").lower() == "true"
+    ASYNC_DATABASE_URL: Optional[str] = os.getenv("ASYNC_DATABASE_URL", None)  # 为空时由 DATABASE_URL 推导
+    ASYNC_DB_POOL_SIZE: int = int(os.getenv("ASYNC_DB_POOL_SIZE", 20))
+    ASYNC_DB_MAX_OVERFLOW: int = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 30))
+
     # Redis 配置
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
     REDIS_DB: int = int(os.getenv("REDIS_DB", 0))
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD", None)
     REDIS_ENABLED: bool = os.getenv("REDIS_ENABLED", "true").lower() == "true"
+    # Redis 熔断：连续失败次数阈值，重连探测的指数退避（秒）
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", 3))
+    REDIS_BREAKER_FAILURE_WINDOW_SECONDS: float = float(os.getenv("REDIS_BREAKER_FAILURE_WINDOW_SECONDS", 30))  # 只统计该时间窗口内的失败
+    REDIS_BREAKER_BACKOFF_BASE_SECONDS: float = float(os.getenv("REDIS_BREAKER_BACKOFF_BASE_SECONDS", 1))
+    REDIS_BREAKER_BACKOFF_MAX_SECONDS: float = float(os.getenv("REDIS_BREAKER_BACKOFF_MAX_SECONDS", 60))
 
     # 缓存过期时间配置（秒）
     CACHE_TTL_BLUEPRINT: int = int(os.getenv("CACHE_TTL_BLUEPRINT", 3600))  # 题库蓝图缓存1小时
     CACHE_TTL_ASSESSMENT: int = int(os.getenv("CACHE_TTL_ASSESSMENT", 300))  # 考核信息缓存5分钟
+    CACHE_TTL_RESULT_DETAIL: int = int(os.getenv("CACHE_TTL_RESULT_DETAIL", 86400))  # 已结束会话的成绩详情缓存1天
+
+    # Redis 不可用时的内存降级缓存上限（超出后按 LRU 淘汰）
+    CACHE_MEMORY_MAX_ITEMS: int = int(os.getenv("CACHE_MEMORY_MAX_ITEMS", 10000))
+    CACHE_MEMORY_MAX_BYTES: int = int(os.getenv("CACHE_MEMORY_MAX_BYTES", 64 * 1024 * 1024))  # 64MB
+
+    # 进程内 L1 缓存（位于 Redis 之前，通过 Redis 发布/订阅跨 worker 失效）
+    CACHE_L1_ENABLED: bool = os.getenv("CACHE_L1_ENABLED", "true").lower() == "true"
+    CACHE_L1_MAX_ITEMS: int = int(os.getenv("CACHE_L1_MAX_ITEMS", 1024))
+    CACHE_L1_TTL_SECONDS: int = int(os.getenv("CACHE_L1_TTL_SECONDS", 30))  # 兜底有效期，失效通知丢失时最多陈旧这么久
+    # 只有这些前缀的键进入 L1（跨请求共享、变更少的数据）；会话状态等频繁变更的键不进入
+    CACHE_L1_PREFIXES: str = os.getenv("CACHE_L1_PREFIXES", "blueprint:,answer_key:,bank_version:,assessment:upcoming:,platform_version:,assessment_version")
+    CACHE_INVALIDATION_CHANNEL: str = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+    # 按键前缀统计命中率、降级次数、Redis 延迟等指标（GET /monitoring/metrics 导出）
+    CACHE_METRICS_ENABLED: bool = os.getenv("CACHE_METRICS_ENABLED", "true").lower() == "true"
+    # 写入 Redis 的缓存值编码：序列化方式 orjson / msgpack，压缩算法 zstd / lz4 / zlib / none
+    # msgpack、zstd、lz4 为可选依赖（不在 requirements.txt 中），未安装时分别退回 orjson、zlib；旧格式（JSON 文本）的条目仍可读取
+    # 默认使用标准库 zlib：各 worker 不论是否安装可选依赖，写入的格式都一致
+    CACHE_SERIALIZER: str = os.getenv("CACHE_SERIALIZER", "orjson").lower()
+    CACHE_COMPRESSION: str = os.getenv("CACHE_COMPRESSION", "zlib").lower()
+    CACHE_COMPRESSION_MIN_BYTES: int = int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", 1024))  # 小于该字节数的值不压缩
+
+    # 蓝图缓存击穿保护：同一题库版本只允许一个构建者（进程内锁 + Redis 锁），其余请求等待其结果
+    BLUEPRINT_BUILD_LOCK_TTL_SECONDS: int = int(os.getenv("BLUEPRINT_BUILD_LOCK_TTL_SECONDS", 30))  # 构建者崩溃时锁自动释放
+    BLUEPRINT_BUILD_WAIT_SECONDS: float = float(os.getenv("BLUEPRINT_BUILD_WAIT_SECONDS", 10))  # 等待超时后自行构建
+    BLUEPRINT_BUILD_POLL_INTERVAL_SECONDS: float = float(os.getenv("BLUEPRINT_BUILD_POLL_INTERVAL_SECONDS", 0.05))
+    # 题库变更后，新版本构建完成前先返回旧版本蓝图，并在后台重建
+    BLUEPRINT_STALE_WHILE_REVALIDATE: bool = os.getenv("BLUEPRINT_STALE_WHILE_REVALIDATE", "false").lower() == "true"
+
+    # 开考前缓存预热：考核创建/修改时注册定时任务，在开始前 N 分钟构建蓝图、答案键与平台调度缓存
+    CACHE_WARMUP_ENABLED: bool = os.getenv("CACHE_WARMUP_ENABLED", "true").lower() == "true"
+    CACHE_WARMUP_LEAD_MINUTES: int = int(os.getenv("CACHE_WARMUP_LEAD_MINUTES", 10))
+    CACHE_WARMUP_DB_CONNECTIONS: int = int(os.getenv("CACHE_WARMUP_DB_CONNECTIONS", 20))  # 预先建立的数据库连接数
+
+    # 答题写入模式: sync（逐题同步写库） / write_behind（入队后由后台批量落库）
+    ANSWER_INGEST_MODE: str = os.getenv("ANSWER_INGEST_MODE", "sync").lower()
+    ANSWER_QUEUE_STREAM: str = os.getenv("ANSWER_QUEUE_STREAM", "answers:ingest")  # Redis Stream 名称
+    ANSWER_QUEUE_DEAD_LETTER_STREAM: str = os.getenv("ANSWER_QUEUE_DEAD_LETTER_STREAM", "answers:ingest:dead")  # 无法解析的消息转存于此
+    ANSWER_QUEUE_FILE: str = os.getenv("ANSWER_QUEUE_FILE", "data/answer_queue.jsonl")  # Redis 不可用时的本地追加日志
+    ANSWER_FLUSH_INTERVAL_SECONDS: int = int(os.getenv("ANSWER_FLUSH_INTERVAL_SECONDS", 1))
+    ANSWER_FLUSH_BATCH_SIZE: int = int(os.getenv("ANSWER_FLUSH_BATCH_SIZE", 500))
+
+    # 总分核对任务：定期比对 total_score 与 SUM(answer_logs.score_awarded)
+    SCORE_RECONCILE_INTERVAL_MINUTES: int = int(os.getenv("SCORE_RECONCILE_INTERVAL_MINUTES", 10))
+    SCORE_RECONCILE_LOOKBACK_HOURS: int = int(os.getenv("SCORE_RECONCILE_LOOKBACK_HOURS", 24))
+
+    # 会话结束后的汇总任务：每批处理的会话数（兜底扫描每次最多补齐这么多）
+    RESULT_FINALIZE_BATCH_SIZE: int = int(os.getenv("RESULT_FINALIZE_BATCH_SIZE", 200))
+
+    # 考核结束（自动交卷）截止时间保存在进程内，每隔该秒数从数据库重建一次
+    DEADLINE_RESYNC_SECONDS: int = int(os.getenv("DEADLINE_RESYNC_SECONDS", 60))
+    DEADLINE_CHANNEL: str = os.getenv("DEADLINE_CHANNEL", "scheduler:deadlines")  # 截止时间变更通知频道（推送给 leader）
+
+    # 多 worker 选主：只有 leader 执行周期性兜底任务与考核结束任务
+    LEADER_ELECTION_ENABLED: bool = os.getenv("LEADER_ELECTION_ENABLED", "true").lower() == "true"
+    LEADER_ELECTION_BACKEND: str = os.getenv("LEADER_ELECTION_BACKEND", "auto").lower()  # auto / redis / mysql
+    LEADER_LOCK_TTL_SECONDS: float = float(os.getenv("LEADER_LOCK_TTL_SECONDS", 15))  # leader 失联后最长接管时间
+    LEADER_RENEW_INTERVAL_SECONDS: float = float(os.getenv("LEADER_RENEW_INTERVAL_SECONDS", 5))
 
     class Config:
         env_file = ".env"
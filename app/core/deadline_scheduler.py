@@ -0,0 +1,175 @@
+# app/core/deadline_scheduler.py
+"""
+进程内截止时间调度器
+按截止时间维护一个最小堆，由一个守护线程等待最早的截止时间并调用回调。
+- 注册 / 取消只修改内存中的堆，不写数据库，也不序列化任务；
+- 持久性来自数据库本身：启动时以及之后每隔 resync_interval 秒调用 loader 从数据库重建整个堆，
+  进程重启或其他 worker 修改了截止时间都会在下一次重建时生效（调用方也可以把其他 worker 的修改推送过来，
+  直接调用 schedule / cancel 立即生效，见 scheduler 中的截止时间变更通知）；
+- 同一个键重复注册时以最后一次为准，堆中的旧条目在弹出时被丢弃。
+截止时间统一使用北京时间 naive datetime（与数据库一致）。
+"""
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+
+def _now() -> datetime:
+    return datetime.now(BEIJING_TZ).replace(tzinfo=None)
+
+
+class DeadlineScheduler:
+    def __init__(
+        self,
+        name: str,
+        callback: Callable[[Hashable], object],
+        loader: Callable[[], Iterable[Tuple[Hashable, datetime]]],
+        resync_interval: float,
+        listener: Optional[Callable[..., None]] = None,
+    ):
+        """
+        :param listener: 每次回调结束后调用 listener(key, lag=..., duration=..., success=..., result=...)，用于记录指标
+        """
+        self.name = name
+        self.callback = callback
+        self.loader = loader
+        self.resync_interval = resync_interval
+        self.listener = listener
+
+        self._heap: List[Tuple[datetime, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, datetime] = {}
+        self._seq = 0  # 截止时间相同时按注册顺序出堆，避免比较键
+        self._resync_at: Optional[datetime] = None
+        self._fired = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+
+    # ---------- 注册 ----------
+
+    def schedule(self, key: Hashable, deadline: datetime) -> None:
+        """注册（或改期）键的截止时间；已过去的截止时间会立即触发"""
+        with self._cond:
+            self._push(key, deadline)
+            self._cond.notify()
+
+    def cancel(self, key: Hashable) -> None:
+        with self._cond:
+            self._deadlines.pop(key, None)
+
+    def rebuild(self, entries: Iterable[Tuple[Hashable, datetime]]) -> int:
+        """以 entries 替换全部截止时间，返回条目数"""
+        with self._cond:
+            self._heap.clear()
+            self._deadlines.clear()
+            for key, deadline in entries:
+                self._push(key, deadline)
+            self._cond.notify()
+            return len(self._deadlines)
+
+    def _push(self, key: Hashable, deadline: datetime) -> None:
+        self._deadlines[key] = deadline
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, key))
+
+    # ---------- 运行 ----------
+
+    def start(self) -> None:
+        """从数据库加载截止时间并启动后台线程（重复调用无副作用）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self.resync()
+        self._thread = threading.Thread(target=self._run, name=f"deadline-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def resync(self) -> None:
+        """从数据库重建堆；加载失败时保留当前内容，下个周期重试"""
+        try:
+            count = self.rebuild(self.loader())
+            logger.debug(f"截止时间调度器 {self.name} 已从数据库加载 {count} 个截止时间")
+        except Exception as e:
+            logger.error(f"截止时间调度器 {self.name} 加载失败: {e}")
+        with self._cond:
+            self._resync_at = _now() + timedelta(seconds=self.resync_interval)
+
+    def _pop_due(self, now: datetime) -> Optional[Tuple[Hashable, datetime]]:
+        """弹出一个已到期的 (键, 截止时间)；丢弃已取消或已改期的旧条目"""
+        while self._heap:
+            deadline, _, key = self._heap[0]
+            if self._deadlines.get(key) != deadline:
+                heapq.heappop(self._heap)
+                continue
+            if deadline > now:
+                return None
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            return key, deadline
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+                now = _now()
+                due = self._pop_due(now)
+                if due is None:
+                    if now < self._resync_at:
+                        wake_at = min(self._heap[0][0], self._resync_at) if self._heap else self._resync_at
+                        self._cond.wait(timeout=(wake_at - now).total_seconds())
+                        continue
+
+            # 回调与重建都在锁外执行，期间允许注册 / 取消（回调中也可以重新注册）
+            if due is None:
+                self.resync()
+                continue
+            self._fire(*due)
+
+    def _fire(self, key: Hashable, deadline: datetime) -> None:
+        lag = max((_now() - deadline).total_seconds(), 0.0)
+        started = time.monotonic()
+        result, success = None, True
+        try:
+            result = self.callback(key)
+            self._fired += 1
+        except Exception:
+            success = False
+            logger.exception(f"截止时间调度器 {self.name} 执行失败: {key}")
+        if self.listener is not None:
+            self.listener(key, lag=lag, duration=time.monotonic() - started, success=success, result=result)
+
+    # ---------- 状态 ----------
+
+    def status(self) -> dict:
+        with self._cond:
+            upcoming = sorted(self._deadlines.items(), key=lambda item: item[1])[:10]
+            return {
+                "running": self.is_running(),
+                "pending": len(self._deadlines),
+                "fired": self._fired,
+                "next": [{"key": key, "deadline": deadline.isoformat()} for key, deadline in upcoming],
+                "next_resync": self._resync_at.isoformat() if self._resync_at else None,
+            }
+
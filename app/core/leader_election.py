@@ -0,0 +1,351 @@
+# app/core/leader_election.py
+"""
+多 worker 选主
+每个 uvicorn worker 都会启动调度器，周期性兜底任务与考核结束任务只应由其中一个执行。
+各 worker 的后台线程每隔 renew_interval 秒竞争 / 续期同一把带 TTL 的租约，持有者即为 leader：
+- redis：SET NX PX 获取，WATCH + MULTI 校验持有者后续期 / 释放；
+  Redis 暂时不可用时 leader 在租约 TTL 内保持身份，超时后主动让出；
+- mysql：GET_LOCK 获取并一直占用该连接（锁随连接存在），连接断开即失去租约；
+- auto：优先 redis，Redis 不可用时降级为 mysql 租约，Redis 恢复后 leader 迁回 redis 租约。
+leader 进程退出或卡死后租约在 TTL 内过期，其余 worker 下一次竞争时接管。
+选主关闭时每个 worker 都视为 leader（与原行为一致）。
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+import pytz
+import redis
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.cache import get_redis_client
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+
+def instance_identity() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RedisLease:
+    backend = "redis"
+
+    def __init__(self, name: str, identity: str, ttl: float):
+        self.key = f"leader:{name}"
+        self.identity = identity
+        self.ttl_ms = int(ttl * 1000)
+
+    def acquire(self) -> Optional[bool]:
+        """获取；返回 True 成功、False 租约已被他人持有、None Redis 不可用"""
+        client = get_redis_client()
+        if not client:
+            return None
+        try:
+            return bool(client.set(self.key, self.identity, nx=True, px=self.ttl_ms))
+        except redis.RedisError as e:
+            logger.warning(f"竞争 leader 租约失败: {e}")
+            return None
+
+    def renew(self) -> Optional[bool]:
+        """续期；返回 True 成功、False 租约已被他人持有、None Redis 暂不可用（结果未知）"""
+        client = get_redis_client()
+        if not client:
+            return None
+        try:
+            with client.pipeline() as pipe:
+                pipe.watch(self.key)
+                if pipe.get(self.key) != self.identity:
+                    return False
+                pipe.multi()
+                pipe.pexpire(self.key, self.ttl_ms)
+                pipe.execute()
+                return True
+        except redis.WatchError:
+            return False
+        except redis.RedisError as e:
+            logger.warning(f"续期 leader 租约失败: {e}")
+            return None
+
+    def release(self) -> None:
+        client = get_redis_client()
+        if not client:
+            return
+        try:
+            with client.pipeline() as pipe:
+                pipe.watch(self.key)
+                if pipe.get(self.key) == self.identity:
+                    pipe.multi()
+                    pipe.delete(self.key)
+                    pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"释放 leader 租约失败: {e}")
+
+    def holder(self) -> Optional[str]:
+        client = get_redis_client()
+        if not client:
+            return None
+        try:
+            return client.get(self.key)
+        except redis.RedisError:
+            return None
+
+
+class MySQLLease:
+    backend = "mysql"
+
+    def __init__(self, name: str, identity: str, ttl: float):
+        self.name = f"leader:{name}"
+        self.identity = identity
+        self._conn = None
+
+    def _query(self, conn, sql: str):
+        value = conn.execute(text(sql), {"name": self.name}).scalar()
+        conn.commit()  # 命名锁不随事务释放，及时结束事务避免长事务
+        return value
+
+    def acquire(self) -> bool:
+        try:
+            conn = engine.connect()
+        except SQLAlchemyError as e:
+            logger.warning(f"竞争 leader 租约失败: {e}")
+            return False
+        try:
+            if self._query(conn, "SELECT GET_LOCK(:name, 0)") == 1:
+                self._conn = conn
+                return True
+        except SQLAlchemyError as e:
+            logger.warning(f"竞争 leader 租约失败: {e}")
+        conn.close()
+        return False
+
+    def renew(self) -> Optional[bool]:
+        if self._conn is None:
+            return False
+        try:
+            if self._query(self._conn, "SELECT IS_USED_LOCK(:name) = CONNECTION_ID()") == 1:
+                return True
+        except SQLAlchemyError as e:
+            logger.warning(f"leader 租约连接已断开: {e}")
+        self._discard()
+        return False
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._query(self._conn, "SELECT RELEASE_LOCK(:name)")
+            self._conn.close()
+            self._conn = None
+        except SQLAlchemyError:
+            self._discard()
+
+    def _discard(self) -> None:
+        # 连接可能仍持有锁，不能归还连接池
+        try:
+            self._conn.invalidate()
+        finally:
+            self._conn = None
+
+    def holder(self) -> Optional[str]:
+        if self._conn is not None:
+            return self.identity
+        try:
+            with engine.connect() as conn:
+                connection_id = self._query(conn, "SELECT IS_USED_LOCK(:name)")
+        except SQLAlchemyError:
+            return None
+        return f"mysql-connection:{connection_id}" if connection_id else None
+
+
+class AutoLease:
+    """
+    Redis 租约为主、MySQL 命名锁为备：
+    - Redis 不可用时竞争 MySQL 租约，Redis 故障期间仍能选出 leader；
+    - 已有进程持有 MySQL 租约时其他进程不再竞争 Redis 租约，持有 Redis 租约的 leader 主动让出
+      （部分 worker 与 Redis 失联时不会出现两个 leader）；
+    - 持有 MySQL 租约的 leader 每次续期时尝试迁回 Redis 租约，成功后释放 MySQL 租约。
+    """
+
+    def __init__(self, name: str, identity: str, ttl: float):
+        self.identity = identity
+        self.redis = RedisLease(name, identity, ttl)
+        self.mysql = MySQLLease(name, identity, ttl)
+        self._current = None
+
+    @property
+    def backend(self) -> str:
+        return self._current.backend if self._current is not None else "auto"
+
+    def acquire(self) -> bool:
+        self._current = None
+        if self.mysql.holder() is not None:
+            return False
+        lease, acquired = self.redis, self.redis.acquire()
+        if acquired is None:
+            lease, acquired = self.mysql, self.mysql.acquire()
+        if acquired:
+            self._current = lease
+        return bool(acquired)
+
+    def renew(self) -> Optional[bool]:
+        if self._current is self.mysql:
+            return self._renew_fallback()
+
+        renewed = self.redis.renew()
+        if renewed is None:
+            # Redis 不可用：改持 MySQL 租约，避免超过 TTL 后所有 worker 都选不出 leader
+            if self.mysql.acquire():
+                logger.warning(f"Redis 不可用，leader 租约降级为 MySQL: {self.identity}")
+                self._current = self.mysql
+                return True
+            return False if self.mysql.holder() is not None else None
+        if renewed and self.mysql.holder() is not None:
+            # 与 Redis 失联的 worker 已通过 MySQL 租约当选，让出 Redis 租约，由其迁回
+            self.redis.release()
+            renewed = False
+        if not renewed:
+            self._current = None
+        return renewed
+
+    def _renew_fallback(self) -> bool:
+        if not self.mysql.renew():
+            self._current = None
+            return False
+        # Redis 租约被他人持有时（其检测到 MySQL 租约后会让出）继续持有 MySQL 租约，下次再迁回
+        if self.redis.acquire():
+            self.mysql.release()
+            self._current = self.redis
+            logger.info(f"Redis 已恢复，leader 租约迁回 Redis: {self.identity}")
+        return True
+
+    def release(self) -> None:
+        if self._current is not None:
+            self._current.release()
+            self._current = None
+
+    def holder(self) -> Optional[str]:
+        if self._current is not None:
+            return self._current.holder()
+        return self.mysql.holder() or self.redis.holder()
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        name: str,
+        *,
+        backend: str,
+        ttl: float,
+        renew_interval: float,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+    ):
+        """
+        :param backend: redis / mysql / auto（redis 为主、mysql 为备）/ none（不选主，本进程始终为 leader）
+        """
+        self.name = name
+        self.identity = instance_identity()
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        lease_types = {"redis": RedisLease, "mysql": MySQLLease, "auto": AutoLease}
+        self.lease = lease_types[backend](name, self.identity, ttl) if backend in lease_types else None
+
+        self._is_leader = False
+        self._renewed_at = 0.0
+        self._elected_at: Optional[datetime] = None
+        self._transitions = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        if self.lease is None:
+            self._promote()
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"leader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止竞争；当前为 leader 时先停止 leader 任务再释放租约，其他 worker 可立即接管"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.renew_interval + 5)
+            self._thread = None
+        if self._is_leader:
+            self._demote()
+            if self.lease is not None:
+                self.lease.release()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._tick()
+            except Exception:
+                logger.exception(f"leader 选举 {self.name} 执行失败")
+            if self._stop.wait(self.renew_interval):
+                return
+
+    def _tick(self) -> None:
+        if not self._is_leader:
+            if self.lease.acquire():
+                self._renewed_at = time.monotonic()
+                self._promote()
+            return
+
+        renewed = self.lease.renew()
+        if renewed:
+            self._renewed_at = time.monotonic()
+        elif renewed is False:
+            logger.warning(f"{self.identity} 失去 leader 租约: {self.name}")
+            self._demote()
+        elif time.monotonic() - self._renewed_at >= self.ttl:
+            # 无法确认租约状态且已超过 TTL，其他 worker 可能已接管
+            logger.warning(f"{self.identity} 超过 {self.ttl}s 未能续期 leader 租约，主动让出: {self.name}")
+            self._demote()
+
+    def _promote(self) -> None:
+        self._is_leader = True
+        self._elected_at = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+        self._transitions += 1
+        logger.info(f"{self.identity} 成为 leader: {self.name}")
+        self.on_elected()
+
+    def _demote(self) -> None:
+        self._is_leader = False
+        self._elected_at = None
+        self._transitions += 1
+        logger.info(f"{self.identity} 不再是 leader: {self.name}")
+        try:
+            self.on_demoted()
+        except Exception:
+            logger.exception(f"停止 leader 任务失败: {self.name}")
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "backend": self.lease.backend if self.lease is not None else "none",
+            "instance": self.identity,
+            "is_leader": self._is_leader,
+            "leader": self.lease.holder() if self.lease is not None else self.identity,
+            "elected_at": self._elected_at.isoformat() if self._elected_at else None,
+            "transitions": self._transitions,
+            "ttl_seconds": self.ttl,
+            "renew_interval_seconds": self.renew_interval,
+        }
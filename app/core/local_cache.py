@@ -0,0 +1,278 @@
+# app/core/local_cache.py
+"""
+进程内缓存
+- LRUCache：位于 Redis 之前的 L1 缓存，按条目数与 TTL 双重限制。
+  其他 worker 修改或删除缓存时，通过 Redis 发布/订阅通知本进程逐出对应条目。
+- MemoryCache：Redis 不可用时的降级存储，按条目数与字节预算做 LRU 淘汰，支持逐键 TTL、
+  集合与计数器操作，并维护前缀索引，按模式删除时无需扫描全部键。
+两者均为线程安全。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class LRUCache:
+    """有界 LRU 缓存：超过 max_items 时逐出最久未使用的条目，条目超过 ttl 秒后视为过期"""
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)；值本身可以为 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            stale = [k for k in self._data if k.startswith(prefix)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 单个条目的固定开销估算（字典节点、时间戳等），字节
+_ENTRY_OVERHEAD = 64
+
+
+def _estimate_size(key: str, value: Any) -> int:
+    """粗略估算条目占用的字节数，仅用于字节预算控制"""
+    if isinstance(value, (str, bytes)):
+        size = len(value)
+    elif isinstance(value, (set, frozenset)):
+        size = sum(len(m) + _ENTRY_OVERHEAD for m in value)
+    elif isinstance(value, int):
+        size = 8
+    else:
+        try:
+            size = len(json.dumps(value, ensure_ascii=False, default=str))
+        except (TypeError, ValueError):
+            size = 1024
+    return len(key) + size + _ENTRY_OVERHEAD
+
+
+def _key_prefixes(key: str) -> List[str]:
+    """键的各级冒号前缀，如 session:1:answered -> [session:, session:1:]"""
+    return [key[:i + 1] for i, ch in enumerate(key) if ch == ":"]
+
+
+class _MemoryEntry:
+    __slots__ = ("value", "expires_at", "size", "pinned")
+
+    def __init__(self, value: Any, expires_at: Optional[float], size: int, pinned: bool):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.pinned = pinned
+
+
+class MemoryCache:
+    """
+    有界内存缓存（Redis 降级存储）
+    - 超过 max_items 或 max_bytes 时，先清理已过期条目，再按 LRU 淘汰；
+    - 计数器（如题库版本号）标记为常驻，不参与淘汰，避免版本号回退导致读到旧数据；
+    - 集合成员统一存为字符串，与 Redis 行为一致。
+    """
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self._prefix_index: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    # ---------- 内部方法（调用方需持有锁） ----------
+
+    def _live_entry(self, key: str) -> Optional[_MemoryEntry]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        for prefix in _key_prefixes(key):
+            keys = self._prefix_index.get(prefix)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._prefix_index[prefix]
+        return True
+
+    def _store(self, key: str, value: Any, ttl: Optional[float], pinned: bool = False) -> None:
+        existed = key in self._data
+        if existed:
+            self._bytes -= self._data[key].size
+        expires_at = time.monotonic() + ttl if ttl else None
+        entry = _MemoryEntry(value, expires_at, _estimate_size(key, value), pinned)
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        self._bytes += entry.size
+        if not existed:
+            for prefix in _key_prefixes(key):
+                self._prefix_index.setdefault(prefix, set()).add(key)
+        self._enforce_budget()
+
+    def _resize(self, key: str, entry: _MemoryEntry) -> None:
+        self._bytes -= entry.size
+        entry.size = _estimate_size(key, entry.value)
+        self._bytes += entry.size
+        self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        if len(self._data) <= self.max_items and self._bytes <= self.max_bytes:
+            return
+        now = time.monotonic()
+        for key in [k for k, e in self._data.items() if e.expires_at is not None and e.expires_at <= now]:
+            self._remove(key)
+        # 最新写入的条目不参与本轮淘汰
+        for key in list(self._data.keys())[:-1]:
+            if len(self._data) <= self.max_items and self._bytes <= self.max_bytes:
+                break
+            if not self._data[key].pinned:
+                self._remove(key)
+
+    # ---------- 键值 ----------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._live_entry(key)
+            return default if entry is None else entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量读取（一次加锁），只返回存在的键"""
+        with self._lock:
+            result = {}
+            for key in keys:
+                entry = self._live_entry(key)
+                if entry is not None:
+                    result[key] = entry.value
+            return result
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        with self._lock:
+            for key, value in items.items():
+                self._store(key, value, ttl)
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._remove(key) for key in keys)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """按前缀删除：优先使用前缀索引，只检查最接近的冒号前缀下的键"""
+        with self._lock:
+            if not prefix:
+                count = len(self._data)
+                self.clear()
+                return count
+            colon = prefix.rfind(":")
+            if colon < 0:
+                candidates = [k for k in self._data if k.startswith(prefix)]
+            else:
+                candidates = [k for k in self._prefix_index.get(prefix[:colon + 1], ()) if k.startswith(prefix)]
+            for key in candidates:
+                self._remove(key)
+            return len(candidates)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._live_entry(key)
+            value = (entry.value if entry else 0) + 1
+            self._store(key, value, None, pinned=True)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._prefix_index.clear()
+            self._bytes = 0
+
+    # ---------- 集合 ----------
+
+    def set_add_each(self, key: str, members: Iterable[Any], ttl: Optional[float] = None) -> List[bool]:
+        """逐个添加集合成员，返回每个成员是否为新增；ttl 非空时刷新整个集合的过期时间"""
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None or not isinstance(entry.value, set):
+                self._store(key, set(), ttl)
+                entry = self._data[key]
+            elif ttl:
+                entry.expires_at = time.monotonic() + ttl
+            current = entry.value
+            added = []
+            for member in members:
+                member = str(member)
+                added.append(member not in current)
+                current.add(member)
+            self._resize(key, entry)
+            return added
+
+    def set_remove(self, key: str, members: Iterable[Any]) -> int:
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None or not isinstance(entry.value, set):
+                return 0
+            removed = {str(m) for m in members} & entry.value
+            entry.value.difference_update(removed)
+            self._resize(key, entry)
+            return len(removed)
+
+    def set_members(self, key: str) -> Set[str]:
+        with self._lock:
+            entry = self._live_entry(key)
+            return set(entry.value) if entry is not None and isinstance(entry.value, set) else set()
+
+    # ---------- 监控 ----------
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._data), "bytes": self._bytes,
+                    "max_items": self.max_items, "max_bytes": self.max_bytes}
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,15 +1,28 @@
 # app/core/scheduler.py
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.base import JobLookupError
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from typing import Iterable
+import itertools
 import logging
+import threading
 import pytz
+import redis
 
 from app.db.session import SessionLocal
-from app.models.assessment_management import AssessmentResult
+from app.models.assessment_management import Assessment, AssessmentResult
 from app.core.config import settings
+from app.core.cache import cache_service, get_redis_client
+from app.core.deadline_scheduler import DeadlineScheduler
+from app.core.leader_election import LeaderElection
+from app.core.scheduler_metrics import SCHEDULER_EVENTS, MeteredThreadPoolExecutor, scheduler_metrics
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.services.cache_warmup import warm_up_assessment, warm_up_local
+from app.services.result_finalizer import finalize_results
 
 # 定义北京时区
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
@@ -21,10 +34,10 @@ logging.getLogger('apscheduler').setLevel(logging.WARNING)  # 减少日志输出
 # 配置调度器
 jobstores = {
     # 持久化 JobStore，避免服务重启后丢失任务
-    'default': SQLAlchemyJobStore(url=settings.DATABASE_URL)
+    'default': SQLAlchemyJobStore(url=settings.DATABASE_URL),
 }
 executors = {
-    'default': ThreadPoolExecutor(max_workers=50)  # 提升并发调度能力
+    'default': MeteredThreadPoolExecutor(max_workers=50, metrics=scheduler_metrics)  # 提升并发调度能力
 }
 job_defaults = {
     'coalesce': True,  # 合并错过的任务
@@ -33,6 +46,7 @@ job_defaults = {
 }
 
 # 创建一个后台调度器实例
+# 所有 worker 共用同一个持久化作业存储：每个 worker 都以暂停状态启动（仍可添加任务），只有 leader 恢复执行
 scheduler = BackgroundScheduler(
     jobstores=jobstores,
     executors=executors,
@@ -40,9 +54,24 @@ scheduler = BackgroundScheduler(
     timezone="UTC"
 )
 
+# 记录每个任务的调度延迟、执行耗时、错过与失败次数（GET /monitoring/metrics 导出）
+scheduler.add_listener(scheduler_metrics.listener, SCHEDULER_EVENTS)
+
+# 进程内调度器，用于每个 worker 各自运行、无需持久化的任务（如答题队列刷写），不受选主影响
+local_scheduler = BackgroundScheduler(
+    jobstores={'default': MemoryJobStore()},
+    executors={'default': MeteredThreadPoolExecutor(max_workers=4, metrics=scheduler_metrics)},
+    job_defaults=job_defaults,
+    timezone="UTC"
+)
+local_scheduler.add_listener(scheduler_metrics.listener, SCHEDULER_EVENTS)
+
+
 def force_submit_assessment_session(result_id: int):
     """
-    这是我们的核心任务函数：强制提交一个考核会话。
+    强制提交单个考核会话。
+    自动交卷已改为按考核注册（见 schedule_assessment_close），保留此函数是为了让升级前持久化在作业存储中的
+    auto_submit_{result_id} 任务仍能正常加载与执行。
     """
     db: Session = SessionLocal()
     try:
@@ -58,6 +87,8 @@ def force_submit_assessment_session(result_id: int):
             result.end_time = now_beijing.replace(tzinfo=None)  # 去掉时区信息，存储为naive datetime
             db.add(result)
             db.commit()
+            cache_service.invalidate_session_state(result_id)
+            schedule_result_finalization([result_id])
             logging.info(f"Force-submitted session_id: {result_id}")
 
     except Exception as e:
@@ -66,19 +97,173 @@ def force_submit_assessment_session(result_id: int):
     finally:
         db.close()
 
-def schedule_auto_submit(result_id: int, run_time: datetime):
+
+def close_assessment(assessment_id: int):
+    """
+    考核结束任务：一条 UPDATE 结束该考核下所有未交卷的会话。
+    结束时间若已被推迟（任务未随之更新），按新的结束时间重新注册后返回。
+    """
+    db: Session = SessionLocal()
+    try:
+        assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
+        if not assessment:
+            return 0
+        now_beijing_naive = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+        if assessment.end_time > now_beijing_naive:
+            schedule_assessment_close(assessment_id, assessment.end_time)
+            return 0
+
+        result_ids = crud_assessment_result.close_open_sessions(
+            db=db, assessment_id=assessment_id, end_time=now_beijing_naive
+        )
+        cache_service.invalidate_session_states(result_ids)
+        schedule_result_finalization(result_ids)
+        logging.info(f"Closed assessment {assessment_id}: force-submitted {len(result_ids)} sessions")
+        return len(result_ids)
+    except Exception as e:
+        logging.error(f"Error closing assessment {assessment_id}: {e}")
+        scheduler_metrics.record_error("close_assessment")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+def load_assessment_deadlines():
     """
-    一个辅助函数，用于添加一个新的"自动交卷"任务。
-    :param result_id: 要交卷的会话 ID。
-    :param run_time: 任务执行的 UTC 时间。
+    截止时间调度器的数据源：尚未结束的考核，以及已结束但仍有未交卷会话的考核（后者加载后立即触发）。
     """
-    job_id = f"auto_submit_{result_id}"
+    db: Session = SessionLocal()
+    try:
+        now_beijing_naive = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+        with_open_sessions = select(AssessmentResult.assessment_id).where(AssessmentResult.end_time.is_(None))
+        return db.query(Assessment.id, Assessment.end_time).filter(
+            or_(Assessment.end_time > now_beijing_naive, Assessment.id.in_(with_open_sessions))
+        ).all()
+    finally:
+        db.close()
+
+
+# 考核结束（自动交卷）的截止时间只保存在进程内的堆中，注册时不写作业存储；
+# 其他 worker 的修改通过 Redis 频道 DEADLINE_CHANNEL 推送给 leader 立即生效，
+# 启动时及每隔 DEADLINE_RESYNC_SECONDS 秒再从数据库重建，保证重启或错过通知后不丢失
+deadline_scheduler = DeadlineScheduler(
+    "assessment_close",
+    callback=close_assessment,
+    loader=load_assessment_deadlines,
+    resync_interval=settings.DEADLINE_RESYNC_SECONDS,
+    listener=lambda assessment_id, **run: scheduler_metrics.record_run("close_assessment", **run),
+)
+
+
+def schedule_assessment_close(assessment_id: int, end_time: datetime):
+    """
+    为考核注册（或改期）结束任务，在结束时间统一提交所有未交卷的会话。
+    :param end_time: 考核结束时间（北京时间 naive datetime，与数据库一致）；已过去时立即执行。
+    """
+    deadline_scheduler.schedule(assessment_id, end_time)
+    _publish_deadline(f"{assessment_id} {end_time.isoformat()}")
+
+
+def cancel_assessment_close(assessment_id: int):
+    """移除考核的结束任务（考核删除时）"""
+    deadline_scheduler.cancel(assessment_id)
+    _publish_deadline(f"{assessment_id} cancel")
+
+
+# 截止时间变更通知：考核在任意 worker 上修改，leader 的堆中立即生效（不必等到下一次重建）
+_deadline_listener_stop = threading.Event()
+_deadline_listener_thread = None
+
+
+def _publish_deadline(message: str) -> None:
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.publish(settings.DEADLINE_CHANNEL, message)
+    except redis.RedisError as e:
+        logging.warning(f"截止时间变更通知发布失败，将在下一次重建时生效: {e}")
+
+
+def _apply_deadline_message(data: str) -> None:
+    """消息格式：{assessment_id} {结束时间 ISO 格式}，或 {assessment_id} cancel"""
+    assessment_id, _, value = data.partition(" ")
+    try:
+        if value == "cancel":
+            deadline_scheduler.cancel(int(assessment_id))
+        else:
+            deadline_scheduler.schedule(int(assessment_id), datetime.fromisoformat(value))
+    except ValueError:
+        logging.warning(f"无法解析的截止时间变更通知: {data}")
+
+
+def _listen_deadlines() -> None:
+    """leader 后台线程：订阅截止时间变更频道并更新本进程的堆；连接断开时自动重连"""
+    while not _deadline_listener_stop.is_set():
+        client = get_redis_client()
+        if client is None:
+            _deadline_listener_stop.wait(5)
+            continue
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(settings.DEADLINE_CHANNEL)
+            # (重新)订阅前可能错过了通知，从数据库重建一次
+            deadline_scheduler.resync()
+            while not _deadline_listener_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    _apply_deadline_message(message["data"])
+        except redis.RedisError as e:
+            logging.warning(f"截止时间变更订阅中断，稍后重连: {e}")
+            _deadline_listener_stop.wait(1)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+def start_deadline_listener() -> None:
+    global _deadline_listener_thread
+    if not settings.REDIS_ENABLED:
+        return
+    if _deadline_listener_thread and _deadline_listener_thread.is_alive():
+        return
+    _deadline_listener_stop.clear()
+    _deadline_listener_thread = threading.Thread(
+        target=_listen_deadlines, name="deadline-listener", daemon=True
+    )
+    _deadline_listener_thread.start()
+
+
+def stop_deadline_listener() -> None:
+    _deadline_listener_stop.set()
+    if _deadline_listener_thread:
+        _deadline_listener_thread.join(timeout=2)
+
+
+def schedule_cache_warmup(assessment_id: int, start_time: datetime):
+    """
+    为考核注册（或重新注册）开考前缓存预热任务，在开始前 CACHE_WARMUP_LEAD_MINUTES 分钟执行。
+    距开始已不足提前量时立即执行；考核已开始则不再预热。
+    :param start_time: 考核开始时间（北京时间 naive datetime，与数据库一致）。
+    """
+    if not settings.CACHE_WARMUP_ENABLED:
+        return
+    job_id = f"warmup_assessment_{assessment_id}"
+    start_time_utc = BEIJING_TZ.localize(start_time).astimezone(timezone.utc)
+    now_utc = datetime.now(timezone.utc)
+    if start_time_utc <= now_utc:
+        cancel_cache_warmup(assessment_id)
+        return
+    run_time = max(start_time_utc - timedelta(minutes=settings.CACHE_WARMUP_LEAD_MINUTES), now_utc)
     try:
         scheduler.add_job(
-            force_submit_assessment_session,
+            warm_up_assessment,
             'date',
             run_date=run_time,
-            args=[result_id],
+            args=[assessment_id],
             id=job_id,
             replace_existing=True,
             timezone="UTC",
@@ -87,51 +272,93 @@ def schedule_auto_submit(result_id: int, run_time: datetime):
         logging.error(f"Failed to schedule job {job_id}: {e}")
 
 
+def cancel_cache_warmup(assessment_id: int):
+    """移除考核的缓存预热任务（考核删除或已开始时）"""
+    try:
+        scheduler.remove_job(f"warmup_assessment_{assessment_id}")
+    except JobLookupError:
+        pass
+    except Exception as e:
+        logging.error(f"Failed to remove warmup job for assessment {assessment_id}: {e}")
+
+
 def force_submit_expired_sessions(assessment_id: int = None):
     """
     批量强制提交已过期但未交卷的会话
-    用于处理定时器失效的情况
+    用于处理定时器失效的情况：连接 assessments 一次查出过期会话，再一条 UPDATE 结束它们
     """
     db: Session = SessionLocal()
     try:
-        # 统一使用北京时间进行比较
-        now_beijing = datetime.now(BEIJING_TZ)
-
-        # 查询所有已过期但未交卷的会话
-        query = db.query(AssessmentResult).filter(
-            AssessmentResult.end_time == None
+        # 考核结束时间为北京时间（naive datetime），统一使用北京时间比较与写入
+        now_beijing_naive = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+        result_ids = crud_assessment_result.close_expired_sessions(
+            db=db, now=now_beijing_naive, assessment_id=assessment_id
         )
+        cache_service.invalidate_session_states(result_ids)
+        schedule_result_finalization(result_ids)
+        if result_ids:
+            logging.info(f"Force-submitted {len(result_ids)} expired sessions")
+        return len(result_ids)
 
-        if assessment_id:
-            query = query.filter(AssessmentResult.assessment_id == assessment_id)
+    except Exception as e:
+        logging.error(f"Error in force_submit_expired_sessions: {e}")
+        scheduler_metrics.record_error("force_submit_expired_sessions")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
 
-        # 获取这些会话关联的考核，检查是否已过期
-        from app.models.assessment_management import Assessment
-        expired_results = []
 
-        for result in query.all():
-            assessment = db.query(Assessment).filter(Assessment.id == result.assessment_id).first()
-            if assessment:
-                # 考核结束时间已经是北京时间（naive datetime），直接比较
-                end_time_beijing = BEIJING_TZ.localize(assessment.end_time) if assessment.end_time.tzinfo is None else assessment.end_time
+# 汇总任务 ID 的序号：每次提交都是独立的任务，任务名（去掉序号）统一为 finalize_results
+_finalize_seq = itertools.count(1)
 
-                if now_beijing > end_time_beijing:
-                    expired_results.append(result)
 
-        # 批量更新（统一使用北京时间）
-        count = 0
-        for result in expired_results:
-            now_beijing_naive = datetime.now(BEIJING_TZ).replace(tzinfo=None)  # 去掉时区信息，存储为naive datetime
-            result.end_time = now_beijing_naive
-            db.add(result)
-            count += 1
+def schedule_result_finalization(result_ids: Iterable[int]):
+    """
+    会话结束后提交后台汇总任务（计算会话汇总并预热成绩详情缓存），由本 worker 的进程内调度器立即执行。
+    任务随进程退出丢失时，由 leader 的兜底扫描 finalize_pending_results 补齐。
+    """
+    result_ids = list(result_ids)
+    if not result_ids:
+        return
+    try:
+        local_scheduler.add_job(finalize_results, args=[result_ids], id=f"finalize_results_{next(_finalize_seq)}")
+    except Exception as e:
+        logging.error(f"Failed to schedule finalization for {len(result_ids)} sessions: {e}")
 
-        db.commit()
-        logging.info(f"Force-submitted {count} expired sessions")
-        return count
 
+def finalize_pending_results():
+    """
+    兜底汇总：补齐已结束但还没有汇总的会话（每次最多 RESULT_FINALIZE_BATCH_SIZE 个）。
+    """
+    db: Session = SessionLocal()
+    try:
+        result_ids = crud_assessment_result.get_unfinalized_result_ids(db=db, limit=settings.RESULT_FINALIZE_BATCH_SIZE)
     except Exception as e:
-        logging.error(f"Error in force_submit_expired_sessions: {e}")
+        logging.error(f"Error in finalize_pending_results: {e}")
+        scheduler_metrics.record_error("finalize_pending_results")
+        return 0
+    finally:
+        db.close()
+    finalized = finalize_results(result_ids)
+    if finalized:
+        logging.info(f"Finalized {finalized} sessions without summaries")
+    return finalized
+
+
+def reconcile_total_scores():
+    """
+    核对近期会话的总分与答题日志之和，修正已结束会话的偏差。
+    """
+    db: Session = SessionLocal()
+    try:
+        since = datetime.now(BEIJING_TZ).replace(tzinfo=None) - timedelta(hours=settings.SCORE_RECONCILE_LOOKBACK_HOURS)
+        fixed, open_drifted = crud_assessment_result.reconcile_total_scores(db=db, since=since)
+        if fixed or open_drifted:
+            logging.warning(f"Score reconciliation: fixed {fixed} finished sessions, {open_drifted} open sessions drifted")
+        return fixed
+    except Exception as e:
+        logging.error(f"Error in reconcile_total_scores: {e}")
         db.rollback()
         return 0
     finally:
@@ -151,5 +378,101 @@ def register_housekeeping_jobs():
             id="force_submit_expired_sessions",
             replace_existing=True,
         )
+        # 每分钟补齐缺失的会话汇总
+        scheduler.add_job(
+            finalize_pending_results,
+            "interval",
+            minutes=1,
+            id="finalize_pending_results",
+            replace_existing=True,
+        )
+        # 定期核对会话总分与答题日志
+        scheduler.add_job(
+            reconcile_total_scores,
+            "interval",
+            minutes=settings.SCORE_RECONCILE_INTERVAL_MINUTES,
+            id="reconcile_total_scores",
+            replace_existing=True,
+        )
     except Exception as e:
-        logging.error(f"Failed to register housekeeping job: {e}")
\ No newline at end of file
+        logging.error(f"Failed to register housekeeping job: {e}")
+
+
+
+def register_local_jobs():
+    """
+    注册每个 worker 各自运行的进程内任务。
+    """
+    # 写后模式下，周期性将答题队列批量落库
+    from app.services.answer_ingest import is_write_behind_enabled, flush_answer_queue
+    if is_write_behind_enabled():
+        try:
+            local_scheduler.add_job(
+                flush_answer_queue,
+                "interval",
+                seconds=settings.ANSWER_FLUSH_INTERVAL_SECONDS,
+                id="flush_answer_queue",
+                replace_existing=True,
+                max_instances=1,
+            )
+        except Exception as e:
+            logging.error(f"Failed to register answer flush job: {e}")
+
+    # 进程内缓存与连接池预热：每个 worker 都要执行（共享缓存预热只由 leader 执行）
+    if settings.CACHE_WARMUP_ENABLED:
+        try:
+            local_scheduler.add_job(
+                warm_up_local,
+                "interval",
+                minutes=1,
+                next_run_time=datetime.now(timezone.utc),
+                id="warm_up_local",
+                replace_existing=True,
+                max_instances=1,
+            )
+        except Exception as e:
+            logging.error(f"Failed to register local warmup job: {e}")
+
+
+def start_leader_duties():
+    """成为 leader：恢复持久化调度器、注册兜底任务，启动考核结束截止时间调度并订阅截止时间变更"""
+    scheduler.resume()
+    register_housekeeping_jobs()
+    deadline_scheduler.start()
+    start_deadline_listener()
+
+
+def stop_leader_duties():
+    """失去 leader 身份：停止执行兜底任务与考核结束任务（任务仍保留在作业存储中，由新 leader 接管）"""
+    stop_deadline_listener()
+    deadline_scheduler.stop()
+    scheduler.pause()
+
+
+def _leader_election_backend() -> str:
+    if not settings.LEADER_ELECTION_ENABLED:
+        return "none"
+    if settings.LEADER_ELECTION_BACKEND == "auto":
+        # 启用 Redis 时仍以 MySQL 租约兜底：Redis 故障期间也能选出 leader
+        return "auto" if settings.REDIS_ENABLED else "mysql"
+    return settings.LEADER_ELECTION_BACKEND
+
+
+# 多 worker 部署时只有 leader 执行周期性兜底任务与考核结束任务
+leader_election = LeaderElection(
+    "scheduler",
+    backend=_leader_election_backend(),
+    ttl=settings.LEADER_LOCK_TTL_SECONDS,
+    renew_interval=settings.LEADER_RENEW_INTERVAL_SECONDS,
+    on_elected=start_leader_duties,
+    on_demoted=stop_leader_duties,
+)
+
+
+def render_scheduler_metrics() -> str:
+    """调度器指标（Prometheus 文本格式），附带本 worker 的 leader 身份与待触发的考核结束时间数"""
+    deadlines = deadline_scheduler.status()
+    return scheduler_metrics.render_prometheus(gauges=[
+        ("scheduler_is_leader", "本 worker 是否为调度器 leader（1 是 / 0 否）", {}, int(leader_election.is_leader)),
+        ("scheduler_deadlines_pending", "本 worker 上待触发的考核结束截止时间数", {}, deadlines["pending"]),
+    ])
@@ -0,0 +1,195 @@
+# app/core/scheduler_metrics.py
+"""
+调度器指标
+按任务统计 APScheduler 任务与考核结束截止时间（DeadlineScheduler）的执行情况：
+- 延迟：提交执行的时间 - 计划执行时间（直方图）；
+- 耗时：从提交执行到执行完成（直方图）；
+  提交时间由 MeteredThreadPoolExecutor 在提交时同步记录：APScheduler 在处理完本轮全部到期任务后才派发
+  EVENT_JOB_SUBMITTED，执行很快的任务其完成事件可能先于提交事件到达，不能依赖提交事件计时；
+- 执行次数、失败次数（任务抛出异常，或任务内部捕获异常后调用 record_error）、
+  错过次数（超过 misfire_grace_time 未执行而被跳过）；
+- 结束会话的任务（SESSION_CLOSING_JOBS）每次结束的会话数（取任务返回值）。
+任务名取任务 ID 去掉末尾的数字编号（如 warmup_assessment_12 → warmup_assessment），避免标签基数随考核数增长。
+指标只在本进程内累计，与缓存指标一起通过 GET /monitoring/metrics 导出；只有 leader 执行持久化任务。
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED
+from apscheduler.executors.pool import ThreadPoolExecutor
+
+from app.core.cache_metrics import Histogram, render_family, render_gauges
+
+# 调度延迟与执行耗时直方图的桶上界（秒），覆盖到 misfire_grace_time（300 秒）以上
+JOB_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+SCHEDULER_EVENTS = EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+
+# 返回值为本次结束（强制交卷）会话数的任务
+SESSION_CLOSING_JOBS = ("close_assessment", "force_submit_expired_sessions")
+
+_JOB_NUMBER = re.compile(r"_\d+$")
+
+
+def job_name(job_id: str) -> str:
+    return _JOB_NUMBER.sub("", job_id)
+
+
+def _lag_seconds(scheduled_run_time: datetime) -> float:
+    return max((datetime.now(timezone.utc) - scheduled_run_time).total_seconds(), 0.0)
+
+
+class _JobStats:
+    __slots__ = (
+        "lag", "duration", "runs", "errors", "misfires", "sessions_closed", "last_lag", "max_lag", "last_duration", "last_run_at",
+    )
+
+    def __init__(self):
+        self.lag = Histogram(JOB_BUCKETS)
+        self.duration = Histogram(JOB_BUCKETS)
+        self.runs = 0
+        self.errors = 0
+        self.misfires = 0
+        self.sessions_closed = 0
+        self.last_lag: Optional[float] = None
+        self.max_lag: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_run_at: Optional[str] = None
+
+
+class SchedulerMetrics:
+    def __init__(self):
+        self._jobs: Dict[str, _JobStats] = defaultdict(_JobStats)
+        # (任务 ID, 计划执行时间) -> (提交执行时的 monotonic 时间, 调度延迟)，执行完成时据此计算耗时
+        self._submitted: Dict[Tuple[str, datetime], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- 记录 ----------
+
+    def record_run(
+        self, job: str, *, lag: Optional[float], duration: Optional[float], success: bool, result=None
+    ) -> None:
+        with self._lock:
+            stats = self._jobs[job]
+            stats.runs += 1
+            if not success:
+                stats.errors += 1
+            if lag is not None:
+                stats.lag.observe(lag)
+                stats.last_lag = round(lag, 3)
+                stats.max_lag = max(stats.max_lag or 0.0, stats.last_lag)
+            if duration is not None:
+                stats.duration.observe(duration)
+                stats.last_duration = round(duration, 3)
+            if job in SESSION_CLOSING_JOBS and isinstance(result, int):
+                stats.sessions_closed += result
+            stats.last_run_at = datetime.now(timezone.utc).isoformat()
+
+    def record_submitted(self, job_id: str, run_times: Iterable[datetime]) -> None:
+        """任务提交给执行器时记录提交时间与调度延迟，执行完成时据此计算耗时"""
+        submitted = time.monotonic()
+        with self._lock:
+            for run_time in run_times:
+                self._submitted[(job_id, run_time)] = (submitted, _lag_seconds(run_time))
+
+    def discard_submitted(self, job_id: str, run_times: Iterable[datetime]) -> None:
+        """提交失败（如达到 max_instances）时移除记录"""
+        with self._lock:
+            for run_time in run_times:
+                self._submitted.pop((job_id, run_time), None)
+
+    def record_error(self, job: str) -> None:
+        """任务内部捕获异常、未抛给调度器时由任务自行记录失败"""
+        with self._lock:
+            self._jobs[job].errors += 1
+
+    def record_misfire(self, job: str) -> None:
+        with self._lock:
+            self._jobs[job].misfires += 1
+
+    def listener(self, event) -> None:
+        """APScheduler 事件监听器（通过 scheduler.add_listener(listener, SCHEDULER_EVENTS) 注册）"""
+        with self._lock:
+            submitted = self._submitted.pop((event.job_id, event.scheduled_run_time), None)
+        job = job_name(event.job_id)
+        if event.code == EVENT_JOB_MISSED:
+            self.record_misfire(job)
+            return
+        self.record_run(
+            job,
+            lag=submitted[1] if submitted else None,
+            duration=time.monotonic() - submitted[0] if submitted else None,
+            success=event.code == EVENT_JOB_EXECUTED,
+            result=event.retval,
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._jobs.clear()
+            self._submitted.clear()
+
+    # ---------- 导出 ----------
+
+    def summary(self) -> Dict[str, dict]:
+        """按任务汇总（供 /monitoring/scheduler 使用）"""
+        with self._lock:
+            return {
+                job: {
+                    "runs": stats.runs,
+                    "errors": stats.errors,
+                    "misfires": stats.misfires,
+                    "sessions_closed": stats.sessions_closed,
+                    "last_lag_seconds": stats.last_lag,
+                    "max_lag_seconds": stats.max_lag,
+                    "avg_duration_seconds": round(stats.duration.total / stats.duration.count, 3) if stats.duration.count else None,
+                    "last_duration_seconds": stats.last_duration,
+                    "last_run_at": stats.last_run_at,
+                }
+                for job, stats in sorted(self._jobs.items())
+            }
+
+    def render_prometheus(self, gauges: Iterable[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+        lines: List[str] = []
+        with self._lock:
+            jobs = sorted(self._jobs.items())
+            runs = [("scheduler_job_runs_total", (("job", job),), stats.runs) for job, stats in jobs]
+            errors = [("scheduler_job_errors_total", (("job", job),), stats.errors) for job, stats in jobs]
+            misfires = [("scheduler_job_misfires_total", (("job", job),), stats.misfires) for job, stats in jobs]
+            closed = [("scheduler_sessions_closed_total", (("job", job),), stats.sessions_closed) for job, stats in jobs]
+            lag = [sample for job, stats in jobs for sample in stats.lag.samples("scheduler_job_lag_seconds", (("job", job),))]
+            duration = [
+                sample for job, stats in jobs for sample in stats.duration.samples("scheduler_job_duration_seconds", (("job", job),))
+            ]
+
+        render_family(lines, "scheduler_job_runs_total", "调度任务执行次数", "counter", runs)
+        render_family(lines, "scheduler_job_errors_total", "调度任务失败次数", "counter", errors)
+        render_family(lines, "scheduler_job_misfires_total", "超过 misfire_grace_time 未执行而被跳过的次数", "counter", misfires)
+        render_family(lines, "scheduler_sessions_closed_total", "调度任务结束（强制交卷）的会话数", "counter", closed)
+        render_family(lines, "scheduler_job_lag_seconds", "实际开始执行时间相对计划时间的延迟（秒）", "histogram", lag)
+        render_family(lines, "scheduler_job_duration_seconds", "任务执行耗时（秒）", "histogram", duration)
+        render_gauges(lines, gauges)
+        return "\n".join(lines) + "\n"
+
+
+class MeteredThreadPoolExecutor(ThreadPoolExecutor):
+    """提交任务时同步记录提交时间的线程池执行器（配合 SchedulerMetrics.listener 统计延迟与耗时）"""
+
+    def __init__(self, max_workers: int = 10, pool_kwargs: Optional[dict] = None, *, metrics: SchedulerMetrics):
+        super().__init__(max_workers, pool_kwargs)
+        self.metrics = metrics
+
+    def submit_job(self, job, run_times) -> None:
+        self.metrics.record_submitted(job.id, run_times)
+        try:
+            super().submit_job(job, run_times)
+        except Exception:
+            self.metrics.discard_submitted(job.id, run_times)
+            raise
+
+
+# 导出
+scheduler_metrics = SchedulerMetrics()
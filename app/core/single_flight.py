@@ -0,0 +1,72 @@
+# app/core/single_flight.py
+"""
+进程内单飞（single-flight）锁
+同一个键的并发构建只允许一个执行，其余调用等待它完成后直接读取结果，避免缓存击穿时重复查询数据库。
+跨 worker 的互斥由 CacheService.try_lock（Redis 锁）负责。
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """线程版：按键分配互斥锁，无人使用时自动回收"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[threading.Lock, int]] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def lock(self, key: Hashable, blocking: bool = True):
+        """获取键对应的锁；blocking=False 时拿不到锁立即返回，as 目标为是否拿到锁"""
+        with self._guard:
+            lock, refs = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, refs + 1)
+        acquired = lock.acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+            with self._guard:
+                lock, refs = self._locks[key]
+                if refs <= 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, refs - 1)
+
+    def is_running(self, key: Hashable) -> bool:
+        """是否已有调用持有该键的锁（即正在构建）"""
+        with self._guard:
+            entry = self._locks.get(key)
+            return entry is not None and entry[0].locked()
+
+
+class AsyncSingleFlight:
+    """协程版：同一事件循环内按键合并并发调用"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def lock(self, key: Hashable):
+        lock, refs = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, refs + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, refs = self._locks[key]
+            if refs <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, refs - 1)
+
+    def is_running(self, key: Hashable) -> bool:
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
@@ -0,0 +1,139 @@
+# app/crud/crud_answer_key.py
+"""
+题库答案键（Answer Key）
+将题库下每道题的计分所需信息预编译为 {question_id: AnswerKeyEntry}，
+按 (题库ID, 题库版本号) 缓存在进程内存和 Redis 中，
+使答题计分只需一次字典查找和集合比较，无需访问数据库。
+"""
+import logging
+import threading
+from typing import Dict, FrozenSet, NamedTuple, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import cache_service, async_cache_service
+from app.models.question_management import Procedure, Question
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerKeyEntry(NamedTuple):
+    """单道题目的计分信息"""
+    procedure_id: int
+    question_type: str
+    score: int
+    valid_option_ids: FrozenSet[int]
+    correct_option_ids: FrozenSet[int]
+
+
+AnswerKey = Dict[int, AnswerKeyEntry]
+
+# 进程内答案键：{(question_bank_id, version): AnswerKey}
+_answer_key_memory: Dict[Tuple[int, int], AnswerKey] = {}
+_answer_key_lock = threading.Lock()
+
+
+def compile_answer_key(db: Session, *, question_bank_id: int) -> AnswerKey:
+    """
+    从数据库一次性加载题库下的所有题目及选项，编译为答案键。
+    """
+    questions = (
+        db.query(Question)
+        .options(joinedload(Question.options))
+        .join(Procedure, Question.procedure_id == Procedure.id)
+        .filter(Procedure.question_bank_id == question_bank_id)
+        .all()
+    )
+    return {
+        q.id: AnswerKeyEntry(
+            procedure_id=q.procedure_id,
+            question_type=q.question_type.value,
+            score=q.score,
+            valid_option_ids=frozenset(opt.id for opt in q.options),
+            correct_option_ids=frozenset(opt.id for opt in q.options if opt.is_correct),
+        )
+        for q in questions
+    }
+
+
+def _dump_answer_key(answer_key: AnswerKey) -> dict:
+    """转为可 JSON 序列化的结构（键为字符串，集合转为排序列表）"""
+    return {
+        str(qid): [
+            entry.procedure_id, entry.question_type, entry.score,
+            sorted(entry.valid_option_ids), sorted(entry.correct_option_ids)
+        ]
+        for qid, entry in answer_key.items()
+    }
+
+
+def _load_answer_key(data: dict) -> AnswerKey:
+    return {
+        int(qid): AnswerKeyEntry(
+            procedure_id=procedure_id,
+            question_type=question_type,
+            score=score,
+            valid_option_ids=frozenset(valid_ids),
+            correct_option_ids=frozenset(correct_ids),
+        )
+        for qid, (procedure_id, question_type, score, valid_ids, correct_ids) in data.items()
+    }
+
+
+def get_answer_key(db: Session, *, question_bank_id: int) -> AnswerKey:
+    """
+    获取题库答案键。
+    查找顺序：进程内存 -> Redis -> 数据库编译（并回写两级缓存）。
+    """
+    version = cache_service.get_bank_version(question_bank_id)
+    memory_key = (question_bank_id, version)
+
+    answer_key = _answer_key_memory.get(memory_key)
+    if answer_key is not None:
+        return answer_key
+
+    cached_data = cache_service.get_answer_key(question_bank_id, version)
+    if cached_data:
+        logger.debug(f"从缓存获取题库答案键: {question_bank_id} v{version}")
+        answer_key = _load_answer_key(cached_data)
+    else:
+        logger.debug(f"缓存未命中，从数据库编译题库答案键: {question_bank_id} v{version}")
+        answer_key = compile_answer_key(db, question_bank_id=question_bank_id)
+        if answer_key:
+            cache_service.set_answer_key(question_bank_id, version, _dump_answer_key(answer_key))
+
+    _remember(memory_key, answer_key)
+    return answer_key
+
+
+async def get_answer_key_async(db: AsyncSession, *, question_bank_id: int) -> AnswerKey:
+    """
+    异步版 get_answer_key：缓存读写走异步 Redis，
+    未命中时通过 run_sync 在异步连接上执行同一份编译查询。
+    """
+    version = await async_cache_service.get_bank_version(question_bank_id)
+    memory_key = (question_bank_id, version)
+
+    answer_key = _answer_key_memory.get(memory_key)
+    if answer_key is not None:
+        return answer_key
+
+    cached_data = await async_cache_service.get_answer_key(question_bank_id, version)
+    if cached_data:
+        answer_key = _load_answer_key(cached_data)
+    else:
+        answer_key = await db.run_sync(lambda s: compile_answer_key(s, question_bank_id=question_bank_id))
+        if answer_key:
+            await async_cache_service.set_answer_key(question_bank_id, version, _dump_answer_key(answer_key))
+
+    _remember(memory_key, answer_key)
+    return answer_key
+
+
+def _remember(memory_key: Tuple[int, int], answer_key: AnswerKey) -> None:
+    with _answer_key_lock:
+        # 同一题库只保留当前版本，旧版本直接丢弃
+        for stale_key in [k for k in _answer_key_memory if k[0] == memory_key[0]]:
+            _answer_key_memory.pop(stale_key, None)
+        _answer_key_memory[memory_key] = answer_key
@@ -1,13 +1,16 @@
 # app/crud/crud_answer_log.py (最终修复版)
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from typing import Tuple
+from typing import List, Set, Tuple
 import pytz
 
 from app.crud.base import CRUDBase
-from app.models.assessment_management import AnswerLog, AssessmentResult
-from app.models.question_management import Question
-from sqlalchemy.orm import joinedload
+from app.models.assessment_management import AnswerLog
+from app.crud.crud_answer_key import AnswerKey, AnswerKeyEntry, get_answer_key, get_answer_key_async
+from app.crud.crud_assessment_result import crud_assessment_result
 
 from app.schemas.examinee import SubmitAnswerRequest
 from pydantic import BaseModel
@@ -15,82 +18,205 @@ from pydantic import BaseModel
 # 定义北京时区
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
 
+class DuplicateAnswerError(Exception):
+    """该会话的这道题已有答题日志（answer_logs 上 (result_id, question_id) 唯一）"""
+
+
+# 唯一索引冲突的报错特征：MySQL 报索引名，SQLite 报列名
+_DUPLICATE_ANSWER_MARKERS = ("uq_answer_logs_result_question", "answer_logs.result_id, answer_logs.question_id")
+
+
+def _is_duplicate_answer(error: IntegrityError) -> bool:
+    """是否为 (result_id, question_id) 唯一索引冲突；外键、非空等其他约束错误返回 False"""
+    message = str(error.orig)
+    return any(marker in message for marker in _DUPLICATE_ANSWER_MARKERS)
+
+
+def _insert_ignore_stmt():
+    return insert(AnswerLog).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+
+
+def insert_new_logs(db: Session, rows: List[dict]) -> List[dict]:
+    """
+    插入答题日志，跳过 (result_id, question_id) 已存在的行，返回实际插入的行（只有这些行计分）。
+    先整批插入（一次 executemany）；遇到唯一索引冲突时回滚到保存点，逐行 INSERT IGNORE 并按影响行数判断。
+    其他完整性错误（外键、非空等）原样抛出，不会被 INSERT IGNORE 吞掉。不提交事务。
+    """
+    if not rows:
+        return []
+    try:
+        with db.begin_nested():
+            db.execute(insert(AnswerLog), rows)
+        return rows
+    except IntegrityError as e:
+        if not _is_duplicate_answer(e):
+            raise
+    # 走连接（Core）执行，才能拿到每行的影响行数
+    conn, stmt = db.connection(), _insert_ignore_stmt()
+    return [row for row in rows if conn.execute(stmt, row).rowcount]
+
+
+async def insert_new_logs_async(db: AsyncSession, rows: List[dict]) -> List[dict]:
+    """异步版 insert_new_logs"""
+    if not rows:
+        return []
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(AnswerLog), rows)
+        return rows
+    except IntegrityError as e:
+        if not _is_duplicate_answer(e):
+            raise
+    conn, stmt = await db.connection(), _insert_ignore_stmt()
+    inserted = []
+    for row in rows:
+        if (await conn.execute(stmt, row)).rowcount:
+            inserted.append(row)
+    return inserted
+
+
+def score_answer(entry: AnswerKeyEntry, submitted_option_ids: Set[int]) -> Tuple[int, bool]:
+    """
+    根据答案键条目为一次作答计分，返回 (得分, 是否正确)。
+    纯函数，不访问数据库。
+    """
+    correct_option_ids = entry.correct_option_ids
+
+    score_awarded = 0
+    is_correct = False
+
+    if entry.question_type == 'deduction_single_choice':
+        if submitted_option_ids == correct_option_ids:
+            score_awarded = 0
+            is_correct = True
+        else:
+            score_awarded = -entry.score
+            is_correct = False
+    elif entry.question_type == 'multiple_choice':
+        if not submitted_option_ids.issubset(correct_option_ids):
+            score_awarded = 0
+            is_correct = False
+        else:
+            if submitted_option_ids == correct_option_ids:
+                score_awarded = entry.score
+                is_correct = True
+            elif submitted_option_ids:
+                if len(correct_option_ids) > 0:
+                    score_per_option = entry.score / len(correct_option_ids)
+                    score_awarded = round(len(submitted_option_ids) * score_per_option)
+                else:
+                    score_awarded = 0
+                is_correct = False
+            else:
+                score_awarded = 0
+                is_correct = False
+    elif entry.question_type == 'single_choice':
+        if submitted_option_ids == correct_option_ids:
+            score_awarded = entry.score
+            is_correct = True
+
+    return score_awarded, is_correct
+
+
 class CRUDAnswerLog(CRUDBase[AnswerLog, SubmitAnswerRequest, BaseModel]):
-    def calculate_and_log_answer(
-        self, db: Session, *, result: AssessmentResult, answer_in: SubmitAnswerRequest
+    def score_submission(
+        self, db: Session, *, question_bank_id: int, answer_in: SubmitAnswerRequest
     ) -> Tuple[int, bool]:
-        # 1. 基础校验：问题是否存在，点位是否匹配
-        question = (
-            db.query(Question).options(joinedload(Question.options))
-            .filter(Question.id == answer_in.question_id).first()
-        )
-        if not question: 
+        """
+        校验并计分一次作答（基于预编译答案键，缓存命中时不访问数据库）。
+        校验失败时抛出 ValueError。
+        """
+        answer_key = get_answer_key(db, question_bank_id=question_bank_id)
+        return self._score_with_key(answer_key, answer_in)
+
+    async def score_submission_async(
+        self, db: AsyncSession, *, question_bank_id: int, answer_in: SubmitAnswerRequest
+    ) -> Tuple[int, bool]:
+        """异步版 score_submission"""
+        answer_key = await get_answer_key_async(db, question_bank_id=question_bank_id)
+        return self._score_with_key(answer_key, answer_in)
+
+    @staticmethod
+    def _score_with_key(answer_key: AnswerKey, answer_in: SubmitAnswerRequest) -> Tuple[int, bool]:
+        # 1. 基础校验：问题是否存在（且属于本场考核的题库），点位是否匹配
+        entry = answer_key.get(answer_in.question_id)
+        if not entry:
             raise ValueError(f"Question with id {answer_in.question_id} not found.")
-        if question.procedure_id != answer_in.procedure_id: 
+        if entry.procedure_id != answer_in.procedure_id:
             raise ValueError("Procedure ID mismatch for the given question.")
-            
-        # --- 【核心新增校验】 ---
+
         # 2. 严格校验：所有提交的选项ID，是否都属于当前问题
-        valid_option_ids_for_question = {opt.id for opt in question.options}
         submitted_option_ids = set(answer_in.selected_option_ids)
-        
-        if not submitted_option_ids.issubset(valid_option_ids_for_question):
-            invalid_ids = submitted_option_ids - valid_option_ids_for_question
+        if not submitted_option_ids.issubset(entry.valid_option_ids):
+            invalid_ids = submitted_option_ids - entry.valid_option_ids
             raise ValueError(f"Invalid option ID(s) submitted for this question: {invalid_ids}")
-        # --- 校验结束 ---
-
-        # 3. 提取正确答案和计分
-        correct_option_ids = {opt.id for opt in question.options if opt.is_correct}
-        
-        score_awarded = 0
-        is_correct = False
-        
-        # (后续的计分逻辑、日志记录、分数更新等，完全保持不变)
-        if question.question_type.value == 'deduction_single_choice':
-            if submitted_option_ids == correct_option_ids:
-                score_awarded = 0
-                is_correct = True
-            else:
-                score_awarded = -question.score
-                is_correct = False
-        elif question.question_type.value == 'multiple_choice':
-            if not submitted_option_ids.issubset(correct_option_ids):
-                score_awarded = 0
-                is_correct = False
-            else:
-                if submitted_option_ids == correct_option_ids:
-                    score_awarded = question.score
-                    is_correct = True
-                elif submitted_option_ids:
-                    if len(correct_option_ids) > 0:
-                        score_per_option = question.score / len(correct_option_ids)
-                        score_awarded = round(len(submitted_option_ids) * score_per_option)
-                    else:
-                        score_awarded = 0
-                    is_correct = False
-                else:
-                    score_awarded = 0
-                    is_correct = False
-        elif question.question_type.value == 'single_choice':
-            if submitted_option_ids == correct_option_ids:
-                score_awarded = question.score
-                is_correct = True
 
-        # 4. 记录日志并提交（统一使用北京时间）
-        now_beijing = datetime.now(BEIJING_TZ)
-        db_log = AnswerLog(
-            result_id=result.id,
-            question_id=answer_in.question_id,
-            selected_option_ids=answer_in.selected_option_ids,
-            score_awarded=score_awarded,
-            answered_at=now_beijing.replace(tzinfo=None)  # 去掉时区信息，存储为naive datetime
+        # 3. 计分
+        return score_answer(entry, submitted_option_ids)
+
+    def calculate_and_log_answer(
+        self, db: Session, *, result_id: int, question_bank_id: int, answer_in: SubmitAnswerRequest
+    ) -> Tuple[int, bool]:
+        score_awarded, is_correct = self.score_submission(
+            db=db, question_bank_id=question_bank_id, answer_in=answer_in
         )
-        db.add(db_log)
-        result.total_score = (result.total_score or 0) + score_awarded
-        db.add(result)
+
+        # 4. 记录日志并提交（统一使用北京时间）；同一题已有日志（并发重复提交）时不计分
+        if not insert_new_logs(db, self._build_log_rows(result_id, [(answer_in, score_awarded)])):
+            db.rollback()
+            raise DuplicateAnswerError(answer_in.question_id)
+        # 总分在数据库端原子累加，避免并发答题时读-改-写丢失更新，也无需回查
+        crud_assessment_result.increment_total_score(db=db, result_id=result_id, delta=score_awarded)
         db.commit()
-        db.refresh(result)
-        
+
         return score_awarded, is_correct
 
+    def log_answers(
+        self, db: Session, *, result_id: int, scored_answers: List[Tuple[SubmitAnswerRequest, int]]
+    ) -> Tuple[int, Set[int]]:
+        """
+        批量记录已计分的答题日志：一次 executemany 插入，一次更新总分，一次提交。
+        返回 (本批次的总分增量, 已有日志而未插入的题目ID)；总分只累加实际插入的记录。
+        """
+        if not scored_answers:
+            return 0, set()
+
+        inserted = insert_new_logs(db, self._build_log_rows(result_id, scored_answers))
+        score_delta = sum(row["score_awarded"] for row in inserted)
+        crud_assessment_result.increment_total_score(db=db, result_id=result_id, delta=score_delta)
+        db.commit()
+        return score_delta, self._duplicate_question_ids(scored_answers, inserted)
+
+    async def log_answers_async(
+        self, db: AsyncSession, *, result_id: int, scored_answers: List[Tuple[SubmitAnswerRequest, int]]
+    ) -> Tuple[int, Set[int]]:
+        """异步版 log_answers，单题提交也走此方法（列表长度为 1）"""
+        if not scored_answers:
+            return 0, set()
+
+        inserted = await insert_new_logs_async(db, self._build_log_rows(result_id, scored_answers))
+        score_delta = sum(row["score_awarded"] for row in inserted)
+        await crud_assessment_result.increment_total_score_async(db=db, result_id=result_id, delta=score_delta)
+        await db.commit()
+        return score_delta, self._duplicate_question_ids(scored_answers, inserted)
+
+    @staticmethod
+    def _duplicate_question_ids(scored_answers: List[Tuple[SubmitAnswerRequest, int]], inserted: List[dict]) -> Set[int]:
+        return {answer_in.question_id for answer_in, _ in scored_answers} - {row["question_id"] for row in inserted}
+
+    @staticmethod
+    def _build_log_rows(result_id: int, scored_answers: List[Tuple[SubmitAnswerRequest, int]]) -> List[dict]:
+        # 统一使用北京时间，去掉时区信息存储为 naive datetime
+        answered_at = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+        return [
+            {
+                "result_id": result_id,
+                "question_id": answer_in.question_id,
+                "selected_option_ids": answer_in.selected_option_ids,
+                "score_awarded": score_awarded,
+                "answered_at": answered_at,
+            }
+            for answer_in, score_awarded in scored_answers
+        ]
+
 crud_answer_log = CRUDAnswerLog(AnswerLog)
\ No newline at end of file
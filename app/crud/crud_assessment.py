@@ -5,7 +5,64 @@ from app.schemas.assessment import AssessmentCreate, AssessmentUpdate
 from app.models.question_management import QuestionBank
 
 from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import case, select
 from sqlalchemy.orm import Session 
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import cache_service, async_cache_service
+from app.core.config import settings
+from app.schemas.assessment import Assessment as AssessmentSchema
+
+# 缓存未命中标记（区别于“缓存命中但平台没有考核”的 None）
+_MISS = object()
+
+
+def _upcoming_stmt(platform_id: int, now: datetime):
+    """平台下最优先考核：已开始的排在前面，同类中按开始时间升序，取第一条"""
+    return (
+        select(Assessment)
+        .join(QuestionBank, Assessment.question_bank_id == QuestionBank.id)
+        .where(
+            QuestionBank.platform_id == platform_id,
+            Assessment.end_time > now  # 直接用 naive 时间比较
+        )
+        .order_by(case((Assessment.start_time <= now, 0), else_=1), Assessment.start_time.asc())
+        .limit(1)
+    )
+
+
+def _build_schedule_entry(assessment: Assessment | None) -> dict:
+    """
+    构造平台调度缓存项：最优先考核 + 缓存有效截止时间。
+    考核未开始时截止到开始时间，进行中时截止到结束时间，没有考核时按默认有效期。
+    """
+    now = datetime.now()
+    if assessment is None:
+        valid_until = now + timedelta(seconds=settings.CACHE_TTL_ASSESSMENT)
+        return {"assessment": None, "valid_until": valid_until.isoformat()}
+
+    boundary = assessment.start_time if assessment.start_time > now else assessment.end_time
+    valid_until = min(boundary, now + timedelta(seconds=settings.CACHE_TTL_ASSESSMENT))
+    return {
+        "assessment": AssessmentSchema.model_validate(assessment).model_dump(mode="json"),
+        "valid_until": valid_until.isoformat(),
+    }
+
+
+def _schedule_entry_ttl(entry: dict) -> int:
+    remaining = datetime.fromisoformat(entry["valid_until"]) - datetime.now()
+    return max(int(remaining.total_seconds()), 1)
+
+
+def _read_schedule_entry(entry: Optional[dict]):
+    """
+    读取缓存项，返回考核字典 / None；缓存不存在或已过截止时间时返回 _MISS。
+    （内存降级缓存不支持 TTL，因此额外校验截止时间）
+    """
+    if not entry or datetime.fromisoformat(entry["valid_until"]) <= datetime.now():
+        return _MISS
+    return entry["assessment"]
 
 
 class CRUDAssessment(CRUDBase[Assessment, AssessmentCreate, AssessmentUpdate]):
@@ -16,36 +73,51 @@ class CRUDAssessment(CRUDBase[Assessment, AssessmentCreate, AssessmentUpdate]):
         """
         在指定平台下，获取即将开始或正在进行的、最优先的考核。
         优先级：1. 正在进行的； 2. 即将开始且离现在最近的。
+        一次联表 LIMIT 1 查询完成，不再把平台下所有未结束的考核加载到内存。
         """
-        now = datetime.now() # 获取当前的 naive 时间
-        
-        # 1. 找到该平台下的所有题库ID
-        platform_banks = db.query(QuestionBank.id).filter(QuestionBank.platform_id == platform_id).all()
-        if not platform_banks: return None
-        platform_bank_ids = [b.id for b in platform_banks]
+        return db.execute(_upcoming_stmt(platform_id, datetime.now())).scalars().first()
 
-        assessments = (
-            db.query(Assessment)
-            .filter(
-                Assessment.question_bank_id.in_(platform_bank_ids),
-                Assessment.end_time > now # 直接用 naive 时间比较
-            )
-            .order_by(Assessment.start_time.asc())
-            .all()
-        )
-        
-        if not assessments:
-            return None
-
-        # 3. 应用业务优先级逻辑
-        # 优先返回已经开始的
-        for assessment in assessments:
-            if assessment.start_time <= now:
-                return assessment
-        
-        # 如果没有正在进行的，则返回第一个即将开始的
-        return assessments[0]
+    async def get_upcoming_or_active_async(self, db: AsyncSession, *, platform_id: int) -> Assessment | None:
+        """
+        异步版 get_upcoming_or_active。
+        """
+        return (await db.execute(_upcoming_stmt(platform_id, datetime.now()))).scalars().first()
+
+    def get_upcoming_schedule_entry(self, db: Session, *, platform_id: int) -> Optional[dict]:
+        """
+        获取平台当前最优先考核（已序列化为 schemas.Assessment 字典），优先读取缓存。
+        缓存有效期对齐到下一个开始/结束时间点，到点后自动重新计算。
+        """
+        version = cache_service.get_platform_version(platform_id)
+        assessment = _read_schedule_entry(cache_service.get_upcoming_assessment(platform_id, version))
+        if assessment is not _MISS:
+            return assessment
+
+        entry = _build_schedule_entry(self.get_upcoming_or_active(db, platform_id=platform_id))
+        cache_service.set_upcoming_assessment(platform_id, version, entry, ttl=_schedule_entry_ttl(entry))
+        return entry["assessment"]
+
+    async def get_upcoming_schedule_entry_async(self, db: AsyncSession, *, platform_id: int) -> Optional[dict]:
+        """
+        异步版 get_upcoming_schedule_entry。
+        """
+        version = await async_cache_service.get_platform_version(platform_id)
+        assessment = _read_schedule_entry(await async_cache_service.get_upcoming_assessment(platform_id, version))
+        if assessment is not _MISS:
+            return assessment
+
+        entry = _build_schedule_entry(await self.get_upcoming_or_active_async(db, platform_id=platform_id))
+        await async_cache_service.set_upcoming_assessment(platform_id, version, entry, ttl=_schedule_entry_ttl(entry))
+        return entry["assessment"]
 
+    def invalidate_upcoming_cache(self, db: Session, *, question_bank_ids: Iterable[int]) -> None:
+        """考核创建、修改、删除后，使所属平台的最优先考核缓存失效（递增平台版本号）"""
+        platform_ids = {
+            platform_id for (platform_id,) in
+            db.query(QuestionBank.platform_id).filter(QuestionBank.id.in_(set(question_bank_ids))).all()
+        }
+        for platform_id in platform_ids:
+            cache_service.invalidate_assessment(platform_id)
 
     def check_time_conflict(
         self, db: Session, *, question_bank_id: int, start_time: datetime, end_time: datetime
@@ -1,21 +1,32 @@
 # app/crud/crud_assessment_result.py
 import json
+import logging
 from datetime import datetime
 import pytz
 
+from sqlalchemy import delete, func, select, update
+
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from app.crud.base import CRUDBase
-from app.models.assessment_management import AssessmentResult, AnswerLog, Assessment
+from app.core.cache import cache_service, cached
+from app.db.session import SessionLocal
+from app.models.assessment_management import AssessmentResult, AnswerLog, Assessment, AssessmentResultSummary
 from app.models.question_management import Question, QuestionBank, Procedure
 from app.schemas.examinee import BaseModel # 仅用于类型提示
 from typing import List, Tuple
 from typing import Dict
 from sqlalchemy.orm import selectinload
 
+logger = logging.getLogger(__name__)
+
 # 定义北京时区
 BEIJING_TZ = pytz.timezone('Asia/Shanghai')
 
+# 成绩记录总数只用于管理端分页展示：30 秒后在后台刷新，最长保留 5 分钟
+RESULT_COUNT_SOFT_TTL = 30
+RESULT_COUNT_TTL = 300
 
 
 class CRUDAssessmentResult(CRUDBase[AssessmentResult, BaseModel, BaseModel]):
@@ -64,6 +75,135 @@ class CRUDAssessmentResult(CRUDBase[AssessmentResult, BaseModel, BaseModel]):
             # 极端情况：如果还是查不到，抛出异常
             raise ValueError(f"无法获取或创建考核会话: assessment={assessment_id}, examinee={examinee_id}")
 
+    def increment_total_score(self, db: Session, *, result_id: int, delta: int) -> None:
+        """
+        在数据库端原子累加会话总分：
+        UPDATE assessment_results SET total_score = COALESCE(total_score, 0) + :delta
+        不提交事务，由调用方与答题日志插入一起提交。
+        """
+        db.execute(self._increment_total_score_stmt(result_id, delta))
+
+    @staticmethod
+    def _increment_total_score_stmt(result_id: int, delta: int):
+        return (
+            update(AssessmentResult)
+            .where(AssessmentResult.id == result_id)
+            .values(total_score=func.coalesce(AssessmentResult.total_score, 0) + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+    def reconcile_total_scores(self, db: Session, *, since: datetime) -> Tuple[int, int]:
+        """
+        核对 since 之后开始的会话：total_score 是否等于 SUM(answer_logs.score_awarded)。
+        已结束的会话直接按日志重算修正；进行中的会话只记录告警，避免与并发答题竞争。
+        返回 (修正的会话数, 进行中且不一致的会话数)。
+        """
+        logged_sum = func.coalesce(func.sum(AnswerLog.score_awarded), 0)
+        drifted = (
+            db.query(AssessmentResult.id, AssessmentResult.end_time, AssessmentResult.total_score, logged_sum)
+            .outerjoin(AnswerLog, AnswerLog.result_id == AssessmentResult.id)
+            .filter(AssessmentResult.start_time >= since)
+            .group_by(AssessmentResult.id, AssessmentResult.end_time, AssessmentResult.total_score)
+            .having(func.coalesce(AssessmentResult.total_score, 0) != logged_sum)
+            .all()
+        )
+
+        fixed_ids = []
+        for result_id, end_time, total_score, expected in drifted:
+            if end_time is None:
+                logger.warning(f"进行中的会话总分与答题日志不一致: result={result_id}, total={total_score}, logs={expected}")
+            else:
+                logger.warning(f"修正会话总分: result={result_id}, total={total_score} -> {expected}")
+                fixed_ids.append(result_id)
+
+        if fixed_ids:
+            recomputed = (
+                select(func.coalesce(func.sum(AnswerLog.score_awarded), 0))
+                .where(AnswerLog.result_id == AssessmentResult.id)
+                .scalar_subquery()
+            )
+            db.execute(
+                update(AssessmentResult)
+                .where(AssessmentResult.id.in_(fixed_ids))
+                .values(total_score=recomputed)
+                .execution_options(synchronize_session=False)
+            )
+            # 汇总已过时：删除后由兜底扫描重新汇总（同时刷新成绩详情缓存）
+            db.execute(
+                delete(AssessmentResultSummary)
+                .where(AssessmentResultSummary.result_id.in_(fixed_ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            cache_service.invalidate_result_details(fixed_ids)
+        return len(fixed_ids), len(drifted) - len(fixed_ids)
+
+    def close_open_sessions(self, db: Session, *, assessment_id: int, end_time: datetime) -> List[int]:
+        """
+        结束某场考核下所有未交卷的会话，返回被结束的会话 ID，供调用方清理会话缓存。
+        """
+        return self._close_sessions(
+            db,
+            select(AssessmentResult.id).where(
+                AssessmentResult.assessment_id == assessment_id,
+                AssessmentResult.end_time.is_(None),
+            ),
+            end_time,
+        )
+
+    def close_expired_sessions(self, db: Session, *, now: datetime, assessment_id: int = None) -> List[int]:
+        """
+        结束所有考核已过结束时间、但仍未交卷的会话（兜底扫描用），返回被结束的会话 ID。
+        与 assessments 连接后一次查出，不再逐个会话查询所属考核。
+        """
+        stmt = (
+            select(AssessmentResult.id)
+            .join(Assessment, Assessment.id == AssessmentResult.assessment_id)
+            .where(AssessmentResult.end_time.is_(None), Assessment.end_time < now)
+        )
+        if assessment_id:
+            stmt = stmt.where(AssessmentResult.assessment_id == assessment_id)
+        return self._close_sessions(db, stmt, now)
+
+    @staticmethod
+    def _close_sessions(db: Session, id_query, end_time: datetime) -> List[int]:
+        """
+        先按 id_query 查出会话 ID（MySQL 的 UPDATE 无法返回受影响的行），再一条 UPDATE 写入结束时间。
+        UPDATE 仍带 end_time IS NULL 条件，期间自行交卷的会话不会被覆盖。
+        """
+        result_ids = list(db.scalars(id_query))
+        if not result_ids:
+            return []
+        db.execute(
+            update(AssessmentResult)
+            .where(AssessmentResult.id.in_(result_ids), AssessmentResult.end_time.is_(None))
+            .values(end_time=end_time)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result_ids
+
+    def get_open_result_ids(self, db: Session, *, assessment_id: int) -> List[int]:
+        """某场考核下所有未交卷的会话 ID"""
+        return list(db.scalars(
+            select(AssessmentResult.id).where(
+                AssessmentResult.assessment_id == assessment_id,
+                AssessmentResult.end_time.is_(None),
+            )
+        ))
+
+    def get_unfinalized_result_ids(self, db: Session, *, limit: int) -> List[int]:
+        """
+        已结束但还没有汇总的会话 ID（汇总任务丢失、总分被修正或升级前结束的会话），最近结束的优先。
+        """
+        return list(db.scalars(
+            select(AssessmentResult.id)
+            .outerjoin(AssessmentResultSummary, AssessmentResultSummary.result_id == AssessmentResult.id)
+            .where(AssessmentResult.end_time.is_not(None), AssessmentResultSummary.result_id.is_(None))
+            .order_by(AssessmentResult.end_time.desc())
+            .limit(limit)
+        ))
+
     def get_answered_question_ids(self, db: Session, *, result_id: int) -> List[int]:
         """
         获取某次考核会话中所有已回答问题的 ID 列表。
@@ -95,14 +235,14 @@ class CRUDAssessmentResult(CRUDBase[AssessmentResult, BaseModel, BaseModel]):
         self, db: Session, *, assessment_id: int, skip: int = 0, limit: int = 100
     ) -> List[AssessmentResult]:
         """
-        获取某场考核下的所有成绩记录，并预加载考生和答题日志
+        获取某场考核下的所有成绩记录，并预加载考生和会话汇总（列表页不需要答题日志）
         """
         return (
             db.query(AssessmentResult)
             .filter(AssessmentResult.assessment_id == assessment_id)
             .options(
                 selectinload(AssessmentResult.examinee),
-                selectinload(AssessmentResult.answer_logs)
+                selectinload(AssessmentResult.summary)
             )
             .order_by(AssessmentResult.id)
             .offset(skip)
@@ -110,9 +250,13 @@ class CRUDAssessmentResult(CRUDBase[AssessmentResult, BaseModel, BaseModel]):
             .all()
         )
 
+    @cached(
+        lambda self, db, *, assessment_id: cache_service.result_count_key(assessment_id),
+        ttl=RESULT_COUNT_TTL, soft_ttl=RESULT_COUNT_SOFT_TTL, session_factory=SessionLocal,
+    )
     def get_count_by_assessment(self, db: Session, *, assessment_id: int) -> int:
         """
-        获取某场考核下的成绩记录总数
+        获取某场考核下的成绩记录总数（缓存，软过期后在后台刷新）
         """
         return db.query(AssessmentResult).filter(
             AssessmentResult.assessment_id == assessment_id
@@ -124,7 +268,10 @@ class CRUDAssessmentResult(CRUDBase[AssessmentResult, BaseModel, BaseModel]):
         { question_id: [selected_option_ids] }
         """
         logs = db.query(AnswerLog).filter(AnswerLog.result_id == result_id).all()
-        
+        return self._build_answered_map(logs)
+
+    @staticmethod
+    def _build_answered_map(logs: List[AnswerLog]) -> Dict[int, dict]:
         answered_map = {}
         for log in logs:
             # 确保 selected_option_ids 是一个列表
@@ -158,4 +305,69 @@ class CRUDAssessmentResult(CRUDBase[AssessmentResult, BaseModel, BaseModel]):
         ).first()
 
 
+    # ============ 异步版本（供异步客户端接口使用） ============
+
+    async def get_active_session_async(
+        self, db: AsyncSession, *, assessment_id: int, examinee_id: int
+    ) -> AssessmentResult | None:
+        return (await db.execute(
+            select(AssessmentResult).where(
+                AssessmentResult.assessment_id == assessment_id,
+                AssessmentResult.examinee_id == examinee_id,
+                AssessmentResult.end_time == None
+            ).limit(1)
+        )).scalars().first()
+
+    async def get_or_create_active_session_async(
+        self, db: AsyncSession, *, assessment_id: int, examinee_id: int
+    ) -> Tuple[AssessmentResult, bool]:
+        """异步版 get_or_create_active_session，同样依赖唯一约束处理并发竞态"""
+        session = await self.get_active_session_async(db=db, assessment_id=assessment_id, examinee_id=examinee_id)
+        if session:
+            return session, False
+
+        try:
+            now_beijing = datetime.now(BEIJING_TZ)
+            session = AssessmentResult(
+                assessment_id=assessment_id,
+                examinee_id=examinee_id,
+                start_time=now_beijing.replace(tzinfo=None)
+            )
+            db.add(session)
+            await db.flush()
+            await db.commit()
+            return session, True
+        except IntegrityError:
+            await db.rollback()
+            session = await self.get_active_session_async(db=db, assessment_id=assessment_id, examinee_id=examinee_id)
+            if session:
+                return session, False
+            raise ValueError(f"无法获取或创建考核会话: assessment={assessment_id}, examinee={examinee_id}")
+
+    async def get_finished_session_async(
+        self, db: AsyncSession, *, assessment_id: int, examinee_id: int
+    ) -> AssessmentResult | None:
+        return (await db.execute(
+            select(AssessmentResult).where(
+                AssessmentResult.assessment_id == assessment_id,
+                AssessmentResult.examinee_id == examinee_id,
+                AssessmentResult.end_time != None
+            ).limit(1)
+        )).scalars().first()
+
+    async def get_answered_question_ids_async(self, db: AsyncSession, *, result_id: int) -> List[int]:
+        return list((await db.execute(
+            select(AnswerLog.question_id).where(AnswerLog.result_id == result_id)
+        )).scalars().all())
+
+    async def get_answered_logs_map_async(self, db: AsyncSession, *, result_id: int) -> Dict[int, dict]:
+        logs = (await db.execute(
+            select(AnswerLog).where(AnswerLog.result_id == result_id)
+        )).scalars().all()
+        return self._build_answered_map(logs)
+
+    async def increment_total_score_async(self, db: AsyncSession, *, result_id: int, delta: int) -> None:
+        await db.execute(self._increment_total_score_stmt(result_id, delta))
+
+
 crud_assessment_result = CRUDAssessmentResult(AssessmentResult)
\ No newline at end of file
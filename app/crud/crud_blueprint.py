@@ -1,28 +1,396 @@
 # app/crud/crud_blueprint.py (最终、最简化、最正确版本)
+"""
+题库蓝图
+蓝图按工序预序列化为 orjson 字节片段（BlueprintSegment），按 (题库ID, 题库版本号) 缓存在进程内存，
+整份蓝图以 JSON 文本按同一版本号缓存在 Redis。开始/继续考核时直接拼接字节生成响应体，
+只有部分作答的工序需要反序列化并注入已选答案，不再构建 Pydantic 对象。
+
+内容版本（content_version）格式为 "{题库ID}.{题库版本号}.{蓝图内容摘要}-{已答集合摘要}"：
+客户端重连时通过 If-None-Match 回传，蓝图部分一致时只下发作答状态，不再重复下载整份蓝图。
+题库版本号是 Redis 计数器，Redis 清空后会从头计数，因此蓝图部分同时带上内容摘要，
+计数器重置后版本号与旧标识碰撞也不会让客户端误用旧蓝图。
+
+缓存未命中时按 (题库ID, 题库版本号) 单飞构建：进程内锁合并同一 worker 的并发请求，
+Redis 锁保证所有 worker 中只有一个查询数据库，其余等待其写入 Redis 后直接读取。
+开启 BLUEPRINT_STALE_WHILE_REVALIDATE 时，题库变更后先返回旧版本蓝图并在后台重建。
+"""
 from sqlalchemy.orm import Session, subqueryload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.question_management import QuestionBank, Procedure, Question
 from app.schemas.examinee import BlueprintProcedure, BlueprintQuestion, BlueprintOption
-from app.core.cache import cache_service
+from app.core.cache import cache_service, async_cache_service
+from app.core.config import settings
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+from app.db.session import SessionLocal
+import asyncio
+import hashlib
 import logging
-from typing import List
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
 
+class BlueprintSegment(NamedTuple):
+    """单个工序的预序列化片段"""
+    procedure_id: int
+    question_ids: FrozenSet[int]
+    payload: bytes
+
+
+class PreparedBlueprint(NamedTuple):
+    """某一版本题库的全部蓝图片段"""
+    question_bank_id: int
+    version: int
+    segments: List[BlueprintSegment]
+    digest: str  # 全部片段的内容摘要，构建时计算一次
+
+    @property
+    def tag(self) -> str:
+        """蓝图部分的版本标识，题库内容变更时改变"""
+        return f"{self.question_bank_id}.{self.version}.{self.digest}"
+
+
+def _prepare(question_bank_id: int, version: int, segments: List[BlueprintSegment]) -> PreparedBlueprint:
+    digest = hashlib.sha1()
+    for seg in segments:
+        digest.update(seg.payload)
+    return PreparedBlueprint(question_bank_id, version, segments, digest.hexdigest()[:12])
+
+
+# 进程内蓝图片段：{(question_bank_id, version): PreparedBlueprint}
+_blueprint_memory: Dict[Tuple[int, int], PreparedBlueprint] = {}
+_blueprint_lock = threading.Lock()
+
+# 缓存未命中时的构建互斥（按 (question_bank_id, version)）
+_build_flight = SingleFlight()
+_async_build_flight = AsyncSingleFlight()
+# 后台重建任务的引用，防止任务在完成前被回收
+_revalidate_tasks: Set[asyncio.Task] = set()
+
+
 def build_assessment_blueprint(db: Session, *, question_bank_id: int) -> List[BlueprintProcedure]:
     """
-    构建结构化的考核蓝图。
-    优先从 Redis 缓存获取，缓存未命中时从数据库查询并缓存结果。
+    构建结构化的考核蓝图（Pydantic 模型），供需要对象形式的调用方使用。
+    客户端热路径请使用 get_blueprint_segments + render_session_payload。
+    """
+    blueprint = get_blueprint_segments(db, question_bank_id=question_bank_id)
+    return [BlueprintProcedure.model_validate_json(seg.payload) for seg in blueprint.segments]
+
+
+def get_blueprint_segments(db: Session, *, question_bank_id: int) -> PreparedBlueprint:
+    """
+    获取预序列化的蓝图片段。
+    查找顺序：进程内存 -> Redis -> 数据库查询（单飞，并回写两级缓存）。
     """
-    # 1. 尝试从缓存获取
-    cached_data = cache_service.get_blueprint(question_bank_id)
+    version = cache_service.get_bank_version(question_bank_id)
+    memory_key = (question_bank_id, version)
+
+    blueprint = _blueprint_memory.get(memory_key)
+    if blueprint is not None:
+        return blueprint
+
+    cached_data = cache_service.get_blueprint(question_bank_id, version)
     if cached_data:
         logger.debug(f"从缓存获取题库蓝图: {question_bank_id}")
-        # 将缓存的字典数据转换回 Pydantic 模型
-        return [BlueprintProcedure(**proc) for proc in cached_data]
+        blueprint = _prepare(question_bank_id, version, _segments_from_json(cached_data))
+        _remember(memory_key, blueprint)
+        return blueprint
+
+    stale = _stale_blueprint(question_bank_id)
+    if stale is not None:
+        if not _build_flight.is_running(memory_key):
+            threading.Thread(
+                target=_revalidate, args=(question_bank_id, version), name=f"blueprint-revalidate-{question_bank_id}",
+                daemon=True,
+            ).start()
+        return stale
+
+    return _build_single_flight(db, question_bank_id, version)
+
+
+def _build_single_flight(db: Session, question_bank_id: int, version: int) -> PreparedBlueprint:
+    memory_key = (question_bank_id, version)
+    with _build_flight.lock(memory_key):
+        # 等锁期间其他线程可能已构建完成
+        blueprint = _blueprint_memory.get(memory_key)
+        if blueprint is not None:
+            return blueprint
+
+        lock_name = _build_lock_name(question_bank_id, version)
+        acquired, lock = cache_service.try_lock(lock_name, settings.BLUEPRINT_BUILD_LOCK_TTL_SECONDS)
+        try:
+            cached_data = cache_service.get_blueprint(question_bank_id, version)
+            if not cached_data and not acquired:
+                cached_data = _wait_for_blueprint(question_bank_id, version, lock_name)
+            if cached_data:
+                segments = _segments_from_json(cached_data)
+            else:
+                logger.debug(f"缓存未命中，从数据库查询题库蓝图: {question_bank_id} v{version}")
+                segments = _segments_from_procedures(_load_blueprint(db, question_bank_id=question_bank_id))
+                if segments:
+                    cache_service.set_blueprint(question_bank_id, version, _join_segments(segments))
+                    logger.debug(f"题库蓝图已缓存: {question_bank_id}")
+        finally:
+            cache_service.release_lock(lock)
+
+        blueprint = _prepare(question_bank_id, version, segments)
+        _remember(memory_key, blueprint)
+        return blueprint
+
+
+def _wait_for_blueprint(question_bank_id: int, version: int, lock_name: str) -> Optional[bytes]:
+    """其他 worker 正在构建：轮询 Redis 直到蓝图写入、锁释放或等待超时（超时后由调用方自行构建）"""
+    deadline = time.monotonic() + settings.BLUEPRINT_BUILD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(settings.BLUEPRINT_BUILD_POLL_INTERVAL_SECONDS)
+        cached_data = cache_service.get_blueprint(question_bank_id, version)
+        if cached_data:
+            return cached_data
+        if not cache_service.is_locked(lock_name):
+            return cache_service.get_blueprint(question_bank_id, version)
+    logger.warning(f"等待其他 worker 构建题库蓝图超时: {question_bank_id}")
+    return None
+
+
+def _revalidate(question_bank_id: int, version: int) -> None:
+    """后台重建新版本蓝图（旧版本在此期间继续对外提供）"""
+    db = SessionLocal()
+    try:
+        _build_single_flight(db, question_bank_id, version)
+    except Exception:
+        logger.exception(f"后台重建题库蓝图失败: {question_bank_id} v{version}")
+    finally:
+        db.close()
+
+
+async def get_blueprint_segments_async(db: AsyncSession, *, question_bank_id: int) -> PreparedBlueprint:
+    """
+    异步版 get_blueprint_segments。
+    缓存读写走异步 Redis，未命中时通过 run_sync 在异步连接上执行同一份加载查询。
+    """
+    version = await async_cache_service.get_bank_version(question_bank_id)
+    memory_key = (question_bank_id, version)
+
+    blueprint = _blueprint_memory.get(memory_key)
+    if blueprint is not None:
+        return blueprint
+
+    cached_data = await async_cache_service.get_blueprint(question_bank_id, version)
+    if cached_data:
+        blueprint = _prepare(question_bank_id, version, _segments_from_json(cached_data))
+        _remember(memory_key, blueprint)
+        return blueprint
+
+    stale = _stale_blueprint(question_bank_id)
+    if stale is not None:
+        if not _async_build_flight.is_running(memory_key):
+            task = asyncio.create_task(_revalidate_async(question_bank_id, version))
+            _revalidate_tasks.add(task)
+            task.add_done_callback(_revalidate_tasks.discard)
+        return stale
+
+    return await _build_single_flight_async(db, question_bank_id, version)
+
+
+async def _build_single_flight_async(db: AsyncSession, question_bank_id: int, version: int) -> PreparedBlueprint:
+    memory_key = (question_bank_id, version)
+    async with _async_build_flight.lock(memory_key):
+        blueprint = _blueprint_memory.get(memory_key)
+        if blueprint is not None:
+            return blueprint
+
+        lock_name = _build_lock_name(question_bank_id, version)
+        acquired, lock = await async_cache_service.try_lock(lock_name, settings.BLUEPRINT_BUILD_LOCK_TTL_SECONDS)
+        try:
+            cached_data = await async_cache_service.get_blueprint(question_bank_id, version)
+            if not cached_data and not acquired:
+                cached_data = await _wait_for_blueprint_async(question_bank_id, version, lock_name)
+            if cached_data:
+                segments = _segments_from_json(cached_data)
+            else:
+                logger.debug(f"缓存未命中，从数据库查询题库蓝图: {question_bank_id} v{version}")
+                procedures = await db.run_sync(lambda s: _load_blueprint(s, question_bank_id=question_bank_id))
+                segments = _segments_from_procedures(procedures)
+                if segments:
+                    await async_cache_service.set_blueprint(question_bank_id, version, _join_segments(segments))
+        finally:
+            await async_cache_service.release_lock(lock)
 
-    # 2. 缓存未命中，从数据库查询
-    logger.debug(f"缓存未命中，从数据库查询题库蓝图: {question_bank_id}")
+        blueprint = _prepare(question_bank_id, version, segments)
+        _remember(memory_key, blueprint)
+        return blueprint
+
+
+async def _wait_for_blueprint_async(question_bank_id: int, version: int, lock_name: str) -> Optional[bytes]:
+    deadline = time.monotonic() + settings.BLUEPRINT_BUILD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.BLUEPRINT_BUILD_POLL_INTERVAL_SECONDS)
+        cached_data = await async_cache_service.get_blueprint(question_bank_id, version)
+        if cached_data:
+            return cached_data
+        if not await async_cache_service.is_locked(lock_name):
+            return await async_cache_service.get_blueprint(question_bank_id, version)
+    logger.warning(f"等待其他 worker 构建题库蓝图超时: {question_bank_id}")
+    return None
+
+
+async def _revalidate_async(question_bank_id: int, version: int) -> None:
+    # 异步引擎依赖 aiomysql，只在异步接口实际触发后台重建时才导入
+    from app.db.async_session import AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await _build_single_flight_async(db, question_bank_id, version)
+    except Exception:
+        logger.exception(f"后台重建题库蓝图失败: {question_bank_id} v{version}")
+
+
+def _build_lock_name(question_bank_id: int, version: int) -> str:
+    return f"blueprint:{question_bank_id}:v{version}"
+
+
+def _stale_blueprint(question_bank_id: int) -> Optional[PreparedBlueprint]:
+    """开启 stale-while-revalidate 时，返回进程内保留的该题库旧版本蓝图"""
+    if not settings.BLUEPRINT_STALE_WHILE_REVALIDATE:
+        return None
+    with _blueprint_lock:
+        for (bank_id, _), blueprint in _blueprint_memory.items():
+            if bank_id == question_bank_id:
+                return blueprint
+    return None
+
+
+def content_version(blueprint: PreparedBlueprint, answered_question_ids: Iterable[int]) -> str:
+    """蓝图内容版本：题库版本 + 已答题目集合摘要"""
+    answered = ",".join(str(qid) for qid in sorted(answered_question_ids))
+    digest = hashlib.sha1(answered.encode()).hexdigest()[:16]
+    return f"{blueprint.tag}-{digest}"
+
+
+def parse_if_none_match(header_value: Optional[str]) -> List[str]:
+    """解析 If-None-Match 请求头，去掉弱校验前缀与引号"""
+    if not header_value:
+        return []
+    tags = []
+    for tag in header_value.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tags.append(tag.strip('"'))
+    return tags
+
+
+def client_has_blueprint(blueprint: PreparedBlueprint, client_versions: List[str]) -> bool:
+    """客户端持有的内容版本中，蓝图部分与当前题库版本一致（客户端无需重新下载蓝图）"""
+    return any(v.split("-", 1)[0] == blueprint.tag for v in client_versions)
+
+
+def render_session_payload(
+    blueprint: PreparedBlueprint, *, result_id: int, answered_logs_map: Dict[int, dict], version: str
+) -> bytes:
+    """
+    拼接开始/继续考核的完整响应体（UnifiedResponse 格式）。
+    - 未作答的工序：直接使用预序列化片段；
+    - 已全部作答的工序：过滤掉；
+    - 部分作答的工序：反序列化该片段，向已答题目注入已选答案与得分后重新序列化。
+    answered_logs_map 结构为 {question_id: {"selected_option_ids": [...], "score_awarded": n}}
+    """
+    parts = []
+    for seg in blueprint.segments:
+        answered_in_proc = seg.question_ids.intersection(answered_logs_map)
+        if not answered_in_proc:
+            parts.append(seg.payload)
+            continue
+        if answered_in_proc == seg.question_ids:
+            continue
+
+        proc = orjson.loads(seg.payload)
+        for question in proc["questions"]:
+            log = answered_logs_map.get(question["id"])
+            if log:
+                question["selected_option_ids"] = log["selected_option_ids"]
+                question["score_awarded"] = log["score_awarded"]
+        parts.append(orjson.dumps(proc))
+
+    return b"".join((
+        b'{"code":200,"msg":"success","data":{"assessment_result_id":',
+        str(int(result_id)).encode(),
+        b',"content_version":',
+        orjson.dumps(version),
+        b',"procedures":',
+        _join_segments(parts),
+        b"}}",
+    ))
+
+
+def render_session_state_payload(
+    blueprint: PreparedBlueprint, *, result_id: int, answered_logs_map: Dict[int, dict], version: str
+) -> bytes:
+    """
+    客户端已持有当前版本蓝图时的精简响应：只包含作答状态与未完成的工序ID。
+    业务码 304 表示蓝图未变化，客户端沿用本地蓝图。
+    """
+    remaining_procedure_ids = [
+        seg.procedure_id for seg in blueprint.segments
+        if not seg.question_ids.issubset(answered_logs_map.keys())
+    ]
+    answered = [
+        {"question_id": qid, "selected_option_ids": log["selected_option_ids"], "score_awarded": log["score_awarded"]}
+        for qid, log in sorted(answered_logs_map.items())
+    ]
+    return orjson.dumps({
+        "code": 304,
+        "msg": "蓝图未变化",
+        "data": {
+            "assessment_result_id": result_id,
+            "content_version": version,
+            "remaining_procedure_ids": remaining_procedure_ids,
+            "answered": answered,
+        },
+    })
+
+
+def _join_segments(segments) -> bytes:
+    """将工序片段（或其字节）拼接为 JSON 数组"""
+    return b"[" + b",".join(seg.payload if isinstance(seg, BlueprintSegment) else seg for seg in segments) + b"]"
+
+
+def _segments_from_procedures(procedures: List[BlueprintProcedure]) -> List[BlueprintSegment]:
+    return [
+        BlueprintSegment(
+            procedure_id=proc.id,
+            question_ids=frozenset(q.id for q in proc.questions),
+            payload=orjson.dumps(proc.model_dump()),
+        )
+        for proc in procedures
+    ]
+
+
+def _segments_from_json(data: bytes) -> List[BlueprintSegment]:
+    """由 Redis 中的整份蓝图 JSON 重建片段（每个进程每个题库版本只需一次）"""
+    return [
+        BlueprintSegment(
+            procedure_id=proc["id"],
+            question_ids=frozenset(q["id"] for q in proc["questions"]),
+            payload=orjson.dumps(proc),
+        )
+        for proc in orjson.loads(data)
+    ]
+
+
+def _remember(memory_key: Tuple[int, int], blueprint: PreparedBlueprint) -> None:
+    with _blueprint_lock:
+        # 同一题库只保留当前版本，旧版本直接丢弃
+        for stale_key in [k for k in _blueprint_memory if k[0] == memory_key[0]]:
+            _blueprint_memory.pop(stale_key, None)
+        _blueprint_memory[memory_key] = blueprint
+
+
+def _load_blueprint(db: Session, *, question_bank_id: int) -> List[BlueprintProcedure]:
     bank = (
         db.query(QuestionBank)
         .options(
@@ -45,12 +413,6 @@ def build_assessment_blueprint(db: Session, *, question_bank_id: int) -> List[Bl
                 question_type=q.question_type.value, score=q.score, image_url=q.image_url, options=options
             ))
         procedures.append(BlueprintProcedure(id=proc.id, name=proc.name, questions=questions))
-
-    # 3. 将结果写入缓存
-    if procedures:
-        cache_service.set_blueprint(question_bank_id, procedures)
-        logger.debug(f"题库蓝图已缓存: {question_bank_id}")
-
     return procedures
 
 
@@ -58,6 +420,10 @@ def invalidate_blueprint_cache(question_bank_id: int) -> bool:
     """
     使题库蓝图缓存失效
     在题库、工序、题目发生变更时调用
+    递增题库版本号即可：蓝图与答案键的缓存键均包含版本号，各进程内的旧版本片段也随之失效，
+    旧版本的 Redis 键不再被读取，随 TTL 自然过期
+    题库总分同样由题目决定，一并清除
     """
     logger.info(f"使题库蓝图缓存失效: {question_bank_id}")
+    cache_service.delete(cache_service.bank_total_score_key(question_bank_id))
     return cache_service.invalidate_blueprint(question_bank_id)
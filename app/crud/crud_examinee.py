@@ -1,5 +1,7 @@
 # app/crud/crud_examinee.py
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from app.crud.base import CRUDBase
 from app.models.user_management import Examinee
@@ -33,4 +35,26 @@ class CRUDExaminee(CRUDBase[Examinee, BaseModel, BaseModel]):
             # 极端情况：如果还是查不到，抛出异常
             raise ValueError(f"无法获取或创建考生: {identifier}")
 
+    async def get_or_create_by_identifier_async(self, db: AsyncSession, *, identifier: str) -> Examinee:
+        """
+        异步版 get_or_create_by_identifier。
+        """
+        stmt = select(Examinee).where(Examinee.identifier == identifier).limit(1)
+        examinee = (await db.execute(stmt)).scalars().first()
+        if examinee:
+            return examinee
+
+        try:
+            examinee = Examinee(identifier=identifier)
+            db.add(examinee)
+            await db.flush()
+            await db.commit()
+            return examinee
+        except IntegrityError:
+            await db.rollback()
+            examinee = (await db.execute(stmt)).scalars().first()
+            if examinee:
+                return examinee
+            raise ValueError(f"无法获取或创建考生: {identifier}")
+
 crud_examinee = CRUDExaminee(Examinee)
\ No newline at end of file
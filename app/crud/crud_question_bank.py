@@ -1,7 +1,11 @@
 # app/crud/crud_question_bank.py
+from typing import Dict, List
+
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.cache import cache_service, cached_many
+from app.core.config import settings
 from app.models.question_management import QuestionBank, Platform, Procedure, Question, QuestionType
 from app.schemas.question_bank import QuestionBankCreate, QuestionBankUpdate
 from .base import CRUDBase
@@ -12,13 +16,23 @@ class CRUDQuestionBank(CRUDBase[QuestionBank, QuestionBankCreate, QuestionBankUp
         """
         计算题库的总分（所有题目分数之和）
         """
-        result = db.query(func.sum(Question.score)).join(
+        return self.get_total_scores(db, question_bank_ids=[question_bank_id]).get(question_bank_id, 0)
+
+    @cached_many(cache_service.bank_total_score_key, ids_arg="question_bank_ids", ttl=settings.CACHE_TTL_BLUEPRINT)
+    def get_total_scores(self, db: Session, *, question_bank_ids: List[int]) -> Dict[int, int]:
+        """
+        批量计算多个题库的总分：{题库ID: 总分}
+        只对缓存未命中的题库执行一次 GROUP BY 查询；题目变更时由 invalidate_blueprint_cache 清除对应缓存
+        """
+        rows = db.query(Procedure.question_bank_id, func.sum(Question.score)).join(
             Procedure, Question.procedure_id == Procedure.id
         ).filter(
-            Procedure.question_bank_id == question_bank_id,
+            Procedure.question_bank_id.in_(question_bank_ids),
             Question.question_type != QuestionType.DEDUCTION_SINGLE_CHOICE
-        ).scalar()
-        return result or 0
+        ).group_by(Procedure.question_bank_id).all()
+        totals = {bank_id: 0 for bank_id in question_bank_ids}
+        totals.update({bank_id: int(total or 0) for bank_id, total in rows})
+        return totals
 
     def create_with_platform(
         self, db: Session, *, obj_in: QuestionBankCreate, platform_id: int
@@ -0,0 +1,230 @@
+# app/crud/crud_session_state.py
+"""
+考核会话状态缓存
+在开始/继续考核时写入，包含考生标识符、所属考核与题库、考核结束时间、是否已交卷，
+以及一个 Redis 集合保存已答题目ID。
+提交答案、交卷时的身份校验与重复作答校验只需 O(1) 缓存操作，无需访问数据库。
+缓存丢失时从数据库重建；交卷与调度器强制交卷时失效；
+考核的结束时间或题库被修改时，其所有未交卷会话的状态失效（保留已答集合），下次访问时按最新考核信息重建。
+缓存降级为进程内内存时（多 worker 间不共享，其他 worker 交卷或强制交卷无法使本进程的缓存失效），
+会话状态每次都从数据库读取，不使用本地缓存的旧状态。
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import pytz
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import cache_service, async_cache_service
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.models.assessment_management import Assessment, AssessmentResult
+from app.models.user_management import Examinee
+
+logger = logging.getLogger(__name__)
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+# 会话状态在考核结束后额外保留的时间
+SESSION_STATE_GRACE = timedelta(hours=1)
+
+
+def _state_ttl(assessment_end_time: datetime) -> int:
+    """缓存有效期对齐到考核结束时间之后，考核期间不会过期"""
+    now_naive = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+    remaining = assessment_end_time + SESSION_STATE_GRACE - now_naive
+    return max(int(remaining.total_seconds()), 60)
+
+
+def _build_state(result: AssessmentResult, assessment: Assessment, examinee_identifier: str) -> dict:
+    return {
+        "examinee_identifier": examinee_identifier,
+        "assessment_id": assessment.id,
+        "question_bank_id": assessment.question_bank_id,
+        "end_time": assessment.end_time.isoformat(),
+        "closed": result.end_time is not None,
+    }
+
+
+def init_session_state(
+    *,
+    result: AssessmentResult,
+    assessment: Assessment,
+    examinee_identifier: str,
+    answered_question_ids: Iterable[int],
+) -> dict:
+    """
+    写入会话状态缓存。
+    已答集合采用并集写入，不会丢失已入队但尚未落库的答题记录。
+    """
+    state = _build_state(result, assessment, examinee_identifier)
+    cache_service.set_session_state(
+        result.id, state, list(answered_question_ids), ttl=_state_ttl(assessment.end_time)
+    )
+    return state
+
+
+async def init_session_state_async(
+    *,
+    result: AssessmentResult,
+    assessment: Assessment,
+    examinee_identifier: str,
+    answered_question_ids: Iterable[int],
+) -> dict:
+    """异步版 init_session_state"""
+    state = _build_state(result, assessment, examinee_identifier)
+    await async_cache_service.set_session_state(
+        result.id, state, list(answered_question_ids), ttl=_state_ttl(assessment.end_time)
+    )
+    return state
+
+
+def get_session_state(db: Session, *, result_id: int) -> Optional[dict]:
+    """
+    获取会话状态，缓存未命中（或缓存只在本进程内）时从数据库重建。
+    会话不存在时返回 None。
+    """
+    if cache_service.is_distributed():
+        state = cache_service.get_session_state(result_id)
+        if state:
+            return state
+
+    logger.debug(f"会话状态缓存未命中，从数据库重建: {result_id}")
+    row = (
+        db.query(AssessmentResult, Assessment, Examinee.identifier)
+        .join(Assessment, AssessmentResult.assessment_id == Assessment.id)
+        .join(Examinee, AssessmentResult.examinee_id == Examinee.id)
+        .filter(AssessmentResult.id == result_id)
+        .first()
+    )
+    if not row:
+        return None
+    result, assessment, identifier = row
+
+    answered_ids = crud_assessment_result.get_answered_question_ids(db=db, result_id=result_id)
+    return init_session_state(
+        result=result, assessment=assessment,
+        examinee_identifier=identifier, answered_question_ids=answered_ids,
+    )
+
+
+async def get_session_state_async(db: AsyncSession, *, result_id: int) -> Optional[dict]:
+    """异步版 get_session_state"""
+    if await async_cache_service.is_distributed():
+        state = await async_cache_service.get_session_state(result_id)
+        if state:
+            return state
+
+    logger.debug(f"会话状态缓存未命中，从数据库重建: {result_id}")
+    row = (await db.execute(
+        select(AssessmentResult, Assessment, Examinee.identifier)
+        .join(Assessment, AssessmentResult.assessment_id == Assessment.id)
+        .join(Examinee, AssessmentResult.examinee_id == Examinee.id)
+        .where(AssessmentResult.id == result_id)
+        .limit(1)
+    )).first()
+    if not row:
+        return None
+    result, assessment, identifier = row
+
+    answered_ids = await crud_assessment_result.get_answered_question_ids_async(db=db, result_id=result_id)
+    return await init_session_state_async(
+        result=result, assessment=assessment,
+        examinee_identifier=identifier, answered_question_ids=answered_ids,
+    )
+
+
+def get_state_end_time(state: dict) -> datetime:
+    """会话状态中的考核结束时间（naive 北京时间）"""
+    return datetime.fromisoformat(state["end_time"])
+
+
+def mark_answered(db: Session, *, result_id: int, question_id: int, state: dict) -> bool:
+    """
+    原子地将题目标记为已答，返回 False 表示重复作答。
+    缓存降级为进程内内存时（多 worker 间不共享），额外回查数据库兜底。
+    """
+    ttl = _state_ttl(get_state_end_time(state))
+    if not cache_service.add_answered_question(result_id, question_id, ttl=ttl):
+        return False
+
+    if not cache_service.is_distributed():
+        if question_id in crud_assessment_result.get_answered_question_ids(db=db, result_id=result_id):
+            return False
+    return True
+
+
+def mark_answered_many(db: Session, *, result_id: int, question_ids: List[int], state: dict) -> List[bool]:
+    """
+    批量标记已答（一次缓存往返），返回每道题是否为首次作答。
+    同一批次内重复出现的题目，只有第一次会返回 True。
+    """
+    ttl = _state_ttl(get_state_end_time(state))
+    added = cache_service.add_answered_questions(result_id, question_ids, ttl=ttl)
+
+    if not cache_service.is_distributed():
+        answered_in_db = set(crud_assessment_result.get_answered_question_ids(db=db, result_id=result_id))
+        added = [ok and qid not in answered_in_db for ok, qid in zip(added, question_ids)]
+    return added
+
+
+async def mark_answered_many_async(
+    db: AsyncSession, *, result_id: int, question_ids: List[int], state: dict
+) -> List[bool]:
+    """异步版 mark_answered_many，单题提交也走此方法（列表长度为 1）"""
+    ttl = _state_ttl(get_state_end_time(state))
+    added = await async_cache_service.add_answered_questions(result_id, question_ids, ttl=ttl)
+
+    if not await async_cache_service.is_distributed():
+        answered_in_db = set(
+            await crud_assessment_result.get_answered_question_ids_async(db=db, result_id=result_id)
+        )
+        added = [ok and qid not in answered_in_db for ok, qid in zip(added, question_ids)]
+    return added
+
+
+def unmark_answered(*, result_id: int, question_id: int) -> None:
+    """答题失败时回滚已答标记"""
+    cache_service.remove_answered_question(result_id, question_id)
+
+
+def unmark_answered_many(*, result_id: int, question_ids: List[int]) -> None:
+    """批量回滚已答标记"""
+    if question_ids:
+        cache_service.remove_answered_question(result_id, *question_ids)
+
+
+def invalidate_assessment_session_states(db: Session, *, assessment_id: int) -> List[int]:
+    """
+    考核信息变更后，使其所有未交卷会话的状态缓存失效，返回这些会话 ID。
+    只删除状态、保留已答集合：写后模式下尚未落库的已答标记不会丢失。
+    """
+    result_ids = crud_assessment_result.get_open_result_ids(db=db, assessment_id=assessment_id)
+    if result_ids:
+        cache_service.drop_session_states(result_ids)
+    return result_ids
+
+
+async def drop_session_states_async(result_ids: List[int]) -> None:
+    """异步版：经异步缓存服务删除会话状态（异步客户端接口开启时，其 Redis 连接与熔断状态独立于同步服务）"""
+    if result_ids:
+        await async_cache_service.drop_session_states(result_ids)
+
+
+def invalidate_session_state(result_id: int) -> None:
+    """会话结束后使状态缓存失效，下次访问时从数据库重建（届时为已交卷状态）"""
+    cache_service.invalidate_session_state(result_id)
+
+
+async def unmark_answered_many_async(*, result_id: int, question_ids: List[int]) -> None:
+    """异步版 unmark_answered_many"""
+    if question_ids:
+        await async_cache_service.remove_answered_question(result_id, *question_ids)
+
+
+async def invalidate_session_state_async(result_id: int) -> None:
+    """异步版 invalidate_session_state"""
+    await async_cache_service.invalidate_session_state(result_id)
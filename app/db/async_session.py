@@ -0,0 +1,47 @@
+# app/db/async_session.py
+"""
+异步数据库会话（供异步客户端接口使用）
+使用 SQLAlchemy AsyncSession + aiomysql，单个 worker 可同时处理大量进行中的考核请求，
+无需为每个请求占用一个线程。
+"""
+from typing import AsyncGenerator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+
+
+def _async_database_url() -> str:
+    """未单独配置时，由同步连接串推导出异步驱动连接串"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return settings.DATABASE_URL.replace("+pymysql", "+aiomysql")
+
+
+# 异步引擎：协程复用连接，所需连接数远少于线程池模式
+async_engine = create_async_engine(
+    _async_database_url(),
+    echo=False,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_timeout=3,
+    connect_args={
+        "connect_timeout": 2,
+    },
+    pool_reset_on_return='rollback',
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # 提交后不过期对象，避免异步上下文中的隐式刷新
+)
+
+
+# 依赖注入函数：为每个异步 API 请求提供一个独立的数据库会话
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
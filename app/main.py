@@ -15,7 +15,9 @@ from fastapi.exceptions import RequestValidationError
 from app.models import user_management
 from app.models import question_management
 from app.models import assessment_management
-from app.core.scheduler import scheduler, register_housekeeping_jobs
+from app.core.scheduler import scheduler, local_scheduler, register_local_jobs, leader_election
+from app.services.answer_ingest import is_write_behind_enabled, flush_answer_queue
+from app.core.cache import start_cache_invalidation_listener, stop_cache_invalidation_listener
 
 # 3. 创建 FastAPI 应用实例
 app = FastAPI(
@@ -51,16 +53,35 @@ def health_check():
 @app.on_event("startup")
 def startup_event():
     # --- 新增：启动调度器 ---
-    scheduler.start()
-    # 注册兜底扫描任务，防止遗漏自动交卷
-    register_housekeeping_jobs()
+    # 持久化调度器以暂停状态启动，选为 leader 后才执行任务（兜底扫描、考核结束自动交卷等）
+    scheduler.start(paused=True)
+    local_scheduler.start()
+    register_local_jobs()
+    leader_election.start()
     print("APScheduler started...")
+    # 订阅缓存失效通知，其他 worker 删除缓存时逐出本进程 L1
+    start_cache_invalidation_listener()
 
 @app.on_event("shutdown")
 def shutdown_event():
     # --- 新增：关闭调度器 ---
+    # 先让出 leader，其他 worker 可立即接管
+    leader_election.stop()
     scheduler.shutdown()
+    local_scheduler.shutdown()
     print("APScheduler shut down...")
+    # 写后模式下，退出前把本进程队列中剩余的答题记录落库
+    if is_write_behind_enabled():
+        flush_answer_queue()
+    stop_cache_invalidation_listener()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    # 异步客户端接口开启时，释放异步连接池
+    if settings.CLIENT_API_ASYNC:
+        from app.db.async_session import async_engine
+        await async_engine.dispose()
 # 6. 将您的主 API 路由器包含进来，并添加统一的前缀
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -1,5 +1,5 @@
 # app/models/assessment_management.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -33,10 +33,31 @@ class AssessmentResult(Base):
     assessment = relationship("Assessment", back_populates="results")
     examinee = relationship("Examinee", back_populates="assessment_results")
     answer_logs = relationship("AnswerLog", back_populates="result")
+    summary = relationship("AssessmentResultSummary", uselist=False, back_populates="result")
+
+class AssessmentResultSummary(Base):
+    """考核会话汇总表 - 会话结束后由后台汇总任务写入，一个会话一行"""
+    __tablename__ = 'assessment_result_summaries'
+    result_id = Column(Integer, ForeignKey("assessment_results.id"), primary_key=True)
+    assessment_id = Column(Integer, ForeignKey("assessments.id"), index=True)
+
+    answered_count = Column(Integer, nullable=False)  # 已作答题数
+    correct_count = Column(Integer, nullable=False)  # 答对题数
+    total_score = Column(Integer, nullable=False)  # 答题日志得分之和
+    duration_seconds = Column(Integer, nullable=True)  # 作答时长（秒）
+    # 按工序汇总：[{"procedure_id", "name", "score", "answered_count", "correct_count"}, ...]
+    procedure_scores = Column(JSON, nullable=False)
+    finalized_at = Column(DateTime, nullable=False)
+
+    result = relationship("AssessmentResult", back_populates="summary")
 
 class AnswerLog(Base):
     """详细答题日志表 - 与 answer_logs 表完全对应"""
     __tablename__ = 'answer_logs'
+    # 同一会话的同一道题只记一次，重复投递 / 并发提交由唯一索引兜底
+    __table_args__ = (
+        Index('uq_answer_logs_result_question', 'result_id', 'question_id', unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     
     result_id = Column(Integer, ForeignKey("assessment_results.id"))
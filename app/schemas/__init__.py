@@ -62,10 +62,14 @@ from .examinee import (
     AssessmentStartRequest,      # <--- 补上这个
     SubmitAnswerRequest,         # <--- 补上这个
     SubmitAnswerResponse,        # <--- 补上这个
+    SubmitAnswerBatchItemResult,
+    SubmitAnswersBatchResponse,
     BlueprintOption,
     BlueprintQuestion,
     BlueprintProcedure,
     AssessmentBlueprintResponse,
+    AnsweredQuestionState,
+    AssessmentSessionStateResponse,
     FinishAssessmentRequest,
     VerifyPlatformPasswordRequest
 )
@@ -75,6 +79,8 @@ from .result import (
     AnswerLogDetail,
     QuestionSnapshot,
     OptionSnapshot,
+    ProcedureScore,
+    ResultSummary,
 )
 
 
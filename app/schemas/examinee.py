@@ -40,8 +40,24 @@ class AssessmentBlueprintResponse(BaseModel):
     开始/继续考核的响应体 (最终版)
     """
     assessment_result_id: int
+    content_version: Optional[str] = None # 蓝图内容版本，重连时通过 If-None-Match 回传
     procedures: List[BlueprintProcedure] # <--- 返回结构化的蓝图
 
+class AnsweredQuestionState(BaseModel):
+    """已答题目的作答状态"""
+    question_id: int
+    selected_option_ids: List[int]
+    score_awarded: int|None = None
+
+class AssessmentSessionStateResponse(BaseModel):
+    """
+    客户端已持有当前版本蓝图时的精简响应（业务码 304）
+    """
+    assessment_result_id: int
+    content_version: str
+    remaining_procedure_ids: List[int]
+    answered: List[AnsweredQuestionState]
+
 # --- 提交答案的 Schema (SubmitAnswerRequest) ---
 class SubmitAnswerRequest(BaseModel):
     examinee_identifier: str = Field(..., min_length=1, description="考生标识符") # <--- 新增，用于校验考生身份
@@ -54,6 +70,20 @@ class SubmitAnswerResponse(BaseModel):
     score_awarded: int
     is_correct: bool
 
+# --- 批量提交答案的 Schema ---
+class SubmitAnswerBatchItemResult(BaseModel):
+    """批量提交中单道题目的处理结果"""
+    question_id: int
+    status: str # success / error
+    score_awarded: Optional[int] = None
+    is_correct: Optional[bool] = None
+    error: Optional[str] = None # 失败原因，如重复作答、选项非法
+
+class SubmitAnswersBatchResponse(BaseModel):
+    results: List[SubmitAnswerBatchItemResult]
+    accepted_count: int
+    score_delta: int # 本次批量提交带来的总分变化
+
 # --- 结束考核的 Schema (FinishAssessmentRequest) ---
 class FinishAssessmentRequest(BaseModel):
     examinee_identifier: str = Field(..., min_length=1, description="考生标识符") # <--- 新增，用于校验考生身份
@@ -29,6 +29,26 @@ class AnswerLogDetail(BaseModel):
     class Config:
         from_attributes = True
 
+# --- 新增：会话汇总（会话结束后由后台任务写入） ---
+class ProcedureScore(BaseModel):
+    procedure_id: int
+    name: str
+    score: int
+    answered_count: int
+    correct_count: int
+
+
+class ResultSummary(BaseModel):
+    answered_count: int
+    correct_count: int
+    total_score: int
+    duration_seconds: Optional[int] = None
+    procedure_scores: List[ProcedureScore]
+    finalized_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class AssessmentResultDetail(BaseModel):
     id: int
     total_score: Optional[int] = Field(0, description="总分")
@@ -36,6 +56,7 @@ class AssessmentResultDetail(BaseModel):
     end_time: Optional[datetime] = None
     examinee_identifier: str
     answer_logs: List[AnswerLogDetail]
+    summary: Optional[ResultSummary] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,360 @@
+# app/services/answer_ingest.py
+"""
+答题写后（write-behind）入库管道
+提交答案时只做校验与计分，然后把答题记录追加到持久化队列并立即返回；
+后台刷写任务按批次批量插入 AnswerLog，并按会话合并 total_score 增量。
+交卷不等待队列刷写：会话汇总任务先刷写再汇总，并以汇总结果为准写回 total_score；
+已汇总的会话又落库了迟到的记录时，删除其汇总，由兜底扫描重新汇总。
+
+队列优先使用 Redis Stream（消费组 + ACK，进程崩溃后未确认的消息可被重新认领），
+Redis 不可用时降级为本地追加写文件（每条记录一行 JSON，写入后 fsync）。
+同一主机的所有 worker 共用一个队列文件，追加与改名 / 读取 / 删除都持有文件锁（fcntl.flock），跨进程互斥。
+刷写时按 (result_id, question_id) 去重（answer_logs 上的唯一索引 + INSERT IGNORE），
+重复投递、多个刷写方并发处理同一批记录都不会重复插入或重复计分。
+无法解析的记录记日志后跳过（Stream 消息转存到死信 Stream 再确认），不会阻塞整个队列。
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+import pytz
+import redis
+
+from sqlalchemy import delete
+
+from app.core.cache import cache_service, get_redis_client, get_async_redis_client
+from app.core.config import settings
+from app.crud.crud_answer_log import insert_new_logs
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.db.session import SessionLocal
+from app.models.assessment_management import AnswerLog, AssessmentResultSummary
+from app.schemas.examinee import SubmitAnswerRequest
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 开发环境（单 worker），只有进程内锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+STREAM_GROUP = "answer_flushers"
+# 消费者超过该时长未确认的消息，会被其他进程重新认领（毫秒）
+STREAM_CLAIM_IDLE_MS = 60_000
+
+_consumer_name = f"{socket.gethostname()}:{os.getpid()}"
+_group_ready = False
+# 进程内的队列文件锁：追加 / 改名互斥，以及刷写（读取 .processing）互斥
+_append_lock = threading.Lock()
+_drain_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+
+def is_write_behind_enabled() -> bool:
+    return settings.ANSWER_INGEST_MODE == "write_behind"
+
+
+# ============ 入队 ============
+
+def build_answer_record(result_id: int, answer_in: SubmitAnswerRequest, score_awarded: int) -> dict:
+    """构造一条待落库的答题记录（答题时间统一为北京时间）"""
+    now_beijing = datetime.now(BEIJING_TZ)
+    return {
+        "result_id": result_id,
+        "question_id": answer_in.question_id,
+        "selected_option_ids": answer_in.selected_option_ids,
+        "score_awarded": score_awarded,
+        "answered_at": now_beijing.replace(tzinfo=None).isoformat(),
+    }
+
+
+def enqueue_answers(records: List[dict]) -> None:
+    """将答题记录追加到持久化队列"""
+    client = get_redis_client()
+
+    if client:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for record in records:
+                pipe.xadd(settings.ANSWER_QUEUE_STREAM, {"payload": json.dumps(record)})
+            pipe.execute()
+            return
+        except redis.RedisError as e:
+            logger.warning(f"答题记录写入 Redis Stream 失败，降级到本地文件: {e}")
+
+    _append_to_file(records)
+
+
+async def enqueue_answers_async(records: List[dict]) -> None:
+    """异步版 enqueue_answers，降级写文件时放到线程中执行，避免 fsync 阻塞事件循环"""
+    client = await get_async_redis_client()
+
+    if client:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for record in records:
+                pipe.xadd(settings.ANSWER_QUEUE_STREAM, {"payload": json.dumps(record)})
+            await pipe.execute()
+            return
+        except redis.RedisError as e:
+            logger.warning(f"答题记录写入 Redis Stream 失败，降级到本地文件: {e}")
+
+    await asyncio.to_thread(_append_to_file, records)
+
+
+@contextlib.contextmanager
+def _file_queue_lock(lock_path: str, thread_lock: threading.Lock, blocking: bool = True):
+    """
+    跨进程文件锁（同时持有进程内锁 thread_lock，flock 对同一进程的多个线程不互斥）。
+    blocking=False 时拿不到锁立即返回，产出 False。
+    """
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    if not thread_lock.acquire(blocking=blocking):
+        yield False
+        return
+    try:
+        with open(lock_path, "a") as lock_file:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+def _append_to_file(records: List[dict]) -> None:
+    path = settings.ANSWER_QUEUE_FILE
+    # 与刷写方的改名互斥：改名不会发生在追加到一半时
+    with _file_queue_lock(f"{path}.lock", _append_lock):
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# ============ 刷写 ============
+
+def _apply_batch(records: List[dict]) -> int:
+    """
+    批量落库：一次 executemany 插入答题日志，再按会话合并分数增量。
+    先跳过已落库的 (result_id, question_id)；与其他刷写方并发插入同一记录时由唯一索引兜底，
+    分数增量只按实际插入的行计算，保证重复投递幂等。
+    涉及的会话若已汇总（交卷后才落库的记录），在同一事务中删除其汇总，由兜底扫描重新汇总。
+    返回实际插入的记录数。
+    """
+    if not records:
+        return 0
+
+    db = SessionLocal()
+    try:
+        result_ids = {r["result_id"] for r in records}
+        existing = set(
+            db.query(AnswerLog.result_id, AnswerLog.question_id)
+            .filter(AnswerLog.result_id.in_(result_ids))
+            .all()
+        )
+
+        rows = []
+        for record in records:
+            pair = (record["result_id"], record["question_id"])
+            if pair in existing:
+                continue
+            existing.add(pair)
+            rows.append({
+                "result_id": record["result_id"],
+                "question_id": record["question_id"],
+                "selected_option_ids": record["selected_option_ids"],
+                "score_awarded": record["score_awarded"],
+                "answered_at": datetime.fromisoformat(record["answered_at"]),
+            })
+
+        inserted = insert_new_logs(db, rows)
+        score_deltas = defaultdict(int)
+        for row in inserted:
+            score_deltas[row["result_id"]] += row["score_awarded"]
+        for result_id, delta in score_deltas.items():
+            crud_assessment_result.increment_total_score(db=db, result_id=result_id, delta=delta)
+        stale = 0
+        if score_deltas:
+            stale = db.execute(
+                delete(AssessmentResultSummary)
+                .where(AssessmentResultSummary.result_id.in_(list(score_deltas)))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        db.commit()
+        if stale:
+            cache_service.invalidate_result_details(score_deltas)
+        return len(inserted)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+RECORD_FIELDS = ("result_id", "question_id", "selected_option_ids", "score_awarded", "answered_at")
+
+
+def _parse_record(raw: str) -> dict:
+    """解析一条队列记录；格式不合法（JSON 错误、缺字段、时间无法解析）时抛出 ValueError"""
+    record = json.loads(raw)
+    if not isinstance(record, dict) or any(field not in record for field in RECORD_FIELDS):
+        raise ValueError("缺少必需字段")
+    datetime.fromisoformat(record["answered_at"])
+    return record
+
+
+def _chunks(items: List[dict], size: int) -> Iterable[List[dict]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _flush_file_queue() -> int:
+    """
+    刷写本地文件队列：先将队列文件原子改名为 .processing 再读取，
+    落库失败时保留 .processing 文件，下次刷写重试。
+    .processing 文件由持有刷写锁的一个进程独占处理，其他 worker 本轮跳过，不会重复读取或误删。
+    """
+    path = settings.ANSWER_QUEUE_FILE
+    with _file_queue_lock(f"{path}.processing.lock", _drain_lock, blocking=False) as acquired:
+        if not acquired:
+            return 0
+        return _drain_file_queue(path)
+
+
+def _drain_file_queue(path: str) -> int:
+    processing_path = f"{path}.processing"
+    with _file_queue_lock(f"{path}.lock", _append_lock):
+        if not os.path.exists(processing_path) and os.path.exists(path) and os.path.getsize(path) > 0:
+            os.replace(path, processing_path)
+    if not os.path.exists(processing_path):
+        return 0
+
+    records = []
+    with open(processing_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(_parse_record(line))
+            except (ValueError, TypeError):
+                logger.error(f"答题队列文件中存在无法解析的记录，已跳过: {line[:200]}")
+
+    inserted = 0
+    for chunk in _chunks(records, settings.ANSWER_FLUSH_BATCH_SIZE):
+        inserted += _apply_batch(chunk)
+    os.remove(processing_path)
+    return inserted
+
+
+def _ensure_stream_group(client: redis.Redis) -> None:
+    global _group_ready
+    if _group_ready:
+        return
+    try:
+        client.xgroup_create(settings.ANSWER_QUEUE_STREAM, STREAM_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    _group_ready = True
+
+
+def _parse_entries(entries) -> Tuple[List[str], List[dict], List[Tuple[str, dict]]]:
+    """
+    返回 (全部消息 ID, 可落库的记录, 无法解析的消息)。
+    无法解析的消息同样计入消息 ID，随本批一起确认，不会被反复投递而阻塞后续消息。
+    """
+    ids, records, malformed = [], [], []
+    for entry_id, fields in entries or []:
+        ids.append(entry_id)
+        if not fields or "payload" not in fields:
+            continue
+        try:
+            records.append(_parse_record(fields["payload"]))
+        except (ValueError, TypeError) as e:
+            logger.error(f"答题队列消息 {entry_id} 无法解析，转入死信队列: {e}; payload={str(fields['payload'])[:200]}")
+            malformed.append((entry_id, fields))
+    return ids, records, malformed
+
+
+def _flush_stream_queue() -> int:
+    """
+    刷写 Redis Stream 队列：
+    1. 认领其他（可能已崩溃的）消费者长时间未确认的消息；
+    2. 先处理本消费者待确认的消息，再读取新消息；
+    3. 每批落库成功后 XACK + XDEL；无法解析的消息先转存到死信 Stream，再随本批确认。
+    """
+    client = get_redis_client()
+    if not client:
+        return 0
+
+    stream = settings.ANSWER_QUEUE_STREAM
+    batch_size = settings.ANSWER_FLUSH_BATCH_SIZE
+    try:
+        _ensure_stream_group(client)
+        client.xautoclaim(
+            stream, STREAM_GROUP, _consumer_name,
+            min_idle_time=STREAM_CLAIM_IDLE_MS, start_id="0-0", count=batch_size
+        )
+    except redis.RedisError as e:
+        logger.warning(f"答题队列 Redis Stream 不可用: {e}")
+        return 0
+
+    inserted = 0
+    # "0" 读取本消费者已投递未确认的消息，">" 读取新消息
+    for read_id in ("0", ">"):
+        while True:
+            response = client.xreadgroup(
+                STREAM_GROUP, _consumer_name, {stream: read_id}, count=batch_size
+            )
+            entries = response[0][1] if response else []
+            if not entries:
+                break
+            entry_ids, records, malformed = _parse_entries(entries)
+            inserted += _apply_batch(records)
+            if malformed:
+                pipe = client.pipeline(transaction=False)
+                for entry_id, fields in malformed:
+                    pipe.xadd(settings.ANSWER_QUEUE_DEAD_LETTER_STREAM, {**fields, "source_id": entry_id})
+                pipe.execute()
+            client.xack(stream, STREAM_GROUP, *entry_ids)
+            client.xdel(stream, *entry_ids)
+            if len(entries) < batch_size:
+                break
+    return inserted
+
+
+def flush_answer_queue() -> int:
+    """
+    刷写所有待落库的答题记录（本地文件队列 + Redis Stream）。
+    由调度器周期性调用；会话汇总任务汇总前也会调用一次，确保汇总与最终分数完整。
+    """
+    with _flush_lock:
+        inserted = 0
+        try:
+            inserted += _flush_file_queue()
+            inserted += _flush_stream_queue()
+        except Exception as e:
+            logger.error(f"答题队列刷写失败: {e}")
+        if inserted:
+            logger.info(f"答题队列已落库 {inserted} 条记录")
+        return inserted
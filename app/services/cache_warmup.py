@@ -0,0 +1,160 @@
+# app/services/cache_warmup.py
+"""
+考核开考前缓存预热
+缓存默认在第一个考生请求时才懒加载，开考瞬间大量请求会同时穿透到数据库。
+预热分两部分：
+- 共享预热：考核创建 / 修改时由调度器注册定时任务（见 scheduler.schedule_cache_warmup），只由 leader 在开始前
+  CACHE_WARMUP_LEAD_MINUTES 分钟执行 warm_up_assessment：构建题库蓝图与答案键写入 Redis，
+  并刷新所属平台的"即将开始/正在进行"调度缓存；
+- 进程内预热：每个 worker 每分钟执行 warm_up_local，为提前量窗口内即将开始的考核把蓝图与答案键
+  载入本进程内存，并预先建立本进程连接池中的数据库连接，避免开考时集中建连。
+共享预热的报告（各步骤耗时与数据量）写入缓存，可通过 GET /monitoring/warmup/{assessment_id} 查看。
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+import pytz
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.cache import cache_service
+from app.core.config import settings
+from app.crud.crud_answer_key import get_answer_key
+from app.crud.crud_assessment import crud_assessment
+from app.crud.crud_blueprint import get_blueprint_segments
+from app.db.session import SessionLocal, engine
+from app.models.assessment_management import Assessment
+from app.models.question_management import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+# 预热报告保留时长（秒）
+WARMUP_REPORT_TTL = 24 * 3600
+
+# 本进程已完成进程内预热的考核 ID
+_locally_warmed: Set[int] = set()
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def open_db_connections(count: int) -> int:
+    """
+    同时检出 count 个连接并执行 SELECT 1，归还后留在连接池中供开考时直接复用。
+    返回实际建立的连接数（数据库异常时提前停止）。
+    """
+    connections = []
+    try:
+        for _ in range(count):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    except SQLAlchemyError as e:
+        logger.warning(f"预热数据库连接失败（已建立 {len(connections)} 个）: {e}")
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
+def warm_up_assessment(assessment_id: int) -> Optional[dict]:
+    """
+    预热单场考核所需的共享缓存（Redis），返回预热报告；考核不存在时返回 None。
+    """
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        assessment = crud_assessment.get(db=db, id=assessment_id)
+        if not assessment:
+            logger.info(f"考核 {assessment_id} 不存在，跳过缓存预热")
+            return None
+        question_bank_id = assessment.question_bank_id
+        platform_id = db.query(QuestionBank.platform_id).filter(QuestionBank.id == question_bank_id).scalar()
+
+        report = {
+            "assessment_id": assessment_id,
+            "question_bank_id": question_bank_id,
+            "platform_id": platform_id,
+            "start_time": assessment.start_time.isoformat(),
+            "warmed_at": datetime.now(BEIJING_TZ).replace(tzinfo=None).isoformat(),
+        }
+
+        step = time.perf_counter()
+        blueprint = get_blueprint_segments(db, question_bank_id=question_bank_id)
+        report["blueprint"] = {
+            "version": blueprint.version,
+            "procedures": len(blueprint.segments),
+            "questions": sum(len(seg.question_ids) for seg in blueprint.segments),
+            "bytes": sum(len(seg.payload) for seg in blueprint.segments),
+            "duration_ms": _elapsed_ms(step),
+        }
+
+        step = time.perf_counter()
+        answer_key = get_answer_key(db, question_bank_id=question_bank_id)
+        report["answer_key"] = {"questions": len(answer_key), "duration_ms": _elapsed_ms(step)}
+
+        step = time.perf_counter()
+        upcoming = None
+        if platform_id is not None:
+            upcoming = crud_assessment.get_upcoming_schedule_entry(db=db, platform_id=platform_id)
+        report["upcoming"] = {
+            "assessment_id": upcoming["id"] if upcoming else None,
+            "duration_ms": _elapsed_ms(step),
+        }
+    finally:
+        db.close()
+
+    report["duration_ms"] = _elapsed_ms(started)
+    cache_service.set_warmup_report(assessment_id, report, ttl=WARMUP_REPORT_TTL)
+    logger.info(
+        f"考核 {assessment_id} 缓存预热完成，耗时 {report['duration_ms']}ms："
+        f"蓝图 {report['blueprint']['procedures']} 个工序 / {report['blueprint']['bytes']} 字节，"
+        f"答案键 {report['answer_key']['questions']} 题"
+    )
+    return report
+
+
+def warm_up_local() -> int:
+    """
+    进程内预热：为 CACHE_WARMUP_LEAD_MINUTES 分钟内即将开始、本进程尚未预热的考核
+    载入蓝图与答案键到本进程内存，并预先建立数据库连接。返回本次预热的考核数。
+    使用 Redis 时等共享预热完成（已有预热报告）后再执行，从 Redis 读取而不是各 worker 同时查询数据库。
+    """
+    now_naive = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+    db = SessionLocal()
+    try:
+        upcoming = (
+            db.query(Assessment.id, Assessment.question_bank_id)
+            .filter(
+                Assessment.start_time > now_naive,
+                Assessment.start_time <= now_naive + timedelta(minutes=settings.CACHE_WARMUP_LEAD_MINUTES),
+            )
+            .all()
+        )
+        # 已开始的考核不再需要预热，从记录中移除
+        _locally_warmed.intersection_update(assessment_id for assessment_id, _ in upcoming)
+
+        warmed = 0
+        distributed = cache_service.is_distributed()
+        for assessment_id, question_bank_id in upcoming:
+            if assessment_id in _locally_warmed:
+                continue
+            if distributed and not cache_service.get_warmup_report(assessment_id):
+                continue
+            get_blueprint_segments(db, question_bank_id=question_bank_id)
+            get_answer_key(db, question_bank_id=question_bank_id)
+            _locally_warmed.add(assessment_id)
+            warmed += 1
+    finally:
+        db.close()
+
+    if warmed:
+        opened = open_db_connections(settings.CACHE_WARMUP_DB_CONNECTIONS)
+        logger.info(f"本进程预热 {warmed} 场考核，数据库连接 {opened} 个")
+    return warmed
@@ -0,0 +1,194 @@
+# app/services/result_finalizer.py
+"""
+会话结束汇总
+会话结束（考生交卷、考核结束自动交卷、兜底扫描）后，由后台任务为每个会话计算一次汇总：
+- 作答题数、答对题数（与 score_answer 的判定一致：所选选项与正确选项完全相同）、答题日志得分之和、作答时长；
+- 按工序汇总的得分、作答题数与答对题数；
+写入 assessment_result_summaries（一个会话一行），以答题日志得分之和写回会话 total_score（交卷不等待写后队列，
+最终分数由此确定），并把成绩详情（含题目快照与汇总）写入缓存，
+管理端查看成绩列表 / 详情时不再从 answer_logs 重新推导。
+详情缓存按题库版本号校验，题目变更后自动失效；汇总被删除（迟到记录、总分修正）时同时删除详情缓存。
+汇总任务由 scheduler.schedule_result_finalization 提交到进程内调度器执行，不占用请求；
+任务丢失（进程退出）或总分被核对任务修正后，由兜底扫描 finalize_pending_results 补齐。
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import pytz
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.cache import cache_service
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.assessment_management import AnswerLog, AssessmentResult, AssessmentResultSummary
+from app.models.question_management import Question
+from app.schemas.result import ResultSummary
+from app.services import answer_ingest
+
+logger = logging.getLogger(__name__)
+
+# 定义北京时区
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+
+
+def load_results_with_details(db: Session, result_ids: List[int]) -> List[AssessmentResult]:
+    """级联加载：结果 -> 考生 / 汇总 / 日志 -> 题目 -> 工序、选项"""
+    return (
+        db.query(AssessmentResult)
+        .options(
+            selectinload(AssessmentResult.examinee),
+            selectinload(AssessmentResult.assessment),
+            selectinload(AssessmentResult.summary),
+            selectinload(AssessmentResult.answer_logs).selectinload(AnswerLog.question).selectinload(Question.options),
+            selectinload(AssessmentResult.answer_logs).selectinload(AnswerLog.question).selectinload(Question.procedure),
+        )
+        .filter(AssessmentResult.id.in_(result_ids))
+        .all()
+    )
+
+
+def _selected_ids(log: AnswerLog) -> List[int]:
+    # 兼容 list 和 json string
+    if isinstance(log.selected_option_ids, list):
+        return log.selected_option_ids
+    if isinstance(log.selected_option_ids, str):
+        try:
+            return json.loads(log.selected_option_ids)
+        except ValueError:
+            return []
+    return []
+
+
+def summarize_result(result: AssessmentResult) -> dict:
+    """根据已加载的答题日志计算会话汇总（不访问数据库）"""
+    procedures: Dict[int, dict] = {}
+    answered_count = correct_count = total_score = 0
+    for log in result.answer_logs:
+        answered_count += 1
+        total_score += log.score_awarded
+        question = log.question
+        if question is None:
+            continue
+        correct = set(_selected_ids(log)) == {opt.id for opt in question.options if opt.is_correct}
+        correct_count += correct
+
+        procedure = procedures.get(question.procedure_id)
+        if procedure is None:
+            procedure = procedures[question.procedure_id] = {
+                "procedure_id": question.procedure_id,
+                "name": question.procedure.name if question.procedure else "",
+                "score": 0,
+                "answered_count": 0,
+                "correct_count": 0,
+            }
+        procedure["score"] += log.score_awarded
+        procedure["answered_count"] += 1
+        procedure["correct_count"] += correct
+
+    duration_seconds = None
+    if result.end_time:
+        duration_seconds = max(int((result.end_time - result.start_time).total_seconds()), 0)
+    return {
+        "answered_count": answered_count,
+        "correct_count": correct_count,
+        "total_score": total_score,
+        "duration_seconds": duration_seconds,
+        "procedure_scores": [procedures[pid] for pid in sorted(procedures)],
+    }
+
+
+def build_result_detail(result: AssessmentResult) -> dict:
+    """组装成绩详情（AssessmentResultDetail 结构），题目与选项按 ID 排序保证展示顺序稳定"""
+    answer_logs_details = []
+    for log in sorted(result.answer_logs, key=lambda x: x.question_id):
+        log_data = {
+            "question_id": log.question_id,
+            "score_awarded": log.score_awarded,
+            "answered_at": log.answered_at,
+            "selected_option_ids": _selected_ids(log),
+            "question": None,
+        }
+        # 注入题目详情 (Snapshoting)
+        if log.question:
+            log_data["question"] = {
+                "prompt": log.question.prompt,
+                "question_type": log.question.question_type.value,
+                "score": log.question.score,
+                "options": [
+                    {"id": opt.id, "option_text": opt.option_text, "is_correct": opt.is_correct}
+                    for opt in sorted(log.question.options, key=lambda x: x.id)
+                ],
+            }
+        answer_logs_details.append(log_data)
+
+    return {
+        "id": result.id,
+        "total_score": result.total_score,
+        "start_time": result.start_time,
+        "end_time": result.end_time,
+        "examinee_identifier": result.examinee.identifier if result.examinee else "Unknown",
+        "answer_logs": answer_logs_details,
+        "summary": ResultSummary.model_validate(result.summary).model_dump() if result.summary else None,
+    }
+
+
+def _finalize_batch(db: Session, result_ids: List[int]) -> int:
+    # 只汇总已结束的会话；进行中的会话仍在作答，汇总会很快过时
+    results = [r for r in load_results_with_details(db, result_ids) if r.end_time is not None]
+    if not results:
+        return 0
+
+    finalized_at = datetime.now(BEIJING_TZ).replace(tzinfo=None)
+    for result in results:
+        summary = result.summary or AssessmentResultSummary(result_id=result.id)
+        for field, value in summarize_result(result).items():
+            setattr(summary, field, value)
+        summary.assessment_id = result.assessment_id
+        summary.finalized_at = finalized_at
+        result.summary = summary
+        # 写后模式下交卷时队列可能尚未刷写，最终分数以答题日志为准
+        result.total_score = summary.total_score
+    # 提交前组装详情：提交后对象过期，再访问会逐个重新加载
+    details = {result.id: (result.assessment.question_bank_id, build_result_detail(result)) for result in results}
+    try:
+        db.commit()
+    except (IntegrityError, StaleDataError):
+        # 某个会话被另一个汇总任务同时写入（或其汇总刚被删除）：整批回滚后逐个重试，其余会话不受影响
+        db.rollback()
+        if len(result_ids) > 1:
+            db.expunge_all()
+            return sum(_finalize_batch(db, [result_id]) for result_id in result_ids)
+        logger.warning(f"会话汇总写入冲突，由其他任务或兜底扫描完成: {result_ids[0]}")
+        return 0
+
+    cache_service.set_result_details(details)
+    return len(results)
+
+
+def finalize_results(result_ids: Iterable[int]) -> int:
+    """
+    为已结束的会话计算汇总并预热成绩详情缓存（按 RESULT_FINALIZE_BATCH_SIZE 分批），返回完成汇总的会话数。
+    重复执行只会覆盖为最新结果。
+    """
+    result_ids = sorted(set(result_ids))
+    if not result_ids:
+        return 0
+
+    # 写后模式：先把队列中的答题记录落库，保证汇总完整
+    if answer_ingest.is_write_behind_enabled():
+        answer_ingest.flush_answer_queue()
+
+    finalized = 0
+    batch_size = settings.RESULT_FINALIZE_BATCH_SIZE
+    db: Session = SessionLocal()
+    try:
+        for start in range(0, len(result_ids), batch_size):
+            finalized += _finalize_batch(db, result_ids[start:start + batch_size])
+            db.expunge_all()
+    finally:
+        db.close()
+    return finalized
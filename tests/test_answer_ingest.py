@@ -0,0 +1,201 @@
+# tests/test_answer_ingest.py
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+
+from app.crud.crud_answer_log import _is_duplicate_answer, insert_new_logs
+from app.models.assessment_management import AnswerLog, AssessmentResult, AssessmentResultSummary
+from app.services import answer_ingest
+
+
+@pytest.fixture
+def db_factory(session_factory, monkeypatch):
+    monkeypatch.setattr(answer_ingest, "SessionLocal", session_factory)
+    return session_factory
+
+
+@pytest.fixture
+def result_id(db_factory):
+    db = db_factory()
+    result = AssessmentResult(assessment_id=1, examinee_id=1, start_time=datetime(2026, 10, 18, 9, 0), total_score=0)
+    db.add(result)
+    db.commit()
+    db.close()
+    return result.id
+
+
+def _record(result_id: int, question_id: int, score: int = 5) -> dict:
+    return {
+        "result_id": result_id,
+        "question_id": question_id,
+        "selected_option_ids": [question_id * 10],
+        "score_awarded": score,
+        "answered_at": "2026-10-18T09:30:00",
+    }
+
+
+def _state(db_factory, result_id: int):
+    db = db_factory()
+    try:
+        total = db.get(AssessmentResult, result_id).total_score
+        logs = db.query(AnswerLog).filter(AnswerLog.result_id == result_id).count()
+        return total, logs
+    finally:
+        db.close()
+
+
+def test_apply_batch_inserts_and_scores(db_factory, result_id):
+    records = [_record(result_id, 1, 5), _record(result_id, 2, 10), _record(result_id, 3, -2)]
+    assert answer_ingest._apply_batch(records) == 3
+    assert _state(db_factory, result_id) == (13, 3)
+
+
+def test_apply_batch_redelivery_is_idempotent(db_factory, result_id):
+    records = [_record(result_id, 1), _record(result_id, 2)]
+    assert answer_ingest._apply_batch(records) == 2
+    # 消息被重新认领 / 队列文件重新处理：整批再次投递
+    assert answer_ingest._apply_batch(records) == 0
+    # 部分重复：只有新记录入库计分
+    assert answer_ingest._apply_batch(records + [_record(result_id, 3)]) == 1
+    assert _state(db_factory, result_id) == (15, 3)
+
+
+def test_apply_batch_duplicates_within_batch(db_factory, result_id):
+    assert answer_ingest._apply_batch([_record(result_id, 1), _record(result_id, 1)]) == 1
+    assert _state(db_factory, result_id) == (5, 1)
+
+
+def test_insert_new_logs_skips_rows_inserted_concurrently(db_factory, result_id):
+    """另一个刷写方在预检查之后插入了同一记录：由唯一索引拦下，只返回实际插入的行"""
+    rows = [
+        {**_record(result_id, qid), "answered_at": datetime(2026, 10, 18, 9, 30)}
+        for qid in (1, 2, 3)
+    ]
+    db = db_factory()
+    db.add(AnswerLog(**rows[1]))
+    db.commit()
+
+    inserted = insert_new_logs(db, rows)
+    db.commit()
+    assert [row["question_id"] for row in inserted] == [1, 3]
+    assert db.query(AnswerLog).filter(AnswerLog.result_id == result_id).count() == 3
+    db.close()
+
+
+def test_insert_new_logs_reraises_other_integrity_errors(db_factory, result_id):
+    """非唯一索引冲突（如非空约束）不能退化为逐行 INSERT IGNORE 而被静默丢弃"""
+    rows = [
+        {**_record(result_id, 1), "answered_at": datetime(2026, 10, 18, 9, 30)},
+        {**_record(result_id, 2), "score_awarded": None, "answered_at": datetime(2026, 10, 18, 9, 30)},
+    ]
+    db = db_factory()
+    with pytest.raises(IntegrityError):
+        insert_new_logs(db, rows)
+    db.rollback()
+    assert db.query(AnswerLog).filter(AnswerLog.result_id == result_id).count() == 0
+    db.close()
+
+
+@pytest.mark.parametrize("message, duplicate", [
+    ("(1062, \"Duplicate entry '7-3' for key 'answer_logs.uq_answer_logs_result_question'\")", True),
+    ("UNIQUE constraint failed: answer_logs.result_id, answer_logs.question_id", True),
+    ("(1452, 'Cannot add or update a child row: a foreign key constraint fails')", False),
+    ("(1062, \"Duplicate entry '9' for key 'answer_logs.PRIMARY'\")", False),
+])
+def test_is_duplicate_answer(message, duplicate):
+    assert _is_duplicate_answer(IntegrityError("INSERT", {}, Exception(message))) is duplicate
+
+
+def test_late_record_invalidates_summary(db_factory, result_id):
+    db = db_factory()
+    result = db.get(AssessmentResult, result_id)
+    result.end_time = datetime(2026, 10, 18, 10, 0)
+    db.add(AssessmentResultSummary(
+        result_id=result_id, answered_count=0, correct_count=0, total_score=0,
+        procedure_scores=[], finalized_at=datetime(2026, 10, 18, 10, 1),
+    ))
+    db.commit()
+    db.close()
+
+    assert answer_ingest._apply_batch([_record(result_id, 1)]) == 1
+    db = db_factory()
+    assert db.get(AssessmentResultSummary, result_id) is None
+    db.close()
+
+
+def test_apply_batch_empty():
+    assert answer_ingest._apply_batch([]) == 0
+
+
+class FakeStreamClient:
+    """只实现刷写用到的 Stream 命令：一次性投递 entries，记录确认、删除与死信"""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.acked, self.deleted, self.dead_letters = [], [], []
+
+    def xgroup_create(self, *args, **kwargs):
+        pass
+
+    def xautoclaim(self, *args, **kwargs):
+        return []
+
+    def xreadgroup(self, group, consumer, streams, count):
+        (stream, read_id), = streams.items()
+        if read_id != ">" or not self.entries:
+            return []
+        entries, self.entries = self.entries[:count], self.entries[count:]
+        return [[stream, entries]]
+
+    def xack(self, stream, group, *ids):
+        self.acked.extend(ids)
+
+    def xdel(self, stream, *ids):
+        self.deleted.extend(ids)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def xadd(self, stream, fields):
+        self.dead_letters.append((stream, fields))
+
+    def execute(self):
+        pass
+
+
+def test_stream_flush_skips_malformed_entries(db_factory, result_id, monkeypatch):
+    client = FakeStreamClient([
+        ("1-0", {"payload": json.dumps(_record(result_id, 1))}),
+        ("2-0", {"payload": "{not json"}),
+        ("3-0", {"payload": json.dumps({"result_id": result_id})}),
+        ("4-0", {"payload": json.dumps(_record(result_id, 2))}),
+    ])
+    monkeypatch.setattr(answer_ingest, "get_redis_client", lambda: client)
+    monkeypatch.setattr(answer_ingest, "_group_ready", False)
+
+    assert answer_ingest._flush_stream_queue() == 2
+    assert _state(db_factory, result_id) == (10, 2)
+    # 坏消息转入死信 Stream 后与正常消息一起确认，不会阻塞后续刷写
+    assert client.acked == client.deleted == ["1-0", "2-0", "3-0", "4-0"]
+    assert [(stream, fields["source_id"]) for stream, fields in client.dead_letters] == [
+        (settings.ANSWER_QUEUE_DEAD_LETTER_STREAM, "2-0"),
+        (settings.ANSWER_QUEUE_DEAD_LETTER_STREAM, "3-0"),
+    ]
+
+
+def test_file_flush_skips_malformed_lines(db_factory, result_id, monkeypatch, tmp_path):
+    path = tmp_path / "answer_queue.jsonl"
+    bad_time = {**_record(result_id, 3), "answered_at": "yesterday"}
+    path.write_text(
+        "\n".join([json.dumps(_record(result_id, 1)), "{broken", json.dumps(bad_time), json.dumps(_record(result_id, 2))]) + "\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(settings, "ANSWER_QUEUE_FILE", str(path))
+
+    assert answer_ingest._flush_file_queue() == 2
+    assert _state(db_factory, result_id) == (10, 2)
+    assert not (tmp_path / "answer_queue.jsonl.processing").exists()
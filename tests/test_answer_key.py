@@ -0,0 +1,84 @@
+# tests/test_answer_key.py
+import pytest
+
+from app.core.cache import cache_service
+from app.crud import crud_answer_key
+from app.crud.crud_answer_key import AnswerKeyEntry, get_answer_key
+from app.crud.crud_answer_log import crud_answer_log, score_answer
+from app.schemas.examinee import SubmitAnswerRequest
+
+
+def _entry(question_type: str, correct=(1,), valid=(1, 2, 3), score=10) -> AnswerKeyEntry:
+    return AnswerKeyEntry(
+        procedure_id=1, question_type=question_type, score=score,
+        valid_option_ids=frozenset(valid), correct_option_ids=frozenset(correct),
+    )
+
+
+@pytest.mark.parametrize("question_type, correct, submitted, expected", [
+    ("single_choice", (1,), {1}, (10, True)),
+    ("single_choice", (1,), {2}, (0, False)),
+    ("multiple_choice", (1, 2), {1, 2}, (10, True)),
+    ("multiple_choice", (1, 2), {1}, (5, False)),
+    ("multiple_choice", (1, 2), {1, 3}, (0, False)),
+    ("deduction_single_choice", (1,), {1}, (0, True)),
+    ("deduction_single_choice", (1,), {2}, (-10, False)),
+])
+def test_score_answer(question_type, correct, submitted, expected):
+    assert score_answer(_entry(question_type, correct), submitted) == expected
+
+
+@pytest.fixture
+def compile_calls(monkeypatch):
+    calls = []
+    compile_answer_key = crud_answer_key.compile_answer_key
+
+    def counting(db, *, question_bank_id):
+        calls.append(question_bank_id)
+        return compile_answer_key(db, question_bank_id=question_bank_id)
+
+    monkeypatch.setattr(crud_answer_key, "compile_answer_key", counting)
+    return calls
+
+
+def test_answer_key_compiled_once_per_bank_version(seeded, session_factory, compile_calls):
+    db = session_factory()
+    answer_key = get_answer_key(db, question_bank_id=seeded.bank_id)
+    first = seeded.questions[0]
+    assert answer_key[first.id].correct_option_ids == frozenset({first.correct_option_id})
+    assert answer_key[first.id].procedure_id == seeded.procedure_id
+    assert len(answer_key) == 3
+
+    assert get_answer_key(db, question_bank_id=seeded.bank_id) is answer_key
+    # 进程内存丢失（如其他 worker）时从共享缓存恢复，不重新查询数据库
+    crud_answer_key._answer_key_memory.clear()
+    assert get_answer_key(db, question_bank_id=seeded.bank_id) == answer_key
+    assert compile_calls == [seeded.bank_id]
+
+    # 题库变更递增版本号后重新编译
+    cache_service.bump_bank_version(seeded.bank_id)
+    get_answer_key(db, question_bank_id=seeded.bank_id)
+    assert compile_calls == [seeded.bank_id, seeded.bank_id]
+    db.close()
+
+
+def test_score_submission_validates_against_answer_key(seeded, session_factory):
+    db = session_factory()
+    first, second, _ = seeded.questions
+
+    def submit(question_id, option_ids, procedure_id=seeded.procedure_id):
+        answer_in = SubmitAnswerRequest(
+            examinee_identifier="stu1", procedure_id=procedure_id, question_id=question_id,
+            selected_option_ids=option_ids,
+        )
+        return crud_answer_log.score_submission(db, question_bank_id=seeded.bank_id, answer_in=answer_in)
+
+    assert submit(first.id, [first.correct_option_id]) == (10, True)
+    assert submit(first.id, [first.wrong_option_id]) == (0, False)
+    with pytest.raises(ValueError, match="not found"):
+        submit(999, [1])
+    with pytest.raises(ValueError, match="Procedure ID mismatch"):
+        submit(first.id, [first.correct_option_id], procedure_id=seeded.procedure_id + 1)
+    with pytest.raises(ValueError, match="Invalid option"):
+        submit(first.id, [second.correct_option_id])
+    db.close()
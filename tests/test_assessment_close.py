@@ -0,0 +1,147 @@
+# tests/test_assessment_close.py
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.core import scheduler
+from app.core.cache import cache_service
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.models.assessment_management import Assessment, AssessmentResult
+from app.models.user_management import Examinee
+
+from conftest import beijing_now
+
+
+@pytest.fixture
+def closing(seeded, session_factory, monkeypatch):
+    """seeded 的考核再加一名已交卷的考生 stu2；另一场考核有一名未交卷的考生 stu3"""
+    monkeypatch.setattr(scheduler, "SessionLocal", session_factory)
+    finalized, rescheduled = [], []
+    monkeypatch.setattr(scheduler, "schedule_result_finalization", lambda ids: finalized.extend(ids))
+    monkeypatch.setattr(scheduler, "schedule_assessment_close", lambda *args: rescheduled.append(args))
+
+    db = session_factory()
+    now = beijing_now()
+    other = Assessment(title="另一场", start_time=now - timedelta(hours=2), end_time=now - timedelta(hours=1),
+                       question_bank_id=seeded.bank_id)
+    stu2, stu3 = Examinee(identifier="stu2"), Examinee(identifier="stu3")
+    db.add_all([other, stu2, stu3])
+    db.flush()
+    finished = AssessmentResult(assessment_id=seeded.assessment_id, examinee_id=stu2.id,
+                                start_time=now - timedelta(minutes=20), end_time=now - timedelta(minutes=5), total_score=0)
+    elsewhere = AssessmentResult(assessment_id=other.id, examinee_id=stu3.id,
+                                 start_time=now - timedelta(hours=2), total_score=0)
+    db.add_all([finished, elsewhere])
+    db.commit()
+    seeded.finished_id, seeded.finished_end = finished.id, finished.end_time
+    seeded.elsewhere_id = elsewhere.id
+    seeded.finalized, seeded.rescheduled = finalized, rescheduled
+    db.close()
+    return seeded
+
+
+def _end_assessment(session_factory, assessment_id, end_time):
+    db = session_factory()
+    db.get(Assessment, assessment_id).end_time = end_time
+    db.commit()
+    db.close()
+
+
+def test_close_open_sessions_only_touches_open_sessions_of_assessment(closing, session_factory):
+    db = session_factory()
+    end_time = beijing_now()
+    assert crud_assessment_result.close_open_sessions(db=db, assessment_id=closing.assessment_id, end_time=end_time) == [
+        closing.result_id
+    ]
+    assert db.get(AssessmentResult, closing.result_id).end_time == end_time
+    # 已交卷的会话保留原结束时间，其他考核不受影响
+    assert db.get(AssessmentResult, closing.finished_id).end_time == closing.finished_end
+    assert db.get(AssessmentResult, closing.elsewhere_id).end_time is None
+    db.close()
+
+
+def test_close_assessment_submits_and_finalizes(closing, session_factory):
+    _end_assessment(session_factory, closing.assessment_id, beijing_now() - timedelta(seconds=1))
+    cache_service.set_session_state(closing.result_id, {"assessment_id": closing.assessment_id}, [1], ttl=60)
+
+    assert scheduler.close_assessment(closing.assessment_id) == 1
+    assert closing.finalized == [closing.result_id]
+    assert cache_service.get_session_state(closing.result_id) is None
+    assert cache_service.get_answered_questions(closing.result_id) == set()
+    # 重复触发不再有会话需要结束
+    assert scheduler.close_assessment(closing.assessment_id) == 0
+
+
+def test_close_assessment_reschedules_postponed_end(closing, session_factory):
+    # 结束时间已推迟（旧的截止时间仍触发）：按新结束时间重新注册，不结束会话
+    new_end = beijing_now() + timedelta(hours=1)
+    _end_assessment(session_factory, closing.assessment_id, new_end)
+    assert scheduler.close_assessment(closing.assessment_id) == 0
+    assert closing.rescheduled == [(closing.assessment_id, new_end)]
+    db = session_factory()
+    assert db.get(AssessmentResult, closing.result_id).end_time is None
+    db.close()
+
+
+def test_close_missing_assessment(closing):
+    assert scheduler.close_assessment(9999) == 0
+
+
+@pytest.fixture
+def deadlines():
+    yield scheduler.deadline_scheduler
+    scheduler.deadline_scheduler.rebuild([])
+
+
+def test_assessment_endpoints_reschedule_and_cancel_deadline(seeded, api_client, deadlines):
+    new_end = beijing_now().replace(microsecond=0) + timedelta(hours=2)
+    api_client.put(f"/api/v1/assessments/{seeded.assessment_id}", json={"end_time": new_end.isoformat()})
+    # 每场考核只有一个截止时间，改期覆盖原条目
+    assert deadlines._deadlines == {seeded.assessment_id: new_end}
+
+    api_client.delete(f"/api/v1/assessments/{seeded.assessment_id}")
+    assert deadlines._deadlines == {}
+
+
+def test_close_expired_sessions_only_past_end_time(closing, session_factory):
+    db = session_factory()
+    now = beijing_now()
+    assert crud_assessment_result.close_expired_sessions(db=db, now=now, assessment_id=closing.assessment_id) == []
+    assert crud_assessment_result.close_expired_sessions(db=db, now=now) == [closing.elsewhere_id]
+    # seeded 的考核尚未结束，会话保持进行中
+    assert db.get(AssessmentResult, closing.result_id).end_time is None
+    assert db.get(AssessmentResult, closing.elsewhere_id).end_time == now
+    db.close()
+
+
+def test_expired_sweep_is_one_select_and_one_update(closing, session_factory):
+    db = session_factory()
+    now = beijing_now()
+    for i in range(5):
+        examinee = Examinee(identifier=f"late{i}")
+        db.add(examinee)
+        db.flush()
+        db.add(AssessmentResult(assessment_id=closing.assessment_id, examinee_id=examinee.id,
+                                start_time=now - timedelta(minutes=20), total_score=0))
+    db.get(Assessment, closing.assessment_id).end_time = now - timedelta(seconds=1)
+    db.commit()
+    db.close()
+    cache_service.set_session_state(closing.result_id, {"assessment_id": closing.assessment_id}, [1], ttl=60)
+
+    statements = []
+    engine = session_factory.kw["bind"]
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert scheduler.force_submit_expired_sessions() == 7
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # 会话数量不影响语句数：一次连接查询、一条 UPDATE
+    assert statements == ["SELECT", "UPDATE"]
+    assert len(closing.finalized) == 7
+    assert {closing.result_id, closing.elsewhere_id} <= set(closing.finalized)
+    assert cache_service.get_session_state(closing.result_id) is None
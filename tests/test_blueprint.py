@@ -0,0 +1,118 @@
+# tests/test_blueprint.py
+import orjson
+import pytest
+
+from app.crud import crud_blueprint
+from app.crud.crud_blueprint import (
+    BlueprintSegment, _prepare, build_assessment_blueprint, client_has_blueprint, content_version,
+    get_blueprint_segments, parse_if_none_match, render_session_payload, render_session_state_payload,
+)
+from app.schemas.examinee import AssessmentBlueprintResponse
+
+
+def _blueprint(version: int, title: str):
+    payload = f'{{"procedure_id":1,"title":"{title}","questions":[]}}'.encode()
+    return _prepare(7, version, [BlueprintSegment(1, frozenset({11, 12}), payload)])
+
+
+def test_content_version_tracks_answered_set():
+    blueprint = _blueprint(3, "v1")
+    assert content_version(blueprint, [12, 11]) == content_version(blueprint, [11, 12])
+    assert content_version(blueprint, [11]) != content_version(blueprint, [11, 12])
+    assert content_version(blueprint, []).startswith(f"{blueprint.tag}-")
+
+
+def test_client_has_blueprint_ignores_answered_digest():
+    blueprint = _blueprint(3, "v1")
+    etag = content_version(blueprint, [11])
+    assert client_has_blueprint(blueprint, parse_if_none_match(f'W/"other", "{etag}"'))
+    assert not client_has_blueprint(blueprint, parse_if_none_match(None))
+
+
+def test_version_counter_reset_does_not_reuse_old_blueprint():
+    """Redis 清空后题库版本号从头计数：版本号相同但内容不同的蓝图，客户端必须重新下载"""
+    before_reset = _blueprint(0, "old")
+    after_reset = _blueprint(0, "new")
+    etag = content_version(before_reset, [])
+    assert not client_has_blueprint(after_reset, [etag])
+    # 内容未变时版本号重置不影响客户端复用
+    assert client_has_blueprint(_blueprint(0, "old"), [etag])
+
+
+def _procedure(procedure_id: int, question_ids) -> BlueprintSegment:
+    questions = [
+        {"id": qid, "prompt": f"题目{qid}", "question_type": "single_choice", "score": 10,
+         "options": [{"id": qid * 10, "option_text": "A"}]}
+        for qid in question_ids
+    ]
+    payload = orjson.dumps({"id": procedure_id, "name": f"工序{procedure_id}", "questions": questions})
+    return BlueprintSegment(procedure_id, frozenset(question_ids), payload)
+
+
+def test_render_session_payload_filters_and_injects_answers():
+    blueprint = _prepare(7, 1, [_procedure(1, [11, 12]), _procedure(2, [21]), _procedure(3, [31])])
+    answered = {
+        11: {"selected_option_ids": [110], "score_awarded": 10},
+        21: {"selected_option_ids": [210], "score_awarded": 0},
+    }
+    payload = render_session_payload(blueprint, result_id=5, answered_logs_map=answered, version="v")
+    body = orjson.loads(payload)
+    assert body["code"] == 200
+    data = AssessmentBlueprintResponse.model_validate(body["data"])
+    assert (data.assessment_result_id, data.content_version) == (5, "v")
+    # 全部作答的工序 2 被过滤；部分作答的工序 1 注入已选答案；未作答的工序 3 原样下发
+    assert [proc.id for proc in data.procedures] == [1, 3]
+    first, second = data.procedures[0].questions
+    assert (first.selected_option_ids, first.score_awarded) == ([110], 10)
+    assert second.selected_option_ids is None
+    assert _procedure(3, [31]).payload in payload
+
+
+def test_render_session_state_payload():
+    blueprint = _prepare(7, 1, [_procedure(1, [11, 12]), _procedure(2, [21])])
+    answered = {21: {"selected_option_ids": [210], "score_awarded": 0}}
+    body = orjson.loads(render_session_state_payload(blueprint, result_id=5, answered_logs_map=answered, version="v"))
+    assert body["code"] == 304
+    assert body["data"]["remaining_procedure_ids"] == [1]
+    assert body["data"]["answered"] == [{"question_id": 21, "selected_option_ids": [210], "score_awarded": 0}]
+
+
+def test_blueprint_segments_cached_per_bank_version(seeded, session_factory, monkeypatch):
+    db = session_factory()
+    blueprint = get_blueprint_segments(db, question_bank_id=seeded.bank_id)
+    procedures = build_assessment_blueprint(db, question_bank_id=seeded.bank_id)
+    assert [q.id for q in procedures[0].questions] == [q.id for q in seeded.questions]
+    # 下发给客户端的蓝图不含正确答案
+    assert b"is_correct" not in blueprint.segments[0].payload
+
+    assert get_blueprint_segments(db, question_bank_id=seeded.bank_id) is blueprint
+    # 进程内存丢失时从共享缓存的整份 JSON 重建，内容与标识不变，不查询数据库
+    crud_blueprint._blueprint_memory.clear()
+    monkeypatch.setattr(crud_blueprint, "_load_blueprint", lambda *args, **kwargs: pytest.fail("不应查询数据库"))
+    restored = get_blueprint_segments(db, question_bank_id=seeded.bank_id)
+    assert restored.segments == blueprint.segments
+    assert restored.tag == blueprint.tag
+    db.close()
+
+
+def test_session_endpoint_conditional_fetch(api_client, seeded):
+    url = f"/api/v1/client/assessments/{seeded.assessment_id}/session"
+    request = {"examinee_identifier": seeded.examinee_identifier}
+    response = api_client.post(url, json=request)
+    etag = response.headers["ETag"]
+    assert response.json()["code"] == 200
+    assert etag.strip('"') == response.json()["data"]["content_version"]
+
+    body = api_client.post(url, json=request, headers={"If-None-Match": etag}).json()
+    assert body["code"] == 304
+    assert body["data"]["remaining_procedure_ids"] == [seeded.procedure_id]
+
+    # 题库内容变更后旧标识不再匹配，重新下发完整蓝图
+    response = api_client.put(
+        f"/api/v1/procedures/{seeded.procedure_id}/questions/{seeded.questions[0].id}",
+        data={"question_data": '{"prompt": "新题干"}'},
+    )
+    assert response.status_code == 200
+    body = api_client.post(url, json=request, headers={"If-None-Match": etag}).json()
+    assert body["code"] == 200
+    assert body["data"]["procedures"][0]["questions"][0]["prompt"] == "新题干"
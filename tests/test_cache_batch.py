@@ -0,0 +1,61 @@
+# tests/test_cache_batch.py
+import json
+
+from app.core.cache import _l1_cache, cache_service, cached_many
+from app.crud.crud_question_bank import crud_question_bank
+
+
+def test_batch_operations_on_memory_cache():
+    cache_service.set_many({"session:1": {"v": 1}, "session:2": None, "session:3": [3]})
+    assert cache_service.get_many(["session:1", "session:3", "session:4", "session:1"]) == {
+        "session:1": {"v": 1}, "session:3": [3],
+    }
+    cache_service.delete_many(["session:1", "session:3"])
+    assert cache_service.get_many(["session:1", "session:3"]) == {}
+
+
+def test_get_many_is_one_mget_and_fills_l1(fake_redis):
+    cache_service.set_many({"blueprint:1:v0": "a", "session:1": "b"})
+    fake_redis.calls.clear()
+
+    assert cache_service.get_many(["blueprint:1:v0", "session:1", "session:2"]) == {
+        "blueprint:1:v0": "a", "session:1": "b",
+    }
+    assert fake_redis.calls == ["MGET"]
+    assert _l1_cache.get("blueprint:1:v0") == (True, "a")
+
+    # 再次读取时 L1 键不进入 MGET
+    fake_redis.calls.clear()
+    cache_service.get_many(["blueprint:1:v0", "session:1"])
+    assert fake_redis.calls == ["MGET"]
+    fake_redis.calls.clear()
+    assert cache_service.get_many(["blueprint:1:v0"]) == {"blueprint:1:v0": "a"}
+    assert fake_redis.calls == []
+
+
+def test_cached_many_loads_only_missing_ids():
+    loaded = []
+
+    @cached_many(lambda item_id: f"test_many:{item_id}", ids_arg="ids", ttl=60)
+    def load(*, ids):
+        loaded.append(sorted(ids))
+        return {item_id: (None if item_id == 3 else item_id * 10) for item_id in ids}
+
+    assert load(ids=[1, 2, 3]) == {1: 10, 2: 20, 3: None}
+    assert load(ids=[1, 2, 3, 4]) == {1: 10, 2: 20, 3: None, 4: 40}
+    # None 不缓存，下次仍回源
+    assert loaded == [[1, 2, 3], [3, 4]]
+
+
+def test_bank_total_scores_cached_and_invalidated(seeded, session_factory, api_client):
+    db = session_factory()
+    assert crud_question_bank.get_total_scores(db, question_bank_ids=[seeded.bank_id, 999]) == {seeded.bank_id: 30, 999: 0}
+    assert cache_service.get(cache_service.bank_total_score_key(seeded.bank_id)) == 30
+
+    response = api_client.put(
+        f"/api/v1/procedures/{seeded.procedure_id}/questions/{seeded.questions[0].id}",
+        data={"question_data": json.dumps({"score": 20})},
+    )
+    assert response.status_code == 200
+    assert crud_question_bank.get_total_score(db, question_bank_id=seeded.bank_id) == 40
+    db.close()
@@ -0,0 +1,85 @@
+# tests/test_cache_codec.py
+import json
+import zlib
+
+import pytest
+
+from app.core import cache_codec
+from app.core.config import settings
+from app.core.cache_codec import CacheDecodeError, decode, decode_raw, encode, encode_raw
+
+
+def test_round_trip():
+    value = {"id": 1, "name": "考核", "tags": ["a", "b"], "score": 2.5, "closed": False, "end": None}
+    data = encode(value)
+    assert data[0] == cache_codec.MAGIC
+    assert decode(data) == value
+
+
+def test_round_trip_converts_like_json_dumps():
+    # 与原 json.dumps(default=str) 一致：非字符串键转为字符串
+    assert decode(encode({1: "a"})) == {"1": "a"}
+
+
+def test_large_value_is_compressed(monkeypatch):
+    monkeypatch.setattr(cache_codec, "_compression", cache_codec.COMPRESSION_ZLIB)
+    value = {"payload": "x" * 10_000}
+    data = encode(value)
+    assert data[1] >> 4 == cache_codec.COMPRESSION_ZLIB
+    assert len(data) < 10_000
+    assert decode(data) == value
+
+
+def test_small_value_is_not_compressed():
+    data = encode({"a": 1})
+    assert data[1] >> 4 == cache_codec.COMPRESSION_NONE
+
+
+def test_raw_round_trip(monkeypatch):
+    monkeypatch.setattr(cache_codec, "_compression", cache_codec.COMPRESSION_ZLIB)
+    payload = b'{"procedures": []}' * 500
+    data = encode_raw(payload)
+    assert data[1] & 0x0F == cache_codec.SERIALIZER_RAW
+    assert decode_raw(data) == payload
+
+
+def test_decode_legacy_json():
+    """升级前写入的值没有头部，是 JSON 文本"""
+    legacy = json.dumps({"id": 7, "title": "旧值"}, ensure_ascii=False).encode()
+    assert decode(legacy) == {"id": 7, "title": "旧值"}
+    assert decode_raw(legacy) == legacy
+
+
+def test_decode_corrupted_payload():
+    with pytest.raises(CacheDecodeError):
+        decode(bytes((cache_codec.MAGIC, cache_codec.SERIALIZER_ORJSON)) + b"{not json")
+
+
+def test_decode_corrupted_compression():
+    flags = cache_codec.SERIALIZER_ORJSON | (cache_codec.COMPRESSION_ZLIB << 4)
+    with pytest.raises(CacheDecodeError):
+        decode(bytes((cache_codec.MAGIC, flags)) + b"not zlib")
+
+
+def test_decode_unavailable_algorithm():
+    with pytest.raises(CacheDecodeError):
+        decode(bytes((cache_codec.MAGIC, 0x0F)) + b"{}")
+    flags = cache_codec.SERIALIZER_ORJSON | (0x0F << 4)
+    with pytest.raises(CacheDecodeError):
+        decode(bytes((cache_codec.MAGIC, flags)) + zlib.compress(b"{}"))
+
+
+def test_decode_error_is_value_error():
+    assert issubclass(CacheDecodeError, ValueError)
+
+
+def test_default_compression_needs_no_optional_dependency():
+    """默认压缩算法只依赖标准库，未安装 zstandard / lz4 的环境也不会退回到其他格式"""
+    assert settings.CACHE_COMPRESSION == "zlib"
+    assert cache_codec._resolve_compression(settings.CACHE_COMPRESSION) == cache_codec.COMPRESSION_ZLIB
+
+
+def test_unavailable_compression_falls_back_to_zlib(monkeypatch):
+    monkeypatch.delitem(cache_codec._COMPRESSORS, cache_codec.COMPRESSION_ZSTD, raising=False)
+    assert cache_codec._resolve_compression("zstd") == cache_codec.COMPRESSION_ZLIB
+    assert cache_codec._resolve_compression("none") == cache_codec.COMPRESSION_NONE
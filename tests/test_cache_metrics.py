@@ -0,0 +1,70 @@
+# tests/test_cache_metrics.py
+import pytest
+import redis
+
+from app.core.cache import cache_metrics, cache_service
+from app.core.cache_metrics import CacheMetrics, Histogram
+
+
+@pytest.fixture
+def metrics():
+    cache_metrics.reset()
+    yield cache_metrics
+    cache_metrics.reset()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    samples = {(name, labels[-1][1]): value for name, labels, value in histogram.samples("h", ()) if name == "h_bucket"}
+    assert samples == {("h_bucket", "0.1"): 1, ("h_bucket", "1.0"): 3, ("h_bucket", "+Inf"): 4}
+
+
+def test_redis_call_counts_errors_and_latency():
+    metrics = CacheMetrics()
+    with metrics.redis_call("session:1", "GET"):
+        pass
+    with pytest.raises(redis.ConnectionError):
+        with metrics.redis_call("session:1", "GET"):
+            raise redis.ConnectionError("down")
+    # 非 Redis 异常不计入错误
+    with pytest.raises(ValueError):
+        with metrics.redis_call("session:1", "GET"):
+            raise ValueError
+    assert metrics.summary()["session"]["errors"] == 1
+    assert 'cache_redis_latency_seconds_count{prefix="session",operation="GET"} 3' in metrics.render_prometheus()
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = CacheMetrics(enabled=False)
+    metrics.record_lookup("blueprint:1", "redis", True, 10)
+    metrics.record_fallback("blueprint:1", "GET")
+    assert metrics.summary() == {}
+
+
+def test_lookups_recorded_by_tier(metrics, fake_redis):
+    cache_service.set("blueprint:1:v0", {"v": 1})
+    cache_service.get("blueprint:1:v0")
+    cache_service.get("session:1")
+    fake_redis.fail = True
+    cache_service.get("session:1")
+
+    summary = metrics.summary()
+    assert summary["blueprint"] == {"hits": 1, "misses": 0, "fallbacks": 0, "errors": 0, "hit_rate": 1.0}
+    assert summary["session"] == {"hits": 0, "misses": 2, "fallbacks": 1, "errors": 1, "hit_rate": 0.0}
+
+    text = metrics.render_prometheus(gauges=[("cache_l1_items", "L1 条目数", {}, 3)])
+    assert 'cache_lookups_total{prefix="blueprint",tier="l1",result="hit"} 1' in text
+    assert 'cache_lookups_total{prefix="session",tier="memory",result="miss"} 1' in text
+    assert 'cache_fallbacks_total{prefix="session",operation="GET"} 1' in text
+    assert 'cache_payload_bytes_count{prefix="blueprint",direction="write"} 1' in text
+    assert "# TYPE cache_l1_items gauge\ncache_l1_items 3" in text
+
+
+def test_metrics_endpoint(metrics, api_client):
+    cache_service.get("session:1")
+    response = api_client.get("/api/v1/monitoring/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'cache_lookups_total{prefix="session",tier="memory",result="miss"} 1' in response.text
+    assert "# TYPE scheduler_is_leader gauge" in response.text
@@ -0,0 +1,50 @@
+# tests/test_cache_versions.py
+from app.core.cache import CacheService, _l1_cache, cache_service
+
+
+def test_bump_bank_version_orphans_versioned_entries():
+    version = cache_service.get_bank_version(1)
+    cache_service.set_blueprint(1, version, b"[]")
+    cache_service.set_answer_key(1, version, {"1": [10]})
+
+    assert cache_service.bump_bank_version(1) == version + 1
+    new_version = cache_service.get_bank_version(1)
+    assert new_version == version + 1
+    assert cache_service.get_blueprint(1, new_version) is None
+    assert cache_service.get_answer_key(1, new_version) is None
+    # 其他题库不受影响
+    assert cache_service.get_bank_version(2) == 0
+
+
+def test_platform_version_combines_global_and_platform_counters():
+    first, second = cache_service.get_platform_version(1), cache_service.get_platform_version(2)
+    cache_service.set_upcoming_assessment(1, first, {"id": 5})
+
+    cache_service.invalidate_assessment(1)
+    assert cache_service.get_platform_version(1) != first
+    assert cache_service.get_platform_version(2) == second
+    assert cache_service.get_upcoming_assessment(1, cache_service.get_platform_version(1)) is None
+
+    # 不指定平台：递增全局版本号，所有平台的调度缓存失效
+    before = cache_service.get_platform_version(1)
+    cache_service.invalidate_assessment()
+    assert cache_service.get_platform_version(1) != before
+    assert cache_service.get_platform_version(2) != second
+
+
+def test_counter_cached_in_l1_is_evicted_on_bump(fake_redis):
+    key = CacheService.bank_version_key(3)
+    assert cache_service.get_bank_version(3) == 0
+    assert _l1_cache.get(key) == (True, 0)
+    cache_service.bump_bank_version(3)
+    # 本进程递增时立即逐出 L1，并通知其他 worker
+    assert _l1_cache.get(key) == (False, None)
+    assert cache_service.get_bank_version(3) == 1
+
+
+def test_invalidation_is_single_incr_without_scan(fake_redis):
+    cache_service.get_bank_version(4)
+    fake_redis.calls.clear()
+    cache_service.invalidate_blueprint(4)
+    assert fake_redis.calls == ["INCR", "PUBLISH"]
+    assert cache_service.get_bank_version(4) == 1
@@ -0,0 +1,101 @@
+# tests/test_cache_warmup.py
+from datetime import timedelta
+
+import pytest
+
+from app.core import scheduler
+from app.core.cache import cache_service
+from app.core.config import settings
+from app.crud import crud_answer_key, crud_blueprint
+from app.models.assessment_management import Assessment
+from app.services import cache_warmup
+
+from conftest import beijing_now
+
+
+@pytest.fixture
+def warmup(seeded, session_factory, monkeypatch):
+    """seeded 之外再加一场 5 分钟后开始的考核（同一题库）"""
+    monkeypatch.setattr(cache_warmup, "SessionLocal", session_factory)
+    monkeypatch.setattr(cache_warmup, "_locally_warmed", set())
+    opened = []
+    monkeypatch.setattr(cache_warmup, "open_db_connections", lambda count: opened.append(count) or count)
+
+    db = session_factory()
+    now = beijing_now()
+    upcoming = Assessment(
+        title="即将开始", start_time=now + timedelta(minutes=5), end_time=now + timedelta(minutes=65),
+        question_bank_id=seeded.bank_id,
+    )
+    db.add(upcoming)
+    db.commit()
+    seeded.upcoming_id = upcoming.id
+    seeded.opened = opened
+    db.close()
+    return seeded
+
+
+def test_warm_up_assessment_builds_caches_and_stores_report(warmup, api_client):
+    report = cache_warmup.warm_up_assessment(warmup.upcoming_id)
+    assert (report["question_bank_id"], report["platform_id"]) == (warmup.bank_id, warmup.platform_id)
+    assert report["blueprint"]["procedures"] == 1
+    assert report["blueprint"]["questions"] == 3
+    assert report["answer_key"]["questions"] == 3
+    # 平台当前最优先的是已开始的考核
+    assert report["upcoming"]["assessment_id"] == warmup.assessment_id
+
+    version = cache_service.get_bank_version(warmup.bank_id)
+    assert cache_service.get_blueprint(warmup.bank_id, version)
+    body = api_client.get(f"/api/v1/monitoring/warmup/{warmup.upcoming_id}").json()
+    assert body["data"]["blueprint"] == report["blueprint"]
+
+
+def test_warm_up_missing_assessment(warmup, api_client):
+    assert cache_warmup.warm_up_assessment(9999) is None
+    assert api_client.get("/api/v1/monitoring/warmup/9999").json()["code"] == 404
+
+
+def test_warm_up_local_once_per_upcoming_assessment(warmup):
+    assert cache_warmup.warm_up_local() == 1
+    assert (warmup.bank_id, cache_service.get_bank_version(warmup.bank_id)) in crud_blueprint._blueprint_memory
+    assert crud_answer_key._answer_key_memory
+    assert warmup.opened == [settings.CACHE_WARMUP_DB_CONNECTIONS]
+
+    assert cache_warmup.warm_up_local() == 0
+    assert warmup.opened == [settings.CACHE_WARMUP_DB_CONNECTIONS]
+
+
+def test_warm_up_local_waits_for_shared_warmup(warmup, monkeypatch):
+    # 使用 Redis 时等 leader 的共享预热完成后再从 Redis 载入
+    monkeypatch.setattr(cache_service, "is_distributed", lambda: True)
+    assert cache_warmup.warm_up_local() == 0
+    cache_warmup.warm_up_assessment(warmup.upcoming_id)
+    crud_blueprint._blueprint_memory.clear()
+    assert cache_warmup.warm_up_local() == 1
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """记录注册 / 移除的持久化任务，不访问作业存储"""
+    jobs = {}
+    monkeypatch.setattr(scheduler.scheduler, "add_job", lambda func, trigger, **kwargs: jobs.update({kwargs["id"]: kwargs}))
+    monkeypatch.setattr(scheduler.scheduler, "remove_job", lambda job_id: jobs.pop(job_id, None))
+    return jobs
+
+
+def test_schedule_cache_warmup_runs_lead_minutes_before_start(jobs):
+    start = beijing_now() + timedelta(hours=1)
+    scheduler.schedule_cache_warmup(1, start)
+    job = jobs["warmup_assessment_1"]
+    assert job["args"] == [1]
+    expected = scheduler.BEIJING_TZ.localize(start - timedelta(minutes=settings.CACHE_WARMUP_LEAD_MINUTES))
+    assert job["run_date"] == expected
+
+    # 考核改为已开始：移除预热任务
+    scheduler.schedule_cache_warmup(1, beijing_now() - timedelta(minutes=1))
+    assert jobs == {}
+
+
+def test_schedule_cache_warmup_within_lead_runs_now(jobs):
+    scheduler.schedule_cache_warmup(1, beijing_now() + timedelta(minutes=1))
+    assert jobs["warmup_assessment_1"]["run_date"] <= scheduler.datetime.now(scheduler.timezone.utc)
@@ -0,0 +1,203 @@
+# tests/test_cached.py
+import asyncio
+import threading
+
+import pytest
+
+from app.core import cache
+from app.core.cache import AsyncCacheService, CacheService, cache_service, cached
+
+
+STALE_ENTRY = {"v": "old", "r": 0}
+
+
+@pytest.fixture
+def lock_holder(monkeypatch):
+    """模拟其他 worker 持有刷新锁；held 置为 False 后锁可获取"""
+    state = {"held": True}
+
+    def try_lock(name, ttl):
+        return (False, None) if state["held"] else (True, None)
+
+    async def try_lock_async(name, ttl):
+        return try_lock(name, ttl)
+
+    monkeypatch.setattr(CacheService, "try_lock", staticmethod(try_lock))
+    monkeypatch.setattr(AsyncCacheService, "try_lock", staticmethod(try_lock_async))
+    return state
+
+
+async def _drain_refresh_tasks():
+    while cache._refresh_tasks:
+        await asyncio.gather(*list(cache._refresh_tasks))
+
+
+def test_async_refresh_releases_key_when_lock_contended(lock_holder):
+    calls = []
+
+    @cached(lambda item_id: f"test_cached:{item_id}", ttl=60, soft_ttl=10)
+    async def load(item_id):
+        calls.append(item_id)
+        return "new"
+
+    async def scenario():
+        cache_service.set("test_cached:1", STALE_ENTRY, ttl=60)
+        assert await load(1) == "old"
+        await _drain_refresh_tasks()
+        # 其他 worker 持有刷新锁：本进程放弃刷新，但不能把键留在 _refreshing_keys 里
+        assert calls == []
+        assert "test_cached:1" not in cache._refreshing_keys
+
+        lock_holder["held"] = False
+        assert await load(1) == "old"
+        await _drain_refresh_tasks()
+        assert calls == [1]
+        assert await load(1) == "new"
+
+    asyncio.run(scenario())
+
+
+def test_sync_refresh_retries_after_lock_contended(lock_holder):
+    calls = []
+    refreshed = threading.Event()
+
+    @cached(lambda item_id: f"test_cached:{item_id}", ttl=60, soft_ttl=10)
+    def load(item_id):
+        calls.append(item_id)
+        refreshed.set()
+        return "new"
+
+    def wait_for_refresh_threads():
+        for thread in threading.enumerate():
+            if thread.name.startswith("cache-refresh-"):
+                thread.join(timeout=5)
+
+    cache_service.set("test_cached:2", STALE_ENTRY, ttl=60)
+    assert load(2) == "old"
+    wait_for_refresh_threads()
+    assert calls == []
+    assert not cache._refresh_flight.is_running("test_cached:2")
+
+    lock_holder["held"] = False
+    assert load(2) == "old"
+    assert refreshed.wait(timeout=5)
+    wait_for_refresh_threads()
+    assert load(2) == "new"
+
+
+def test_soft_ttl_rejected_when_not_below_ttl():
+    with pytest.raises(ValueError):
+        cached(lambda: "k", ttl=10, soft_ttl=10)
+
+
+def test_none_cached_only_with_negative_ttl():
+    calls = []
+
+    @cached(lambda item_id: f"test_cached:plain:{item_id}", ttl=60)
+    def plain(item_id):
+        calls.append("plain")
+        return None
+
+    @cached(lambda item_id: f"test_cached:negative:{item_id}", ttl=60, negative_ttl=5)
+    def negative(item_id):
+        calls.append("negative")
+        return None
+
+    for _ in range(2):
+        assert plain(1) is None
+        assert negative(1) is None
+    assert calls == ["plain", "negative", "plain"]
+
+
+def test_async_negative_ttl():
+    calls = []
+
+    @cached(lambda item_id: f"test_cached:async_negative:{item_id}", ttl=60, negative_ttl=5)
+    async def load(item_id):
+        calls.append(item_id)
+        return None
+
+    async def scenario():
+        assert await load(1) is None
+        assert await load(1) is None
+
+    asyncio.run(scenario())
+    assert calls == [1]
+
+
+class FakeWallClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_soft_ttl_refreshes_in_background_with_new_session(monkeypatch):
+    clock = FakeWallClock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    sessions = []
+
+    class Session:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    def session_factory():
+        sessions.append(Session())
+        return sessions[-1]
+
+    values = iter(["v1", "v2"])
+    used_db = []
+    refreshed = threading.Event()
+
+    @cached(lambda db, *, item_id: f"test_cached:soft:{item_id}", ttl=60, soft_ttl=10, session_factory=session_factory)
+    def load(db, *, item_id):
+        used_db.append(db)
+        if used_db[1:]:
+            refreshed.set()
+        return next(values)
+
+    assert load("request-db", item_id=1) == "v1"
+    clock.now += 5
+    assert load("request-db", item_id=1) == "v1"
+    assert used_db == ["request-db"]
+
+    # 软过期后先返回旧值，后台使用新建的会话重新计算并回写
+    clock.now += 5
+    assert load("request-db", item_id=1) == "v1"
+    assert refreshed.wait(timeout=5)
+    for thread in threading.enumerate():
+        if thread.name.startswith("cache-refresh-"):
+            thread.join(timeout=5)
+    assert used_db[1] is sessions[0] and sessions[0].closed
+    assert load("request-db", item_id=1) == "v2"
+
+
+def test_failed_refresh_keeps_stale_value(monkeypatch):
+    clock = FakeWallClock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    calls = []
+
+    @cached(lambda item_id: f"test_cached:failing:{item_id}", ttl=60, soft_ttl=10)
+    def load(item_id):
+        calls.append(item_id)
+        if len(calls) > 1:
+            raise RuntimeError("db down")
+        return "v1"
+
+    assert load(1) == "v1"
+    clock.now += 10
+    assert load(1) == "v1"
+    for thread in threading.enumerate():
+        if thread.name.startswith("cache-refresh-"):
+            thread.join(timeout=5)
+    assert calls == [1, 1]
+    assert not cache._refresh_flight.is_running("test_cached:failing:1")
+    # 刷新失败不影响旧值，下次读取仍返回旧值并再次尝试刷新
+    assert load(1) == "v1"
+    for thread in threading.enumerate():
+        if thread.name.startswith("cache-refresh-"):
+            thread.join(timeout=5)
+    assert calls == [1, 1, 1]
@@ -0,0 +1,175 @@
+# tests/test_circuit_breaker.py
+import pytest
+
+from app.core import circuit_breaker
+from app.core.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, backoff_base=1.0, backoff_max=4.0)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_force_open(breaker):
+    breaker.record_failure(force_open=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_allows_single_probe(breaker, clock):
+    breaker.record_failure(force_open=True)
+    clock.now += 0.5
+    assert not breaker.allow()
+
+    clock.now += 0.5
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 探测进行中，其余调用继续降级
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(breaker, clock):
+    breaker.record_failure(force_open=True)
+    clock.now += 1.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    assert breaker.stats()["consecutive_failures"] == 0
+
+
+def test_failed_probe_doubles_backoff_up_to_max(breaker, clock):
+    breaker.record_failure(force_open=True)
+    for expected_backoff in (2.0, 4.0, 4.0):
+        clock.now += breaker.stats()["backoff_seconds"]
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["backoff_seconds"] == expected_backoff
+        clock.now += expected_backoff - 0.1
+        assert not breaker.allow()
+
+    # 探测成功后退避恢复为初始值
+    clock.now += 0.1
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.stats()["backoff_seconds"] == 1.0
+
+
+def test_stats_counts_transitions(breaker, clock):
+    breaker.record_failure(force_open=True)
+    clock.now += 1.0
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.stats()["transitions"] == {
+        "closed->open": 1,
+        "open->half_open": 1,
+        "half_open->closed": 1,
+    }
+
+
+def test_failures_outside_window_do_not_accumulate(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, backoff_base=1.0, backoff_max=4.0, failure_window=10.0)
+    for _ in range(5):
+        breaker.record_failure()
+        clock.now += 6.0
+    # 间隔 6 秒，窗口内最多同时存在 2 次失败
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["consecutive_failures"] == 2
+
+    clock.now -= 6.0
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_redis_calls_mixed_with_failures_keep_breaker_closed(clock):
+    from app.core.cache import _redis_call
+
+    breaker = CircuitBreaker("test", failure_threshold=3, backoff_base=1.0, backoff_max=4.0)
+    for _ in range(10):
+        # 偶发超时与正常调用交替出现，失败计数被成功调用清零
+        breaker.record_failure()
+        with _redis_call("k", "GET", breaker):
+            pass
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["consecutive_failures"] == 0
+
+    with pytest.raises(RuntimeError):
+        with _redis_call("k", "GET", breaker):
+            raise RuntimeError("boom")
+    breaker.record_failure()
+    assert breaker.stats()["consecutive_failures"] == 1
+
+
+@pytest.fixture
+def redis_breaker(clock, monkeypatch):
+    """缓存服务经由真实的 get_redis_client 与全局熔断器访问 FakeRedis"""
+    from app.core import cache
+    from app.core.config import settings
+    from conftest import FakeRedis
+
+    client = FakeRedis()
+    monkeypatch.setattr(settings, "REDIS_ENABLED", True)
+    monkeypatch.setattr(cache, "_redis_client", client)
+    yield client
+    cache._redis_breaker.record_success()
+
+
+def test_cache_service_degrades_to_memory_while_breaker_open(redis_breaker, clock):
+    from app.core.cache import _redis_breaker, cache_service
+    from app.core.config import settings
+
+    cache_service.set("session:1", {"v": 1})
+    assert cache_service.get("session:1") == {"v": 1}
+
+    redis_breaker.fail = True
+    for _ in range(settings.REDIS_BREAKER_FAILURE_THRESHOLD):
+        assert cache_service.get("session:1") is None
+    assert _redis_breaker.state == CircuitBreaker.OPEN
+
+    # 断开期间直接读写内存缓存，不再访问 Redis
+    redis_breaker.calls.clear()
+    cache_service.set("session:2", {"v": 2})
+    assert cache_service.get("session:2") == {"v": 2}
+    assert redis_breaker.calls == []
+
+    # 退避到期后探测成功，恢复使用 Redis
+    redis_breaker.fail = False
+    clock.now += settings.REDIS_BREAKER_BACKOFF_BASE_SECONDS
+    assert cache_service.get("session:1") == {"v": 1}
+    assert _redis_breaker.state == CircuitBreaker.CLOSED
+    assert redis_breaker.calls == ["PING", "GET"]
@@ -0,0 +1,77 @@
+# tests/test_client_answers.py
+from app.models.assessment_management import AnswerLog, AssessmentResult
+
+API = "/api/v1/client"
+
+
+def _item(seeded, question, option_id, identifier=None):
+    return {
+        "examinee_identifier": identifier or seeded.examinee_identifier,
+        "procedure_id": seeded.procedure_id,
+        "question_id": question.id,
+        "selected_option_ids": [option_id],
+    }
+
+
+def _submit_batch(client, seeded, items):
+    return client.post(f"{API}/assessment-results/{seeded.result_id}/answers", json=items).json()
+
+
+def _stored(session_factory, seeded):
+    db = session_factory()
+    try:
+        total = db.get(AssessmentResult, seeded.result_id).total_score
+        logs = {log.question_id: log.score_awarded for log in db.query(AnswerLog).filter_by(result_id=seeded.result_id)}
+        return total, logs
+    finally:
+        db.close()
+
+
+def test_batch_scores_each_item_independently(api_client, session_factory, seeded):
+    first, second, third = seeded.questions
+    body = _submit_batch(api_client, seeded, [
+        _item(seeded, first, first.correct_option_id),
+        _item(seeded, second, second.wrong_option_id),
+        _item(seeded, third, first.correct_option_id),  # 选项不属于该题
+    ])
+    assert body["code"] == 200
+    results = body["data"]["results"]
+    assert [r["status"] for r in results] == ["success", "success", "error"]
+    assert (results[0]["score_awarded"], results[0]["is_correct"]) == (10, True)
+    assert (results[1]["score_awarded"], results[1]["is_correct"]) == (0, False)
+    assert body["data"]["accepted_count"] == 2
+    assert body["data"]["score_delta"] == 10
+    assert _stored(session_factory, seeded) == (10, {first.id: 10, second.id: 0})
+
+    # 校验失败的题目可以重新提交；已答的题目报重复
+    body = _submit_batch(api_client, seeded, [
+        _item(seeded, first, first.correct_option_id),
+        _item(seeded, third, third.correct_option_id),
+    ])
+    assert [r["status"] for r in body["data"]["results"]] == ["error", "success"]
+    assert body["data"]["results"][0]["error"] == "该题目已被回答。"
+    assert _stored(session_factory, seeded) == (20, {first.id: 10, second.id: 0, third.id: 10})
+
+
+def test_batch_duplicate_within_request_counts_once(api_client, session_factory, seeded):
+    first = seeded.questions[0]
+    body = _submit_batch(api_client, seeded, [
+        _item(seeded, first, first.correct_option_id),
+        _item(seeded, first, first.correct_option_id),
+    ])
+    assert [r["status"] for r in body["data"]["results"]] == ["success", "error"]
+    assert _stored(session_factory, seeded) == (10, {first.id: 10})
+
+
+def test_empty_batch_rejected(api_client, session_factory, seeded):
+    assert _submit_batch(api_client, seeded, [])["code"] == 400
+
+
+def test_batch_with_foreign_identifier_rejected_as_a_whole(api_client, session_factory, seeded):
+    first, second, _ = seeded.questions
+    body = _submit_batch(api_client, seeded, [
+        _item(seeded, first, first.correct_option_id),
+        _item(seeded, second, second.correct_option_id, identifier="someone-else"),
+    ])
+    assert body["code"] == 403
+    assert _stored(session_factory, seeded) == (0, {})
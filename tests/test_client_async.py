@@ -0,0 +1,120 @@
+# tests/test_client_async.py
+"""异步客户端接口：与同步版相同的请求序列，响应与落库结果一致"""
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("aiomysql")  # app.db.async_session 在导入时按 DATABASE_URL 创建 aiomysql 引擎
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.endpoints import client_async
+from app.db.async_session import get_async_db
+from app.db.session import Base
+from app.main import app as main_app
+from app.models.assessment_management import AnswerLog, AssessmentResult
+
+API = "/api/v1/client"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """同步（准备数据、断言）与异步（接口）引擎共用一个 SQLite 文件"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def async_client(session_factory, tmp_path, monkeypatch):
+    # TestClient 每个请求可能在新的事件循环中执行，连接不跨请求复用
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+    async_session = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    async def get_test_db():
+        async with async_session() as db:
+            yield db
+
+    finalized = []
+    monkeypatch.setattr(client_async, "schedule_result_finalization", lambda ids: finalized.extend(ids))
+
+    app = FastAPI()
+    app.include_router(client_async.router, prefix=API)
+    app.exception_handlers.update(main_app.exception_handlers)
+    app.dependency_overrides[get_async_db] = get_test_db
+    client = TestClient(app)
+    client.finalized = finalized
+    yield client
+
+
+def _answer_item(seeded, question, option_id):
+    return {
+        "examinee_identifier": seeded.examinee_identifier,
+        "procedure_id": seeded.procedure_id,
+        "question_id": question.id,
+        "selected_option_ids": [option_id],
+    }
+
+
+def test_async_session_answer_and_finish(async_client, session_factory, seeded):
+    first, second, third = seeded.questions
+
+    response = async_client.post(
+        f"{API}/assessments/{seeded.assessment_id}/session",
+        json={"examinee_identifier": seeded.examinee_identifier},
+    )
+    body = response.json()
+    assert body["code"] == 200
+    assert body["data"]["assessment_result_id"] == seeded.result_id
+    assert len(body["data"]["procedures"][0]["questions"]) == 3
+    assert response.headers["ETag"].strip('"') == body["data"]["content_version"]
+
+    answer_url = f"{API}/assessment-results/{seeded.result_id}/answer"
+    body = async_client.post(answer_url, json=_answer_item(seeded, first, first.correct_option_id)).json()
+    assert body["data"] == {"status": "success", "score_awarded": 10, "is_correct": True}
+    assert async_client.post(answer_url, json=_answer_item(seeded, first, first.correct_option_id)).json()["code"] == 400
+
+    body = async_client.post(
+        f"{API}/assessment-results/{seeded.result_id}/answers",
+        json=[_answer_item(seeded, second, second.wrong_option_id), _answer_item(seeded, third, first.correct_option_id)],
+    ).json()
+    assert [r["status"] for r in body["data"]["results"]] == ["success", "error"]
+    assert body["data"]["score_delta"] == 0
+
+    # 重连：客户端已持有当前蓝图，只下发作答状态
+    body = async_client.post(
+        f"{API}/assessments/{seeded.assessment_id}/session",
+        json={"examinee_identifier": seeded.examinee_identifier},
+        headers={"If-None-Match": response.headers["ETag"]},
+    ).json()
+    assert body["code"] == 304
+    assert {item["question_id"] for item in body["data"]["answered"]} == {first.id, second.id}
+
+    finish_url = f"{API}/assessment-results/{seeded.result_id}/finish"
+    body = async_client.post(finish_url, json={"examinee_identifier": seeded.examinee_identifier}).json()
+    assert body["data"]["status"] == "finished"
+    assert body["data"]["final_score"] == 10
+    assert async_client.finalized == [seeded.result_id]
+    assert async_client.post(finish_url, json={"examinee_identifier": seeded.examinee_identifier}).json()["code"] == 208
+
+    db = session_factory()
+    result = db.get(AssessmentResult, seeded.result_id)
+    assert result.end_time is not None
+    assert {log.question_id: log.score_awarded for log in db.query(AnswerLog)} == {first.id: 10, second.id: 0}
+    db.close()
+
+
+def test_async_answer_after_finish_rejected(async_client, seeded):
+    first = seeded.questions[0]
+    async_client.post(
+        f"{API}/assessment-results/{seeded.result_id}/finish", json={"examinee_identifier": seeded.examinee_identifier}
+    )
+    body = async_client.post(
+        f"{API}/assessment-results/{seeded.result_id}/answer", json=_answer_item(seeded, first, first.correct_option_id)
+    ).json()
+    assert body["code"] == 404
@@ -0,0 +1,185 @@
+# tests/test_deadline_scheduler.py
+import threading
+from datetime import timedelta
+
+import pytest
+
+from app.core import deadline_scheduler as ds
+from app.core.deadline_scheduler import DeadlineScheduler
+
+
+class Recorder:
+    def __init__(self, expected: int):
+        self.fired = []
+        self.expected = expected
+        self.done = threading.Event()
+
+    def __call__(self, key):
+        self.fired.append(key)
+        if len(self.fired) >= self.expected:
+            self.done.set()
+
+
+@pytest.fixture
+def make_scheduler():
+    created = []
+
+    def make(callback, entries=(), resync_interval=3600, **kwargs):
+        scheduler = DeadlineScheduler(
+            "test", callback=callback, loader=lambda: list(entries), resync_interval=resync_interval, **kwargs
+        )
+        created.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in created:
+        scheduler.stop()
+
+
+def test_fires_in_deadline_order(make_scheduler):
+    now = ds._now()
+    recorder = Recorder(expected=3)
+    scheduler = make_scheduler(recorder, entries=[
+        ("a", now - timedelta(seconds=1)),
+        ("b", now - timedelta(seconds=3)),
+        ("c", now - timedelta(seconds=2)),
+    ])
+    scheduler.start()
+    assert recorder.done.wait(5)
+    assert recorder.fired == ["b", "c", "a"]
+    assert scheduler.status()["pending"] == 0
+
+
+def test_reschedule_keeps_only_latest_deadline(make_scheduler):
+    now = ds._now()
+    recorder = Recorder(expected=1)
+    scheduler = make_scheduler(recorder, entries=[
+        ("a", now + timedelta(hours=1)),
+        ("b", now + timedelta(hours=2)),
+    ])
+    scheduler.start()
+
+    # 提前到已过去的时间：立即触发，旧的截止时间被丢弃
+    scheduler.schedule("a", now - timedelta(seconds=1))
+    assert recorder.done.wait(5)
+    assert recorder.fired == ["a"]
+
+    status = scheduler.status()
+    assert status["pending"] == 1
+    assert [entry["key"] for entry in status["next"]] == ["b"]
+
+
+def test_postpone(make_scheduler):
+    now = ds._now()
+    scheduler = make_scheduler(Recorder(expected=1), entries=[("a", now + timedelta(hours=1))])
+    scheduler.schedule("a", now + timedelta(hours=1))
+    scheduler.schedule("a", now + timedelta(hours=3))
+    assert scheduler.status()["next"] == [{"key": "a", "deadline": (now + timedelta(hours=3)).isoformat()}]
+
+
+def test_cancel(make_scheduler):
+    now = ds._now()
+    recorder = Recorder(expected=1)
+    scheduler = make_scheduler(recorder, entries=[("a", now + timedelta(hours=1))])
+    scheduler.start()
+    scheduler.cancel("a")
+    scheduler.schedule("b", now - timedelta(seconds=1))
+    assert recorder.done.wait(5)
+    assert recorder.fired == ["b"]
+    assert scheduler.status()["pending"] == 0
+
+
+def test_resync_replaces_entries(make_scheduler):
+    now = ds._now()
+    entries = [("a", now + timedelta(hours=1))]
+    scheduler = make_scheduler(Recorder(expected=1), entries=entries)
+    scheduler.schedule("stale", now + timedelta(hours=1))
+    scheduler.resync()
+    assert [entry["key"] for entry in scheduler.status()["next"]] == ["a"]
+
+
+def test_failing_callback_reported_to_listener(make_scheduler):
+    runs = []
+    done = threading.Event()
+
+    def callback(key):
+        raise RuntimeError("boom")
+
+    def listener(key, **run):
+        runs.append((key, run["success"]))
+        done.set()
+
+    scheduler = make_scheduler(callback, entries=[("a", ds._now() - timedelta(seconds=1))], listener=listener)
+    scheduler.start()
+    assert done.wait(5)
+    assert runs == [("a", False)]
+    assert scheduler.is_running()
+
+
+@pytest.fixture
+def assessment_deadlines():
+    from app.core import scheduler
+
+    yield scheduler
+    scheduler.deadline_scheduler.rebuild([])
+
+
+def test_deadline_messages_update_leader_heap(assessment_deadlines):
+    end_time = ds._now().replace(microsecond=0) + timedelta(hours=1)
+    assessment_deadlines._apply_deadline_message(f"7 {end_time.isoformat()}")
+    assert assessment_deadlines.deadline_scheduler._deadlines == {7: end_time}
+
+    assessment_deadlines._apply_deadline_message("bad message")
+    assessment_deadlines._apply_deadline_message("7 cancel")
+    assert assessment_deadlines.deadline_scheduler._deadlines == {}
+
+
+def test_loader_includes_ended_assessments_with_open_sessions(assessment_deadlines, seeded, session_factory, monkeypatch):
+    from app.models.assessment_management import Assessment
+
+    monkeypatch.setattr(assessment_deadlines, "SessionLocal", session_factory)
+    db = session_factory()
+    now = ds._now()
+    db.add_all([
+        Assessment(title="已结束", start_time=now - timedelta(hours=2), end_time=now - timedelta(hours=1),
+                   question_bank_id=seeded.bank_id),
+        Assessment(title="未开始", start_time=now + timedelta(hours=1), end_time=now + timedelta(hours=2),
+                   question_bank_id=seeded.bank_id),
+    ])
+    db.get(Assessment, seeded.assessment_id).end_time = now - timedelta(minutes=1)
+    db.commit()
+    ended_id, upcoming_id = (a.id for a in db.query(Assessment).filter(Assessment.id != seeded.assessment_id).order_by(Assessment.id))
+    db.close()
+
+    loaded = {assessment_id for assessment_id, _ in assessment_deadlines.load_assessment_deadlines()}
+    # 已结束且没有未交卷会话的考核不再加载；已结束但仍有会话进行中的立即触发
+    assert loaded == {seeded.assessment_id, upcoming_id}
+
+
+def test_listener_resyncs_on_subscribe_then_applies_messages(assessment_deadlines, monkeypatch):
+    scheduler = assessment_deadlines
+    now = ds._now().replace(microsecond=0)
+    messages = [{"data": f"2 {(now + timedelta(hours=2)).isoformat()}"}]
+
+    class PubSub:
+        def subscribe(self, channel):
+            pass
+
+        def get_message(self, timeout):
+            if messages:
+                return messages.pop(0)
+            scheduler._deadline_listener_stop.set()
+            return None
+
+        def close(self):
+            pass
+
+    client = type("Client", (), {"pubsub": lambda self, **kwargs: PubSub()})()
+    monkeypatch.setattr(scheduler, "get_redis_client", lambda: client)
+    monkeypatch.setattr(scheduler.deadline_scheduler, "loader", lambda: [(1, now + timedelta(hours=1))])
+    scheduler._deadline_listener_stop.clear()
+    try:
+        scheduler._listen_deadlines()
+    finally:
+        scheduler._deadline_listener_stop.clear()
+    assert scheduler.deadline_scheduler._deadlines == {1: now + timedelta(hours=1), 2: now + timedelta(hours=2)}
@@ -0,0 +1,114 @@
+# tests/test_l1_cache.py
+import pytest
+
+from app.core import cache, local_cache
+from app.core.cache import _l1_cache, cache_service
+from app.core.config import settings
+from app.core.local_cache import LRUCache
+
+L1_KEY = "blueprint:1:v0"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_bounded_by_items_and_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(local_cache.time, "monotonic", clock)
+    lru = LRUCache(max_items=2, ttl=10)
+    lru.set("a", 1)
+    lru.set("b", None)
+    assert lru.get("a") == (True, 1)
+    lru.set("c", 3)
+    # b 最久未使用，被逐出；值为 None 的条目同样算命中
+    assert lru.get("b") == (False, None)
+    assert lru.get("c") == (True, 3)
+
+    # 单个条目的 TTL 不超过 L1 的兜底有效期
+    lru.set("d", 4, ttl=60)
+    clock.now += 10
+    assert lru.get("d") == (False, None)
+
+
+def test_l1_serves_repeated_reads_without_redis(fake_redis):
+    cache_service.set(L1_KEY, {"v": 1})
+    cache_service.set("session:9", {"v": 2})
+    fake_redis.calls.clear()
+
+    assert cache_service.get(L1_KEY) == {"v": 1}
+    assert cache_service.get("session:9") == {"v": 2}
+    assert cache_service.get("session:9") == {"v": 2}
+    # 只有 L1 前缀的键在本进程缓存
+    assert fake_redis.calls == ["GET", "GET"]
+
+
+def test_delete_evicts_locally_and_broadcasts_l1_keys_only(fake_redis):
+    cache_service.set(L1_KEY, {"v": 1})
+    cache_service.delete_many([L1_KEY, "session:9"])
+    assert _l1_cache.get(L1_KEY) == (False, None)
+    assert fake_redis.published == [(settings.CACHE_INVALIDATION_CHANNEL, f"{cache._instance_id} {L1_KEY}")]
+
+
+class FakePubSub:
+    """订阅成功后调用 on_subscribed 并依次投递预置的通知，投递完后让监听线程退出"""
+
+    def __init__(self, messages, on_subscribed):
+        self.messages = list(messages)
+        self.on_subscribed = on_subscribed
+        self.subscribed = False
+
+    def subscribe(self, channel):
+        self.subscribed = True
+
+    def get_message(self, timeout):
+        if self.on_subscribed:
+            self.on_subscribed()
+            self.on_subscribed = None
+        if not self.messages:
+            cache._invalidation_stop.set()
+            return None
+        return {"data": self.messages.pop(0)}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    def run(messages, on_subscribed=None):
+        client = type("Client", (), {"pubsub": lambda self, **kwargs: FakePubSub(messages, on_subscribed)})()
+        monkeypatch.setattr(cache, "get_redis_client", lambda: client)
+        cache._invalidation_stop.clear()
+        try:
+            cache._listen_invalidations()
+        finally:
+            cache._invalidation_stop.clear()
+    return run
+
+
+def test_listener_clears_l1_on_subscribe(listener):
+    # 订阅建立前可能错过通知，L1 中的旧值不能继续使用
+    _l1_cache.set(L1_KEY, "stale")
+    listener([])
+    assert _l1_cache.get(L1_KEY) == (False, None)
+
+
+def test_listener_evicts_keys_invalidated_by_other_workers(listener):
+    def populate():
+        for key in ("blueprint:1:v0", "blueprint:1:v1", "blueprint:2:v0", "answer_key:1:v0"):
+            _l1_cache.set(key, "value")
+
+    listener([
+        f"{cache._instance_id} answer_key:1:v0",  # 本进程发布的通知已在发布时逐出，忽略
+        "other-worker blueprint:2:v0",
+        "other-worker blueprint:1:*",
+    ], populate)
+    assert _l1_cache.get("answer_key:1:v0") == (True, "value")
+    assert _l1_cache.get("blueprint:2:v0") == (False, None)
+    assert _l1_cache.get("blueprint:1:v0") == (False, None)
+    assert _l1_cache.get("blueprint:1:v1") == (False, None)
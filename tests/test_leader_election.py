@@ -0,0 +1,204 @@
+# tests/test_leader_election.py
+import pytest
+
+from app.core import leader_election
+from app.core.leader_election import AutoLease, LeaderElection
+
+
+class FakeRedisLease:
+    """共享同一个 Redis 键；reachable 为 False 模拟本 worker 与 Redis 失联"""
+    backend = "redis"
+
+    def __init__(self, store, identity):
+        self.store = store
+        self.identity = identity
+        self.reachable = True
+
+    def acquire(self):
+        if not self.reachable:
+            return None
+        if self.store.get("redis") is None:
+            self.store["redis"] = self.identity
+            return True
+        return False
+
+    def renew(self):
+        if not self.reachable:
+            return None
+        return self.store.get("redis") == self.identity
+
+    def release(self):
+        if self.reachable and self.store.get("redis") == self.identity:
+            self.store["redis"] = None
+
+    def holder(self):
+        return self.store.get("redis") if self.reachable else None
+
+
+class FakeMySQLLease:
+    backend = "mysql"
+
+    def __init__(self, store, identity):
+        self.store = store
+        self.identity = identity
+
+    def acquire(self):
+        if self.store.get("mysql") is None:
+            self.store["mysql"] = self.identity
+            return True
+        return False
+
+    def renew(self):
+        return self.store.get("mysql") == self.identity
+
+    def release(self):
+        if self.store.get("mysql") == self.identity:
+            self.store["mysql"] = None
+
+    def holder(self):
+        return self.store.get("mysql")
+
+
+@pytest.fixture
+def workers():
+    store = {}
+
+    def make(identity):
+        lease = AutoLease("scheduler", identity, ttl=30)
+        lease.redis = FakeRedisLease(store, identity)
+        lease.mysql = FakeMySQLLease(store, identity)
+        return lease
+
+    return store, make("a"), make("b")
+
+
+def test_auto_lease_prefers_redis(workers):
+    store, a, b = workers
+    assert a.acquire() and a.backend == "redis"
+    assert not b.acquire()
+    assert a.renew()
+    assert store == {"redis": "a"}
+
+
+def test_auto_lease_falls_back_to_mysql_and_migrates_back(workers):
+    store, a, b = workers
+    a.acquire()
+    # Redis 整体故障：leader 改持 MySQL 租约，其他 worker 看到 MySQL 租约后不再竞争
+    a.redis.reachable = b.redis.reachable = False
+    store["redis"] = None
+    assert a.renew() and a.backend == "mysql"
+    assert not b.acquire()
+
+    # Redis 恢复：续期时迁回 Redis 租约并释放 MySQL 租约
+    a.redis.reachable = b.redis.reachable = True
+    assert a.renew() and a.backend == "redis"
+    assert store == {"redis": "a", "mysql": None}
+
+
+def test_partial_redis_outage_never_yields_two_leaders(workers):
+    store, a, b = workers
+    a.acquire()
+    # 只有 b 与 Redis 失联：b 通过 MySQL 租约当选，a 续期时发现后让出 Redis 租约
+    b.redis.reachable = False
+    assert b.acquire() and b.backend == "mysql"
+    assert a.renew() is False and a.backend == "auto"
+    assert store["redis"] is None
+
+    b.redis.reachable = True
+    assert b.renew() and b.backend == "redis"
+    assert store == {"redis": "b", "mysql": None}
+
+
+class ScriptedLease:
+    backend = "fake"
+
+    def __init__(self):
+        self.acquire_result = True
+        self.renew_result = True
+        self.released = False
+
+    def acquire(self):
+        return self.acquire_result
+
+    def renew(self):
+        return self.renew_result
+
+    def release(self):
+        self.released = True
+
+    def holder(self):
+        return None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def election(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(leader_election.time, "monotonic", clock)
+    events = []
+    election = LeaderElection(
+        "test", backend="none", ttl=10, renew_interval=1,
+        on_elected=lambda: events.append("elected"), on_demoted=lambda: events.append("demoted"),
+    )
+    election.lease = ScriptedLease()
+    election.clock, election.events = clock, events
+    return election
+
+
+def test_unknown_renewal_keeps_leadership_until_ttl(election):
+    election._tick()
+    assert election.is_leader and election.events == ["elected"]
+
+    # Redis 暂时不可用（续期结果未知）：TTL 内保持身份，超过 TTL 后主动让出
+    election.lease.renew_result = None
+    election.clock.now += 9
+    election._tick()
+    assert election.is_leader
+    election.clock.now += 1
+    election._tick()
+    assert not election.is_leader and election.events == ["elected", "demoted"]
+
+
+def test_lost_lease_demotes_and_stop_releases(election):
+    election._tick()
+    election.lease.renew_result = False
+    election._tick()
+    assert not election.is_leader
+
+    election._tick()
+    assert election.is_leader
+    election.stop()
+    assert election.events == ["elected", "demoted", "elected", "demoted"]
+    assert election.lease.released
+    assert election.status()["transitions"] == 4
+
+
+def test_demote_survives_failing_callback(election):
+    def fail():
+        raise RuntimeError("boom")
+
+    election.on_demoted = fail
+    election._tick()
+    election.lease.renew_result = False
+    election._tick()
+    assert not election.is_leader
+
+
+def test_without_election_every_worker_is_leader():
+    events = []
+    election = LeaderElection(
+        "test", backend="none", ttl=10, renew_interval=1,
+        on_elected=lambda: events.append("elected"), on_demoted=lambda: events.append("demoted"),
+    )
+    election.start()
+    assert election.is_leader and events == ["elected"]
+    assert election.status()["backend"] == "none"
+    election.stop()
+    assert events == ["elected", "demoted"]
@@ -0,0 +1,83 @@
+# tests/test_memory_cache.py
+from app.core import local_cache
+from app.core.local_cache import MemoryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_evicts_least_recently_used_beyond_max_items():
+    memory = MemoryCache(max_items=2, max_bytes=10 ** 6)
+    memory.set("a", 1)
+    memory.set("b", 2)
+    assert memory.get("a") == 1
+    memory.set("c", 3)
+    assert memory.get("b") is None
+    assert (memory.get("a"), memory.get("c")) == (1, 3)
+    assert len(memory) == 2
+
+
+def test_byte_budget_evicts_but_keeps_latest_entry():
+    memory = MemoryCache(max_items=100, max_bytes=300)
+    memory.set("small", "x")
+    memory.set("big", "y" * 1000)
+    # 单个条目超过预算时淘汰其他条目，但刚写入的条目保留
+    assert memory.get("small") is None
+    assert memory.get("big") == "y" * 1000
+    memory.delete("big")
+    assert memory.stats()["bytes"] == 0
+
+
+def test_expired_entries_dropped_before_lru(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(local_cache.time, "monotonic", clock)
+    memory = MemoryCache(max_items=2, max_bytes=10 ** 6)
+    memory.set("short", 1, ttl=5)
+    memory.set("long", 2)
+    assert memory.get("short") == 1
+    clock.now += 5
+    memory.set("new", 3)
+    # 过期条目优先清理，未过期的 long 虽然最久未使用也保留
+    assert memory.get_many(["short", "long", "new"]) == {"long": 2, "new": 3}
+
+
+def test_counters_pinned_against_eviction():
+    memory = MemoryCache(max_items=2, max_bytes=10 ** 6)
+    assert memory.incr("bank_version:1") == 1
+    assert memory.incr("bank_version:1") == 2
+    for i in range(5):
+        memory.set(f"blueprint:{i}", i)
+    # 版本号若被淘汰会从 0 重新计数，可能命中旧版本的缓存，因此常驻
+    assert memory.get("bank_version:1") == 2
+
+
+def test_delete_prefix_uses_colon_index():
+    memory = MemoryCache(max_items=100, max_bytes=10 ** 6)
+    memory.set_many({"blueprint:1:v0": 1, "blueprint:1:v1": 2, "blueprint:12:v0": 3, "answer_key:1:v0": 4})
+    assert memory.delete_prefix("blueprint:1:") == 2
+    assert memory.get_many(["blueprint:12:v0", "answer_key:1:v0"]) == {"blueprint:12:v0": 3, "answer_key:1:v0": 4}
+    assert memory.delete_prefix("blue") == 1
+    assert memory.delete_prefix("") == 1
+    assert len(memory) == 0
+
+
+def test_set_members_stored_as_strings(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(local_cache.time, "monotonic", clock)
+    memory = MemoryCache(max_items=100, max_bytes=10 ** 6)
+    assert memory.set_add_each("answered:1", [1, 2, 1], ttl=10) == [True, True, False]
+    assert memory.set_members("answered:1") == {"1", "2"}
+    assert memory.set_remove("answered:1", [2, 3]) == 1
+
+    clock.now += 8
+    # 添加成员刷新整个集合的过期时间
+    memory.set_add_each("answered:1", [4], ttl=10)
+    clock.now += 8
+    assert memory.set_members("answered:1") == {"1", "4"}
+    clock.now += 2
+    assert memory.set_members("answered:1") == set()
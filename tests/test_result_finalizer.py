@@ -0,0 +1,105 @@
+# tests/test_result_finalizer.py
+import json
+from datetime import timedelta
+
+import pytest
+
+from app.core.cache import cache_service
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.models.assessment_management import AnswerLog, AssessmentResult, AssessmentResultSummary
+from app.services import result_finalizer
+
+from conftest import beijing_now
+
+
+@pytest.fixture
+def finished(seeded, session_factory, monkeypatch):
+    """stu1 答对第一题、答错第二题后交卷（尚未汇总）"""
+    monkeypatch.setattr(result_finalizer, "SessionLocal", session_factory)
+    db = session_factory()
+    now = beijing_now()
+    first, second, _ = seeded.questions
+    db.add_all([
+        AnswerLog(result_id=seeded.result_id, question_id=first.id, selected_option_ids=[first.correct_option_id],
+                  score_awarded=10, answered_at=now - timedelta(minutes=5)),
+        AnswerLog(result_id=seeded.result_id, question_id=second.id, selected_option_ids=[second.wrong_option_id],
+                  score_awarded=0, answered_at=now - timedelta(minutes=4)),
+    ])
+    result = db.get(AssessmentResult, seeded.result_id)
+    result.end_time = now
+    result.total_score = 10
+    db.commit()
+    db.close()
+    return seeded
+
+
+def test_finalize_writes_summary_and_warms_detail(finished, session_factory):
+    assert result_finalizer.finalize_results([finished.result_id]) == 1
+
+    db = session_factory()
+    summary = db.get(AssessmentResultSummary, finished.result_id)
+    assert (summary.answered_count, summary.correct_count, summary.total_score) == (2, 1, 10)
+    assert summary.procedure_scores[0]["procedure_id"] == finished.procedure_id
+    db.close()
+
+    detail = cache_service.get_result_detail(finished.result_id)
+    assert detail["total_score"] == 10
+    assert detail["summary"]["correct_count"] == 1
+    assert [log["question_id"] for log in detail["answer_logs"]] == [q.id for q in finished.questions[:2]]
+
+
+def test_detail_cache_expires_when_question_changes(finished, api_client):
+    result_finalizer.finalize_results([finished.result_id])
+    url = f"/api/v1/admin/assessment-results/{finished.result_id}"
+    assert api_client.get(url).json()["data"]["answer_logs"][0]["question"]["prompt"] == "题目0"
+
+    response = api_client.put(
+        f"/api/v1/procedures/{finished.procedure_id}/questions/{finished.questions[0].id}",
+        data={"question_data": json.dumps({"prompt": "新题干"})},
+    )
+    assert response.status_code == 200
+    # 题目变更递增题库版本号，旧的详情缓存不再命中
+    assert cache_service.get_result_detail(finished.result_id) is None
+    assert api_client.get(url).json()["data"]["answer_logs"][0]["question"]["prompt"] == "新题干"
+
+
+def test_reconcile_drops_summary_and_detail_cache(finished, session_factory):
+    result_finalizer.finalize_results([finished.result_id])
+    db = session_factory()
+    db.get(AssessmentResult, finished.result_id).total_score = 99
+    db.commit()
+
+    fixed, open_drifted = crud_assessment_result.reconcile_total_scores(
+        db=db, since=beijing_now() - timedelta(hours=1)
+    )
+    assert (fixed, open_drifted) == (1, 0)
+    assert db.get(AssessmentResultSummary, finished.result_id) is None
+    db.close()
+    assert cache_service.get_result_detail(finished.result_id) is None
+
+    # 兜底扫描重新汇总后详情缓存恢复
+    assert result_finalizer.finalize_results([finished.result_id]) == 1
+    assert cache_service.get_result_detail(finished.result_id)["total_score"] == 10
+
+
+def test_pending_results_finalized_by_housekeeping(finished, session_factory, monkeypatch):
+    from app.core import scheduler
+
+    monkeypatch.setattr(scheduler, "SessionLocal", session_factory)
+    # 汇总任务丢失：兜底扫描补齐已结束但没有汇总的会话，进行中的会话不汇总
+    assert scheduler.finalize_pending_results() == 1
+    assert cache_service.get_result_detail(finished.result_id)["total_score"] == 10
+    assert scheduler.finalize_pending_results() == 0
+
+    db = session_factory()
+    assert crud_assessment_result.get_unfinalized_result_ids(db=db, limit=10) == []
+    db.close()
+
+
+def test_finalize_skips_open_and_missing_results(seeded, session_factory, monkeypatch):
+    monkeypatch.setattr(result_finalizer, "SessionLocal", session_factory)
+    assert result_finalizer.finalize_results([seeded.result_id, 9999]) == 0
+    assert result_finalizer.finalize_results([]) == 0
+    db = session_factory()
+    assert db.get(AssessmentResultSummary, seeded.result_id) is None
+    db.close()
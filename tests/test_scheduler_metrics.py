@@ -0,0 +1,109 @@
+# tests/test_scheduler_metrics.py
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED, JobExecutionEvent
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app.core import scheduler
+from app.core.scheduler_metrics import (
+    SCHEDULER_EVENTS, MeteredThreadPoolExecutor, SchedulerMetrics, job_name, scheduler_metrics,
+)
+
+
+def test_job_name_drops_numeric_suffix():
+    assert job_name("warmup_assessment_12") == "warmup_assessment"
+    assert job_name("finalize_results_3") == "finalize_results"
+    assert job_name("force_submit_expired_sessions") == "force_submit_expired_sessions"
+
+
+def _run(metrics, job_id, scheduled, code, retval=None):
+    metrics.record_submitted(job_id, [scheduled])
+    metrics.listener(JobExecutionEvent(code, job_id, "default", scheduled, retval=retval))
+
+
+def test_listener_records_lag_runs_errors_and_closed_sessions():
+    metrics = SchedulerMetrics()
+    late = datetime.now(timezone.utc) - timedelta(seconds=5)
+    _run(metrics, "force_submit_expired_sessions", late, EVENT_JOB_EXECUTED, retval=3)
+    _run(metrics, "force_submit_expired_sessions", datetime.now(timezone.utc), EVENT_JOB_EXECUTED, retval=2)
+    _run(metrics, "warmup_assessment_7", datetime.now(timezone.utc), EVENT_JOB_ERROR)
+    metrics.listener(JobExecutionEvent(EVENT_JOB_MISSED, "warmup_assessment_8", "default", late))
+
+    summary = metrics.summary()
+    sweep = summary["force_submit_expired_sessions"]
+    assert (sweep["runs"], sweep["errors"], sweep["sessions_closed"]) == (2, 0, 5)
+    assert sweep["max_lag_seconds"] >= 5
+    assert sweep["last_lag_seconds"] < 5
+    warmup = summary["warmup_assessment"]
+    assert (warmup["runs"], warmup["errors"], warmup["misfires"]) == (1, 1, 1)
+    # 只有结束会话的任务统计会话数
+    assert warmup["sessions_closed"] == 0
+    assert metrics._submitted == {}
+
+    text = metrics.render_prometheus()
+    assert 'scheduler_sessions_closed_total{job="force_submit_expired_sessions"} 5' in text
+    assert 'scheduler_job_lag_seconds_count{job="force_submit_expired_sessions"} 2' in text
+    assert 'scheduler_job_misfires_total{job="warmup_assessment"} 1' in text
+
+
+def test_fast_jobs_timed_on_real_scheduler():
+    # APScheduler 在一轮调度结束后才派发提交事件，执行很快的任务先完成；提交时间由执行器同步记录
+    metrics = SchedulerMetrics()
+    done = threading.Event()
+    background = BackgroundScheduler(
+        jobstores={"default": MemoryJobStore()},
+        executors={"default": MeteredThreadPoolExecutor(2, metrics=metrics)},
+        timezone="UTC",
+    )
+    background.add_listener(metrics.listener, SCHEDULER_EVENTS)
+    background.add_listener(lambda event: done.set() if event.job_id == "close_assessment_9" else None, EVENT_JOB_EXECUTED)
+    background.start(paused=True)
+    try:
+        now = datetime.now(timezone.utc)
+        background.add_job(lambda: 1, id="close_assessment_8", next_run_time=now)
+        background.add_job(lambda: 4, id="close_assessment_9", next_run_time=now)
+        background.resume()
+        assert done.wait(timeout=5)
+    finally:
+        background.shutdown()
+    stats = metrics.summary()["close_assessment"]
+    assert (stats["runs"], stats["sessions_closed"]) == (2, 5)
+    assert stats["last_duration_seconds"] is not None
+    assert metrics._submitted == {}
+
+
+@pytest.fixture
+def metrics():
+    scheduler_metrics.reset()
+    yield scheduler_metrics
+    scheduler_metrics.reset()
+
+
+class BrokenSession:
+    def query(self, *args):
+        raise RuntimeError("db down")
+
+    scalars = execute = query
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_deadline_runs_and_caught_errors_recorded(metrics, monkeypatch):
+    scheduler.deadline_scheduler.listener(5, lag=1.5, duration=0.2, success=True, result=2)
+
+    # 任务内部捕获的异常不会抛给调度器，由任务自行计入失败次数
+    monkeypatch.setattr(scheduler, "SessionLocal", BrokenSession)
+    assert scheduler.close_assessment(5) == 0
+    assert scheduler.force_submit_expired_sessions() == 0
+
+    summary = metrics.summary()
+    assert (summary["close_assessment"]["runs"], summary["close_assessment"]["errors"]) == (1, 1)
+    assert (summary["close_assessment"]["sessions_closed"], summary["close_assessment"]["last_lag_seconds"]) == (2, 1.5)
+    assert summary["force_submit_expired_sessions"]["errors"] == 1
@@ -0,0 +1,92 @@
+# tests/test_session_state.py
+from datetime import timedelta
+
+import pytest
+
+from app.core.cache import cache_service
+from app.crud import crud_session_state
+from app.models.assessment_management import Assessment
+
+from conftest import beijing_now
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def distributed(monkeypatch):
+    """模拟多进程共享缓存：会话状态从缓存读取（测试中由进程内内存充当共享缓存）"""
+    monkeypatch.setattr(cache_service, "is_distributed", lambda: True)
+
+
+def _answer(client, seeded, question):
+    return client.post(
+        f"{API}/client/assessment-results/{seeded.result_id}/answer",
+        json={
+            "examinee_identifier": seeded.examinee_identifier,
+            "procedure_id": seeded.procedure_id,
+            "question_id": question.id,
+            "selected_option_ids": [question.correct_option_id],
+        },
+    ).json()
+
+
+def _update_end_time(client, seeded, end_time):
+    response = client.put(
+        f"{API}/assessments/{seeded.assessment_id}", json={"end_time": end_time.strftime("%Y-%m-%d %H:%M:%S")}
+    )
+    assert response.json()["code"] == 200
+
+
+def _cache_state(session_factory, seeded):
+    db = session_factory()
+    try:
+        return crud_session_state.get_session_state(db, result_id=seeded.result_id)
+    finally:
+        db.close()
+
+
+def test_extending_assessment_accepts_answers(api_client, session_factory, seeded, distributed):
+    # 考核已到原结束时间，会话状态按原结束时间缓存
+    db = session_factory()
+    db.get(Assessment, seeded.assessment_id).end_time = beijing_now() - timedelta(minutes=1)
+    db.commit()
+    db.close()
+    _cache_state(session_factory, seeded)
+    assert _answer(api_client, seeded, seeded.questions[0])["msg"] == "考核已结束。无法提交答案。"
+
+    # 管理员延长考核：已开始的考生立即可以继续作答
+    _update_end_time(api_client, seeded, beijing_now() + timedelta(hours=1))
+    body = _answer(api_client, seeded, seeded.questions[0])
+    assert body["code"] == 200
+    assert body["data"]["score_awarded"] == 10
+
+
+def test_shortening_assessment_rejects_answers(api_client, session_factory, seeded, distributed):
+    assert _answer(api_client, seeded, seeded.questions[0])["code"] == 200
+
+    # 管理员提前结束考核：之后的答题被拒绝，已答标记保留
+    _update_end_time(api_client, seeded, beijing_now() - timedelta(seconds=1))
+    assert _answer(api_client, seeded, seeded.questions[1])["msg"] == "考核已结束。无法提交答案。"
+    assert cache_service.get_answered_questions(seeded.result_id) == {seeded.questions[0].id}
+
+
+def test_unrelated_update_keeps_session_state(api_client, session_factory, seeded, distributed):
+    _cache_state(session_factory, seeded)
+    response = api_client.put(f"{API}/assessments/{seeded.assessment_id}", json={"title": "新标题"})
+    assert response.json()["code"] == 200
+    assert cache_service.get_session_state(seeded.result_id) is not None
+
+
+def test_async_cache_service_also_invalidated(api_client, seeded, distributed, monkeypatch):
+    """异步客户端接口开启时，同步管理接口经异步缓存服务再删除一次（其 Redis 连接与熔断状态独立）"""
+    from app.core.config import settings
+
+    dropped = []
+
+    async def drop_session_states_async(result_ids):
+        dropped.append(result_ids)
+
+    monkeypatch.setattr(settings, "CLIENT_API_ASYNC", True)
+    monkeypatch.setattr(crud_session_state, "drop_session_states_async", drop_session_states_async)
+    _update_end_time(api_client, seeded, beijing_now() + timedelta(hours=2))
+    assert dropped == [[seeded.result_id]]
@@ -0,0 +1,112 @@
+# tests/test_single_flight.py
+import threading
+import time
+
+import pytest
+
+from app.core.cache import CacheService, cache_service
+from app.core.config import settings
+from app.core.single_flight import SingleFlight
+from app.crud import crud_blueprint
+from app.crud.crud_blueprint import get_blueprint_segments
+
+
+def test_single_flight_non_blocking_and_reclaims_locks():
+    flight = SingleFlight()
+    with flight.lock("k") as first:
+        assert first and flight.is_running("k")
+        with flight.lock("k", blocking=False) as second:
+            assert not second
+    assert not flight.is_running("k")
+    assert flight._locks == {}
+
+
+@pytest.fixture
+def load_calls(monkeypatch):
+    """记录数据库加载次数；加载放慢，让并发请求在构建期间到达"""
+    calls = []
+    load = crud_blueprint._load_blueprint
+
+    def slow_load(db, *, question_bank_id):
+        calls.append(question_bank_id)
+        time.sleep(0.1)
+        return load(db, question_bank_id=question_bank_id)
+
+    monkeypatch.setattr(crud_blueprint, "_load_blueprint", slow_load)
+    return calls
+
+
+def _concurrently(count, func):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = func()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_concurrent_misses_build_once(seeded, session_factory, load_calls):
+    db = session_factory()
+    results = _concurrently(8, lambda: get_blueprint_segments(db, question_bank_id=seeded.bank_id))
+    db.close()
+    assert load_calls == [seeded.bank_id]
+    assert all(result is results[0] for result in results)
+
+
+@pytest.fixture
+def other_worker_building(monkeypatch):
+    """其他 worker 持有构建锁"""
+    monkeypatch.setattr(CacheService, "try_lock", staticmethod(lambda name, ttl: (False, None)))
+    monkeypatch.setattr(CacheService, "is_locked", staticmethod(lambda name: True))
+    monkeypatch.setattr(settings, "BLUEPRINT_BUILD_POLL_INTERVAL_SECONDS", 0.01)
+
+
+def test_waits_for_blueprint_built_by_other_worker(seeded, session_factory, load_calls, other_worker_building):
+    db = session_factory()
+    expected = crud_blueprint._join_segments(
+        crud_blueprint._segments_from_procedures(crud_blueprint._load_blueprint(db, question_bank_id=seeded.bank_id))
+    )
+    load_calls.clear()
+    version = cache_service.get_bank_version(seeded.bank_id)
+    timer = threading.Timer(0.05, cache_service.set_blueprint, args=(seeded.bank_id, version, expected))
+    timer.start()
+
+    blueprint = get_blueprint_segments(db, question_bank_id=seeded.bank_id)
+    timer.join()
+    db.close()
+    # 读取其他 worker 写入的结果，本进程不查询数据库
+    assert load_calls == []
+    assert crud_blueprint._join_segments(blueprint.segments) == expected
+
+
+def test_builds_itself_after_wait_timeout(seeded, session_factory, load_calls, other_worker_building, monkeypatch):
+    monkeypatch.setattr(settings, "BLUEPRINT_BUILD_WAIT_SECONDS", 0.05)
+    db = session_factory()
+    blueprint = get_blueprint_segments(db, question_bank_id=seeded.bank_id)
+    db.close()
+    assert load_calls == [seeded.bank_id]
+    assert blueprint.segments
+
+
+def test_stale_while_revalidate_serves_previous_version(seeded, session_factory, load_calls, monkeypatch):
+    monkeypatch.setattr(settings, "BLUEPRINT_STALE_WHILE_REVALIDATE", True)
+    monkeypatch.setattr(crud_blueprint, "SessionLocal", session_factory)
+    db = session_factory()
+    old = get_blueprint_segments(db, question_bank_id=seeded.bank_id)
+
+    cache_service.bump_bank_version(seeded.bank_id)
+    # 新版本构建期间继续返回旧版本，后台线程完成重建
+    assert get_blueprint_segments(db, question_bank_id=seeded.bank_id) is old
+    for thread in threading.enumerate():
+        if thread.name.startswith("blueprint-revalidate-"):
+            thread.join(timeout=5)
+    assert load_calls == [seeded.bank_id, seeded.bank_id]
+    assert get_blueprint_segments(db, question_bank_id=seeded.bank_id).version == old.version + 1
+    db.close()
@@ -0,0 +1,67 @@
+# tests/test_total_score.py
+from datetime import timedelta
+
+from app.crud.crud_assessment_result import crud_assessment_result
+from app.models.assessment_management import AnswerLog, AssessmentResult
+
+from conftest import beijing_now
+
+
+def _total(session_factory, result_id):
+    db = session_factory()
+    try:
+        return db.get(AssessmentResult, result_id).total_score
+    finally:
+        db.close()
+
+
+def test_increments_from_concurrent_sessions_are_not_lost(seeded, session_factory):
+    """两个请求各自持有已加载的会话对象：数据库端累加，后提交的一方不会覆盖先提交的分数"""
+    first, second = session_factory(), session_factory()
+    for db in (first, second):
+        assert db.get(AssessmentResult, seeded.result_id).total_score == 0
+
+    crud_assessment_result.increment_total_score(db=first, result_id=seeded.result_id, delta=10)
+    first.commit()
+    crud_assessment_result.increment_total_score(db=second, result_id=seeded.result_id, delta=-3)
+    second.commit()
+    first.close()
+    second.close()
+    assert _total(session_factory, seeded.result_id) == 7
+
+
+def test_increment_treats_null_total_as_zero(seeded, session_factory):
+    db = session_factory()
+    db.get(AssessmentResult, seeded.result_id).total_score = None
+    db.commit()
+    crud_assessment_result.increment_total_score(db=db, result_id=seeded.result_id, delta=5)
+    db.commit()
+    db.close()
+    assert _total(session_factory, seeded.result_id) == 5
+
+
+def test_reconcile_fixes_finished_sessions_only(seeded, session_factory):
+    db = session_factory()
+    now = beijing_now()
+    finished = AssessmentResult(
+        assessment_id=seeded.assessment_id, examinee_id=2, start_time=now - timedelta(minutes=20),
+        end_time=now, total_score=50,
+    )
+    db.add(finished)
+    db.flush()
+    first = seeded.questions[0]
+    for result_id in (seeded.result_id, finished.id):
+        db.add(AnswerLog(result_id=result_id, question_id=first.id, selected_option_ids=[first.correct_option_id],
+                         score_awarded=10, answered_at=now))
+    db.commit()
+
+    # 进行中的会话（total 0，日志 10）只告警；已结束的会话（total 50，日志 10）按日志修正
+    assert crud_assessment_result.reconcile_total_scores(db=db, since=now - timedelta(hours=1)) == (1, 1)
+    db.close()
+    assert _total(session_factory, finished.id) == 10
+    assert _total(session_factory, seeded.result_id) == 0
+
+    # 回溯窗口之外的会话不核对
+    db = session_factory()
+    assert crud_assessment_result.reconcile_total_scores(db=db, since=now) == (0, 0)
+    db.close()
@@ -0,0 +1,80 @@
+# tests/test_upcoming_assessment.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud import crud_assessment as crud_assessment_module
+from app.crud.crud_assessment import _MISS, _build_schedule_entry, _read_schedule_entry, crud_assessment
+from app.models.assessment_management import Assessment
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """统计回源数据库的次数"""
+    calls = []
+    original = crud_assessment_module.CRUDAssessment.get_upcoming_or_active
+
+    def counting(self, db, *, platform_id):
+        calls.append(platform_id)
+        return original(self, db, platform_id=platform_id)
+
+    monkeypatch.setattr(crud_assessment_module.CRUDAssessment, "get_upcoming_or_active", counting)
+    return calls
+
+
+def _add_assessment(session_factory, bank_id, start, end, title="考核"):
+    db = session_factory()
+    assessment = Assessment(title=title, start_time=start, end_time=end, question_bank_id=bank_id)
+    db.add(assessment)
+    db.commit()
+    db.close()
+    return assessment.id
+
+
+@pytest.fixture
+def platform(seeded, session_factory):
+    """清空 seeded 的考核，由各测试按 datetime.now() 自行安排（与查询使用的时间基准一致）"""
+    db = session_factory()
+    db.query(Assessment).delete()
+    db.commit()
+    db.close()
+    return seeded
+
+
+def test_active_assessment_preferred_and_cached(platform, session_factory, queries):
+    now = datetime.now()
+    _add_assessment(session_factory, platform.bank_id, now + timedelta(minutes=5), now + timedelta(hours=1), "稍后")
+    active_id = _add_assessment(session_factory, platform.bank_id, now - timedelta(minutes=5), now + timedelta(hours=2), "进行中")
+
+    db = session_factory()
+    assert crud_assessment.get_upcoming_schedule_entry(db, platform_id=platform.platform_id)["id"] == active_id
+    assert crud_assessment.get_upcoming_schedule_entry(db, platform_id=platform.platform_id)["id"] == active_id
+    assert queries == [platform.platform_id]
+    db.close()
+
+
+def test_empty_platform_is_cached_and_invalidated_on_change(platform, session_factory, queries):
+    db = session_factory()
+    assert crud_assessment.get_upcoming_schedule_entry(db, platform_id=platform.platform_id) is None
+    assert crud_assessment.get_upcoming_schedule_entry(db, platform_id=platform.platform_id) is None
+    assert len(queries) == 1
+
+    now = datetime.now()
+    new_id = _add_assessment(session_factory, platform.bank_id, now + timedelta(minutes=5), now + timedelta(hours=1))
+    crud_assessment.invalidate_upcoming_cache(db, question_bank_ids=[platform.bank_id])
+    assert crud_assessment.get_upcoming_schedule_entry(db, platform_id=platform.platform_id)["id"] == new_id
+    assert len(queries) == 2
+    db.close()
+
+
+def test_entry_valid_until_next_boundary(platform, session_factory):
+    now = datetime.now()
+    start = now + timedelta(seconds=30)
+    _add_assessment(session_factory, platform.bank_id, start, now + timedelta(hours=1))
+    db = session_factory()
+    entry = _build_schedule_entry(crud_assessment.get_upcoming_or_active(db, platform_id=platform.platform_id))
+    db.close()
+    # 考核未开始：缓存在开始时间失效，到点后重新计算为进行中
+    assert datetime.fromisoformat(entry["valid_until"]) == start
+    assert _read_schedule_entry(entry) == entry["assessment"]
+    assert _read_schedule_entry({**entry, "valid_until": (now - timedelta(seconds=1)).isoformat()}) is _MISS